@@ -1,53 +1,125 @@
 from django.contrib import admin
-from . models import Cart, Customer, OrderPlaced, Payment, Product, Wishlist
+from . models import (
+    Cart, Customer, OrderPlaced, OrderStatusChange, OrderSummary, Payment, Product, ShippingRule, Wishlist,
+)
 from django.utils.html import format_html
 from django.urls import reverse
 from django.contrib.auth.models import Group
 
+from .paginators import EstimatedCountPaginator
+from .workflow import change_status
+
 # Register your models here.
 
+class LargeTableAdmin(admin.ModelAdmin):
+    """Listados sin COUNT(*) completo: conteo estimado y sin el total sin filtrar"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 @admin.register(Product)
-class ProductModelAdmin(admin.ModelAdmin):
+class ProductModelAdmin(LargeTableAdmin):
     list_display = ['id','title','precio_descuento','categoria','imagen_producto']
     
 @admin.register(Customer)
-class CustomerModelAdmin(admin.ModelAdmin): 
+class CustomerModelAdmin(LargeTableAdmin):
     list_display = ['id','user','localidad','departamento','codigopostal']
+    list_select_related = ['user']
     
 @admin.register(Cart)
-class CartModelAdmin(admin.ModelAdmin):
+class CartModelAdmin(LargeTableAdmin):
     list_display = ['id', 'user', 'productos', 'cantidad']
+    list_select_related = ['user', 'product']
+
     def productos(self,obj):
-        link = reverse("admin:app_product_change",args=[obj.product.pk])
+        link = reverse("admin:app_product_change",args=[obj.product_id])
         return format_html('<a href="{}">{}</a>',link,obj.product.title)
     
     
 @admin.register(Payment)
-class PaymentModelAdmin(admin.ModelAdmin):
-    list_display = ['id','user','amount','paid']
+class PaymentModelAdmin(LargeTableAdmin):
+    list_display = ['id','user','amount','paid','status','created_at']
+    list_select_related = ['user']
+    list_filter = ['paid','status']
+
+def status_action(status, description):
+    """Acción del admin que pasa las líneas seleccionadas a `status` (omite las que no pueden)"""
+    def action(modeladmin, request, queryset):
+        changed = change_status(queryset, status, user=request.user, source='admin')
+        modeladmin.message_user(request, f"{changed} líneas pasaron a '{status}'; las demás no permiten ese cambio.")
+    action.__name__ = f"mark_{status.lower().replace(' ', '_')}"
+    action.short_description = description
+    return action
+
+
+class OrderStatusChangeInline(admin.TabularInline):
+    model = OrderStatusChange
+    extra = 0
+    can_delete = False
+    fields = readonly_fields = ['from_status','to_status','changed_by','source','changed_at']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(OrderPlaced)
-class OrderPlacedModelAdmin(admin.ModelAdmin):
-    list_display = ['id','user','customers','productos','cantidad','ordered_date','status','payment']
+class OrderPlacedModelAdmin(LargeTableAdmin):
+    list_display = ['id','user','customers','productos','cantidad','unit_price','ordered_date','status','payments']
+    list_select_related = ['user', 'customer']
+    list_filter = ['status']
+    date_hierarchy = 'ordered_date'
+    ordering = ['-ordered_date', '-id']
+    readonly_fields = ['status']  # solo cambia con las acciones, que validan la transición
+    inlines = [OrderStatusChangeInline]
+    actions = [
+        status_action('Accepted', "Marcar como aceptadas"),
+        status_action('Packed', "Marcar como empacadas"),
+        status_action('On The Way', "Marcar como en camino"),
+        status_action('Delivered', "Marcar como entregadas"),
+        status_action('Cancel', "Cancelar"),
+    ]
+
     def customers(self,obj):
-        link = reverse("admin:app_customer_change",args=[obj.product.pk])
-        return format_html('<a href="{}">{}</a>',link,obj.product)
+        link = reverse("admin:app_customer_change",args=[obj.customer_id])
+        return format_html('<a href="{}">{}</a>',link,obj.customer.name)
     
     def productos(self,obj):
-        link = reverse("admin:app_product_change",args=[obj.product.pk])
-        return format_html('<a href="{}">{}</a>',link,obj.product.title)
+        link = reverse("admin:app_product_change",args=[obj.product_id])
+        return format_html('<a href="{}">{}</a>',link,obj.product_title)
     
     def payments(self,obj):
-        link = reverse("admin:app_payment_change",args=[obj.product.pk])
-        return format_html('<a href="{}">{}</a>',link,obj.payment.razorpay_payment_id)
+        link = reverse("admin:app_payment_change",args=[obj.payment_id])
+        return format_html('<a href="{}">#{}</a>',link,obj.payment_id)
     
     
     
+@admin.register(OrderStatusChange)
+class OrderStatusChangeModelAdmin(LargeTableAdmin):
+    list_display = ['id','order_id','from_status','to_status','changed_by','source','changed_at']
+    list_select_related = ['changed_by']
+    list_filter = ['to_status','source']
+
+
+@admin.register(OrderSummary)
+class OrderSummaryModelAdmin(LargeTableAdmin):
+    list_display = ['user','order_count','total_spent','last_order_date']
+    list_select_related = ['user']
+    readonly_fields = ['user','order_count','total_spent','last_order_date']
+
+
+@admin.register(ShippingRule)
+class ShippingRuleModelAdmin(admin.ModelAdmin):
+    list_display = ['id','name','min_subtotal','cost','active']
+    list_editable = ['min_subtotal','cost','active']
+
+
 @admin.register(Wishlist)
-class WishlistModelAdmin(admin.ModelAdmin):
+class WishlistModelAdmin(LargeTableAdmin):
     list_display = ['id','user','productos']
+    list_select_related = ['user', 'product']
+
     def productos(self,obj):
-        link = reverse("admin:app_product_change",args=[obj.product.pk])
+        link = reverse("admin:app_product_change",args=[obj.product_id])
         return format_html('<a href="{}">{}</a>',link,obj.product.title)
     
     
@@ -0,0 +1,229 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .exports import day_start
+from .models import (
+    CATEGORY_CHOICES, STATE_CHOICES, DailyCategorySales, DailyDepartmentSales, DailyProductSales,
+    OrderPlaced, OrderStatusChange, RollupWatermark, TopProductSales,
+)
+from .money import ZERO, line_total
+
+RANGE_DAYS = 31      # días recalculados por consulta
+BATCH_SIZE = 5000
+TOP_PRODUCTS = 10
+WINDOWS = (7, 30, 90, 365)  # días que ofrece el tablero
+
+# modelo -> (campo del rollup, agrupación sobre OrderPlaced)
+ROLLUPS = [
+    (DailyCategorySales, 'categoria', 'product__categoria'),
+    (DailyProductSales, 'product_id', 'product_id'),
+    (DailyDepartmentSales, 'departamento', 'customer__departamento'),
+]
+
+
+# -----------------------------
+# Actualización incremental de las ventas diarias
+# -----------------------------
+
+def _aggregate(model, field, lookup, first, last, changes_upto):
+    """
+    Filas del rollup `model` para los días first..last, agrupadas en la BD.
+
+    Una línea cancelada después del cambio `changes_upto` todavía se cuenta: la
+    resta subtract_cancels en la siguiente corrida.
+    """
+    late_cancel = OrderStatusChange.objects.filter(order=OuterRef('pk'), to_status='Cancel', pk__gt=changes_upto)
+    rows = (
+        OrderPlaced.objects
+        .filter(ordered_date__gte=day_start(first), ordered_date__lt=day_start(last + timedelta(days=1)))
+        .filter(~Q(status='Cancel') | Exists(late_cancel))
+        .annotate(day=TruncDate('ordered_date'))
+        .values('day', lookup)
+        .annotate(lines=Count('pk'), units=Sum('cantidad'), revenue=Sum(line_total(price='unit_price')))
+        .order_by()
+    )
+    for row in rows.iterator():
+        yield model(
+            day=row['day'], lines=row['lines'], units=row['units'], revenue=row['revenue'] or ZERO,
+            **{field: row[lookup]},
+        )
+
+
+def _ranges(days):
+    """Agrupa días ordenados en rangos consecutivos de hasta RANGE_DAYS días"""
+    days = sorted(days)
+    while days:
+        first = last = days.pop(0)
+        while days and days[0] == last + timedelta(days=1) and (days[0] - first).days < RANGE_DAYS:
+            last = days.pop(0)
+        yield first, last
+
+
+def rebuild_days(days, changes_upto):
+    """Recalcula por completo los rollups de esos días (borra e inserta en una transacción por rango)"""
+    for first, last in _ranges(days):
+        with transaction.atomic():
+            for model, field, lookup in ROLLUPS:
+                model.objects.filter(day__range=(first, last)).delete()
+                rows = _aggregate(model, field, lookup, first, last, changes_upto)
+                model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def subtract_cancels(since, upto, orders_upto):
+    """
+    Resta de los rollups las líneas canceladas entre los cambios since..upto.
+
+    Solo toca las líneas ya contadas (id <= orders_upto); un UPDATE con F() por
+    celda (día, clave), así que el costo depende de las cancelaciones y no del día.
+    Se llama en la misma transacción que mueve la marca 'status_changes'.
+    """
+    changes = (
+        OrderStatusChange.objects
+        .filter(pk__gt=since, pk__lte=upto, to_status='Cancel', order_id__lte=orders_upto)
+        .annotate(
+            day=TruncDate('order__ordered_date'),
+            revenue=line_total(cantidad='order__cantidad', price='order__unit_price'),
+        )
+        .values_list('day', 'order__cantidad', 'revenue', *[f'order__{lookup}' for _, _, lookup in ROLLUPS])
+    )
+    deltas = {}
+    for day, units, revenue, *keys in changes.iterator():
+        for (model, field, _), key in zip(ROLLUPS, keys):
+            cell = deltas.setdefault((model, field, day, key), [0, 0, ZERO])
+            cell[0] += 1
+            cell[1] += units
+            cell[2] += revenue or ZERO
+    for (model, field, day, key), (lines, units, revenue) in deltas.items():
+        model.objects.filter(day=day, **{field: key}).update(
+            lines=F('lines') - lines, units=F('units') - units, revenue=F('revenue') - revenue,
+        )
+    # Una celda sin líneas no existiría si el día se recalculara completo
+    days = {day for _, _, day, _ in deltas}
+    for model, _, _ in ROLLUPS:
+        model.objects.filter(day__in=days, lines=0).delete()
+
+
+def _watermark(name):
+    return RollupWatermark.objects.get_or_create(name=name)[0]
+
+
+def _all_days():
+    dates = OrderPlaced.objects.order_by('ordered_date').values_list('ordered_date', flat=True)
+    first, last = dates.first(), dates.last()
+    if first is None:
+        return []
+    first, last = timezone.localdate(first), timezone.localdate(last)
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def refresh_rollups(full=False):
+    """
+    Pone al día las ventas diarias; retorna cuántos días recalculó.
+
+    Solo recalcula los días con órdenes nuevas (id mayor que la marca 'orders');
+    las cancelaciones registradas después de la marca 'status_changes' se restan
+    antes, así un día recalculado nunca las resta dos veces. Si el proceso se corta,
+    la siguiente corrida repite los días pendientes. Las órdenes borradas a mano
+    solo se reflejan con `full`.
+    """
+    orders, changes = _watermark('orders'), _watermark('status_changes')
+    max_order = OrderPlaced.objects.aggregate(m=Max('pk'))['m'] or 0
+    max_change = OrderStatusChange.objects.aggregate(m=Max('pk'))['m'] or 0
+
+    rebuild = full or not orders.last_id
+    if rebuild:
+        days = set(_all_days())
+        with transaction.atomic():
+            for model, _, _ in ROLLUPS:
+                model.objects.all().delete()
+            # Si se corta a medias, la siguiente corrida vuelve a empezar desde cero
+            RollupWatermark.objects.filter(pk=orders.pk).update(last_id=0)
+    else:
+        days = set(
+            OrderPlaced.objects.filter(pk__gt=orders.last_id, pk__lte=max_order)
+            .annotate(day=TruncDate('ordered_date')).values_list('day', flat=True).distinct().order_by()
+        )
+    now = timezone.now()
+    with transaction.atomic():
+        if not rebuild:
+            subtract_cancels(changes.last_id, max_change, orders.last_id)
+        RollupWatermark.objects.filter(pk=changes.pk).update(last_id=max_change, refreshed_at=now)
+
+    rebuild_days(days, max_change)
+    RollupWatermark.objects.filter(pk=orders.pk).update(last_id=max_order, refreshed_at=now)
+    # Las ventanas se mueven con el día aunque no haya cambios
+    if days or max_change != changes.last_id or orders.refreshed_at is None \
+            or timezone.localdate(orders.refreshed_at) != timezone.localdate(now):
+        refresh_top_products()
+    return len(days)
+
+
+def refresh_top_products():
+    """Guarda los TOP_PRODUCTS más vendidos de cada ventana de WINDOWS días"""
+    today = timezone.localdate()
+    rows = []
+    for days in WINDOWS:
+        # default: rebuild_days acaba de escribir los rollups y la réplica puede no tenerlos
+        top = (
+            DailyProductSales.objects.using('default').filter(day__gt=today - timedelta(days=days)).values('product_id')
+            .annotate(units=Sum('units'), revenue=Sum('revenue')).order_by('-revenue', 'product_id')[:TOP_PRODUCTS]
+        )
+        rows += [TopProductSales(days=days, **row) for row in top]
+    with transaction.atomic():
+        TopProductSales.objects.all().delete()
+        TopProductSales.objects.bulk_create(rows)
+
+
+# -----------------------------
+# Lecturas del tablero (solo tablas de rollup)
+# -----------------------------
+
+def _totals(qs, key):
+    return list(
+        qs.values(key).annotate(lines=Sum('lines'), units=Sum('units'), revenue=Sum('revenue')).order_by(key)
+    )
+
+
+def sales_dashboard(days=30):
+    """
+    Ventas de los últimos `days` días (uno de WINDOWS) por día, categoría,
+    departamento y los productos más vendidos.
+
+    Cada consulta lee a lo sumo `days` filas por categoría o departamento, sin
+    importar cuántas órdenes haya; los productos vienen ya ordenados.
+    """
+    start = timezone.localdate() - timedelta(days=days - 1)
+    categories = DailyCategorySales.objects.filter(day__gte=start)
+    labels, states = dict(CATEGORY_CHOICES), dict(STATE_CHOICES)
+
+    top = list(
+        TopProductSales.objects.filter(days=days).order_by('-revenue', 'product_id')
+        .values('product_id', 'product__title', 'units', 'revenue')
+    )
+
+    by_category = sorted(_totals(categories, 'categoria'), key=lambda row: row['revenue'], reverse=True)
+    for row in by_category:
+        row['label'] = labels.get(row['categoria'], row['categoria'])
+    by_department = sorted(
+        _totals(DailyDepartmentSales.objects.filter(day__gte=start), 'departamento'),
+        key=lambda row: row['revenue'], reverse=True,
+    )
+    for row in by_department:
+        row['label'] = states.get(row['departamento'], row['departamento'])
+    by_day = _totals(categories, 'day')
+
+    return {
+        'start': start,
+        'days': days,
+        'windows': WINDOWS,
+        'by_day': by_day,
+        'by_category': by_category,
+        'by_department': by_department,
+        'top_products': top,
+        'total': sum((row['revenue'] for row in by_day), ZERO),
+        'refreshed_at': RollupWatermark.objects.filter(name='orders').values_list('refreshed_at', flat=True).first(),
+    }
@@ -0,0 +1,225 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MISSING = object()
+STALE_GRACE = 60 * 5    # segundos que una entrada vencida se sigue sirviendo mientras otro la rehace
+LOCK_TIMEOUT = 30       # un proceso que muere reconstruyendo no bloquea la clave más que esto
+WAIT_TIMEOUT = 5        # espera máxima a que otro proceso termine la primera construcción
+WAIT_STEP = 0.05
+JITTER = 0.1
+
+
+# -----------------------------
+# Backend de dos niveles: LRU del proceso delante de la caché compartida
+# -----------------------------
+
+class LocalLRU:
+    """LRU en memoria del proceso con vencimiento corto (segundos)"""
+
+    def __init__(self, timeout, max_entries):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.timeout <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache(BaseCache):
+    """
+    Caché por defecto: todas las operaciones van a la caché compartida
+    (OPTIONS['SHARED'], p. ej. Redis o archivos) y así los contadores y las
+    versiones son los mismos en todos los workers de gunicorn.
+
+    Además guarda un LRU del proceso (`local`) que solo usa cached_query: sus
+    entradas viven LOCAL_TIMEOUT segundos, lo que otro worker puede tardar en
+    ver un cambio. Escribir o borrar una clave la quita también del LRU.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local = LocalLRU(options.get('LOCAL_TIMEOUT', 5), options.get('LOCAL_MAX_ENTRIES', 1000))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def get(self, key, default=None, version=None):
+        return self.shared.get(key, default, version=version)
+
+    def get_many(self, keys, version=None):
+        return self.shared.get_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.shared.has_key(key, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.add(key, value, timeout, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.discard(key)
+        return self.shared.set(key, value, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.discard(*data)
+        return self.shared.set_many(data, timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.discard(key)
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self.local.discard(key)
+        return self.shared.decr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        self.local.discard(key)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.local.discard(*keys)
+        return self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        self.local.clear()
+        return self.shared.clear()
+
+
+# -----------------------------
+# cached_query: claves versionadas, TTL con jitter y una sola reconstrucción a la vez
+# -----------------------------
+
+def _local_tier(cache):
+    return getattr(cache, 'local', None)
+
+
+def new_version():
+    """Valor para una clave de versión: crece con el reloj, así no repite uno anterior aunque la clave se pierda"""
+    return time.time_ns()
+
+
+def get_version(key, alias=DEFAULT_CACHE_ALIAS):
+    """Versión actual de `key`; si no existe la crea sin vencimiento"""
+    cache = caches[alias]
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key, alias=DEFAULT_CACHE_ALIAS):
+    """
+    Invalida todo lo cacheado con cached_query(versions=[key]); en este proceso, al instante.
+
+    Escribe una versión nueva sin vencimiento en lugar de usar incr(): en el
+    backend de archivos incr() reescribe la clave con el TIMEOUT por defecto.
+    """
+    cache = caches[alias]
+    cache.set(key, new_version(), None)
+    local = _local_tier(cache)
+    if local is not None:
+        local.clear()
+
+
+def _wait_for(cache, key, versions):
+    """Espera a que otro proceso termine de construir la entrada (None si no llega a tiempo)"""
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == versions:
+            return entry
+    return None
+
+
+def cached_query(key, build, timeout=60 * 10, versions=(), jitter=JITTER, local=True, alias=DEFAULT_CACHE_ALIAS):
+    """
+    Retorna build() cacheado bajo `key`.
+
+    La entrada vale hasta `timeout` segundos (±jitter, para que las claves
+    creadas juntas no venzan juntas; None = sin vencimiento) y mientras no
+    cambie ninguna de las claves de `versions` (ver bump_version). Una sola
+    petición reconstruye a la vez (lock con cache.add): las demás sirven la
+    entrada anterior o, si no hay ninguna, esperan a la nueva. Con `local` la
+    entrada fresca queda además unos segundos en el LRU del proceso.
+    """
+    cache = caches[alias]
+    local_tier = _local_tier(cache) if local else None
+    if local_tier is not None:
+        value = local_tier.get(key)
+        if value is not MISSING:
+            return value
+
+    found = cache.get_many([key, *versions])
+    current = tuple(found.get(version_key) for version_key in versions)
+    entry = found.get(key)
+    fresh = entry is not None and entry[0] == current and (entry[1] is None or entry[1] > time.time())
+
+    if not fresh:
+        lock_key = f"{key}:lock"
+        if cache.add(lock_key, 1, LOCK_TIMEOUT):
+            try:
+                entry = _store(cache, key, current, build(), timeout, jitter)
+            finally:
+                cache.delete(lock_key)
+            fresh = True
+        elif entry is None:
+            entry = _wait_for(cache, key, current)
+            if entry is None:  # quien tenía el lock no terminó: se construye sin guardar
+                return build()
+            fresh = True
+        # si no, otro proceso la está rehaciendo y se sirve la anterior
+
+    if fresh and local_tier is not None:
+        local_tier.set(key, entry[2])
+    return entry[2]
+
+
+def _store(cache, key, versions, data, timeout, jitter):
+    if timeout is None:
+        entry = (versions, None, data)
+        cache.set(key, entry, None)
+    else:
+        ttl = timeout * random.uniform(1 - jitter, 1 + jitter)
+        entry = (versions, time.time() + ttl, data)
+        cache.set(key, entry, int(ttl) + STALE_GRACE)
+    return entry
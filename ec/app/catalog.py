@@ -0,0 +1,93 @@
+from django.utils.functional import cached_property
+
+from .caching import bump_version, cached_query, get_version
+from .models import Product
+
+
+# -----------------------------
+# Versión del catálogo (invalida cachés al guardar/borrar productos)
+# -----------------------------
+
+CATALOG_VERSION_KEY = "catalog:version"
+TITLES_KEY = "catalog:titles:{}"
+TITLES_TIMEOUT = 60 * 60 * 24
+PAGE_SIZE = 24
+
+
+def catalog_version():
+    """Versión actual del catálogo; forma parte de las claves de caché del catálogo"""
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalida de una vez todas las claves que dependen del catálogo"""
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def category_titles(categoria):
+    """Títulos de la barra lateral de una categoría, calculados una vez por versión del catálogo"""
+    return cached_query(
+        TITLES_KEY.format(categoria),
+        lambda: list(
+            Product.objects.filter(categoria=categoria).order_by('title')
+            .values_list('title', flat=True).distinct()
+        ),
+        TITLES_TIMEOUT, versions=[CATALOG_VERSION_KEY],
+    )
+
+
+# -----------------------------
+# Paginación por cursor (keyset) sobre Product
+# -----------------------------
+
+def parse_cursor(value):
+    """Convierte el parámetro ?after= en un id válido (None si no hay cursor)"""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """
+    Página de productos ordenada por id que empieza después del cursor.
+
+    La consulta es perezosa: solo se ejecuta si la plantilla recorre la página,
+    así que un fragmento cacheado no la dispara.
+    """
+
+    def __init__(self, queryset, after=None, size=PAGE_SIZE):
+        self.queryset = queryset.order_by('pk')
+        self.after = after
+        self.size = size
+
+    @cached_property
+    def _rows(self):
+        qs = self.queryset
+        if self.after is not None:
+            qs = qs.filter(pk__gt=self.after)
+        return list(qs[:self.size + 1])
+
+    @property
+    def object_list(self):
+        return self._rows[:self.size]
+
+    @property
+    def has_next(self):
+        return len(self._rows) > self.size
+
+    @property
+    def next_cursor(self):
+        return self.object_list[-1].pk if self.has_next else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def product_page(queryset, after=None):
+    """Página de productos con solo las columnas que usa la grilla"""
+    queryset = queryset.only('id', 'title', 'selling_price', 'precio_descuento', 'imagen_producto')
+    return KeysetPage(queryset, after=after)
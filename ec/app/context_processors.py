@@ -0,0 +1,10 @@
+from .counters import get_counts
+from .guest_cart import GuestCart
+
+
+def cart_counts(request):
+    """Expone totalitem y wishitem a todas las plantillas (badges del header)"""
+    if not request.user.is_authenticated:
+        return {'totalitem': GuestCart(request).count(), 'wishitem': 0}  # desde la cookie, sin consultas
+    totalitem, wishitem = get_counts(request.user)
+    return {'totalitem': totalitem, 'wishitem': wishitem}
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Cart, CartSummary, Wishlist
+
+
+# -----------------------------
+# Contadores del header (carrito / wishlist)
+# Las señales de Cart y Wishlist los invalidan (app/signals.py); las escrituras
+# sin señales (bulk_create) llaman a invalidate_* a mano.
+# Las variantes a* son para las vistas asíncronas (ORM y caché async).
+# -----------------------------
+
+CART_COUNT_KEY = "counts:cart:{}"
+WISHLIST_COUNT_KEY = "counts:wishlist:{}"
+COUNT_TIMEOUT = 60 * 60 * 24
+
+
+def get_counts(user):
+    """Retorna (totalitem, wishitem) leyendo la caché; solo consulta la BD si falta la clave"""
+    if not user.is_authenticated:
+        return 0, 0
+
+    cart_key = CART_COUNT_KEY.format(user.pk)
+    wish_key = WISHLIST_COUNT_KEY.format(user.pk)
+    cached = cache.get_many([cart_key, wish_key])
+
+    totalitem = cached.get(cart_key)
+    if totalitem is None:
+        totalitem = Cart.objects.filter(user=user).count()
+        cache.set(cart_key, totalitem, COUNT_TIMEOUT)
+
+    wishitem = cached.get(wish_key)
+    if wishitem is None:
+        wishitem = Wishlist.objects.filter(user=user).count()
+        cache.set(wish_key, wishitem, COUNT_TIMEOUT)
+
+    return totalitem, wishitem
+
+
+def _delete_on_commit(key):
+    # Antes del commit otra petición podría contar las filas viejas y volver a cachearlas
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_cart_count(user):
+    """Invalida el contador del carrito (usuario o id) al confirmar la transacción"""
+    _delete_on_commit(CART_COUNT_KEY.format(getattr(user, 'pk', user)))
+
+
+def invalidate_wishlist_count(user):
+    """Invalida el contador de la wishlist (usuario o id) al confirmar la transacción"""
+    _delete_on_commit(WISHLIST_COUNT_KEY.format(getattr(user, 'pk', user)))
+
+
+async def ainvalidate_wishlist_count(user):
+    await cache.adelete(WISHLIST_COUNT_KEY.format(user.pk))
+
+
+# -----------------------------
+# Total del carrito (fila CartSummary por usuario)
+# Se ajusta con F() en la misma transacción que cambia la línea: la caché no
+# sirve aquí porque incr/add no son atómicos en todos los backends.
+# Las escrituras de Cart fuera de las vistas (admin, shell) borran la fila por
+# señal; lo que no manda señales (update() de precios, SQL a mano) se corrige
+# con un SUM completo cada CART_TOTAL_MAX_AGE segundos.
+# -----------------------------
+
+CART_TOTAL_MAX_AGE = 60 * 10
+
+def refresh_cart_total(user_id):
+    """Recalcula el total con un SUM y lo guarda; retorna el total en Decimal"""
+    with transaction.atomic():
+        # Bloquea al usuario: dos recálculos a la vez no se pisan con sumas viejas
+        list(User.objects.select_for_update().filter(pk=user_id).values_list('pk'))
+        total = Cart.objects.filter(user_id=user_id).total()
+        CartSummary.objects.update_or_create(user_id=user_id, defaults={'total': total, 'refreshed_at': timezone.now()})
+    return total
+
+
+def get_cart_total(user):
+    """Total del carrito en Decimal leyendo una fila; solo suma las líneas si falta o es viejo"""
+    row = CartSummary.objects.filter(user=user).values_list('total', 'refreshed_at').first()
+    if row is None or row[1] < timezone.now() - timedelta(seconds=CART_TOTAL_MAX_AGE):
+        return refresh_cart_total(user.pk)
+    return row[0]
+
+
+def adjust_cart_total(user, delta):
+    """Suma un delta (Decimal) al total; llamar dentro de la transacción que modifica la línea"""
+    if not CartSummary.objects.filter(user=user).update(total=F('total') + delta):
+        refresh_cart_total(user.pk)
+
+
+def invalidate_cart(user):
+    """Invalida el contador y recalcula el total (p. ej. al vaciar o fusionar el carrito)"""
+    invalidate_cart_count(user)
+    refresh_cart_total(user.pk)
+
+
+def forget_cart_total(user_id):
+    """Borra el total de un carrito; se recalcula en la próxima lectura"""
+    CartSummary.objects.filter(user_id=user_id).delete()
+
+
+def forget_cart_totals(product):
+    """Borra los totales de los carritos que tienen el producto (cambió su precio o se elimina)"""
+    CartSummary.objects.filter(user__cart__product=product).delete()
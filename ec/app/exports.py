@@ -0,0 +1,142 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .models import OrderPlaced, Payment
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'jsonl')
+
+
+# -----------------------------
+# Exportación de órdenes y pagos (CSV / JSONL) sin cargar todo en memoria
+# -----------------------------
+
+ORDER_FIELDS = [
+    ('id', 'id'),
+    ('fecha', 'ordered_date'),
+    ('estado', 'status'),
+    ('cantidad', 'cantidad'),
+    ('precio_unitario', 'unit_price'),
+    ('producto_id', 'product_id'),
+    ('producto', 'product_title'),
+    ('usuario', 'user__username'),
+    ('cliente', 'customer__name'),
+    ('localidad', 'customer__localidad'),
+    ('departamento', 'customer__departamento'),
+    ('codigo_postal', 'customer__codigopostal'),
+    ('guia', 'tracking_number'),
+    ('pago_id', 'payment_id'),
+    ('paypal_order_id', 'payment__order_id'),
+    ('pago_estado', 'payment__status'),
+    ('pagado', 'payment__paid'),
+]
+
+PAYMENT_FIELDS = [
+    ('id', 'id'),
+    ('fecha', 'created_at'),
+    ('usuario', 'user__username'),
+    ('monto', 'amount'),
+    ('pagado', 'paid'),
+    ('estado', 'status'),
+    ('paypal_order_id', 'order_id'),
+    ('email', 'payer_email'),
+]
+
+# tipo -> (modelo, campo de fecha, columnas)
+EXPORTS = {
+    'orders': (OrderPlaced, 'ordered_date', ORDER_FIELDS),
+    'payments': (Payment, 'created_at', PAYMENT_FIELDS),
+}
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(kind, start=None, end=None, status=None):
+    """
+    values_list de un tipo de exportación, ordenado por id.
+
+    `start` y `end` son fechas inclusivas. Los JOIN se hacen en la misma consulta.
+    """
+    model, date_field, fields = EXPORTS[kind]
+    qs = model.objects.order_by('pk')
+    if start:
+        qs = qs.filter(**{f'{date_field}__gte': day_start(start)})
+    if end:
+        qs = qs.filter(**{f'{date_field}__lt': day_start(end + timedelta(days=1))})
+    if status:
+        qs = qs.filter(status=status)
+    return qs.values_list(*[lookup for _, lookup in fields])
+
+
+def export_rows(kind, start=None, end=None, status=None, chunk_size=CHUNK_SIZE):
+    """Itera las filas (tuplas) por bloques de `chunk_size` con iterator()"""
+    return export_queryset(kind, start, end, status).iterator(chunk_size=chunk_size)
+
+
+async def aexport_rows(kind, start=None, end=None, status=None, chunk_size=CHUNK_SIZE):
+    """
+    Igual que export_rows pero asíncrono, para servir el stream desde ASGI.
+
+    Cada bloque se lee en el hilo de la BD con sync_to_async; no se usa aiterator()
+    porque con values_list abre el cursor dentro del event loop.
+    """
+    rows = export_rows(kind, start, end, status, chunk_size)  # generador: aún no consulta
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while chunk := await next_chunk():
+        for row in chunk:
+            yield row
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    return str(value)  # Decimal
+
+
+class _Echo:
+    """Archivo falso para csv.writer: devuelve la línea en lugar de guardarla"""
+
+    def write(self, value):
+        return value
+
+
+def _formatter(kind, fmt):
+    """(línea de encabezado o None, función fila -> línea) para el formato pedido"""
+    headers = [header for header, _ in EXPORTS[kind][2]]
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        return writer.writerow(headers), lambda row: writer.writerow([_plain(value) for value in row])
+    return None, lambda row: json.dumps(dict(zip(headers, map(_plain, row))), ensure_ascii=False) + '\n'
+
+
+def stream(kind, fmt, rows):
+    """Generador de líneas de texto en el formato pedido"""
+    header, line = _formatter(kind, fmt)
+    if header is not None:
+        yield header
+    for row in rows:
+        yield line(row)
+
+
+async def astream(kind, fmt, rows):
+    """
+    Versión asíncrona de stream() sobre aexport_rows().
+
+    Bajo ASGI Django consume un generador síncrono con sync_to_async(list), es
+    decir, lo carga completo en memoria; con un iterador asíncrono cada bloque
+    se envía apenas llega.
+    """
+    header, line = _formatter(kind, fmt)
+    if header is not None:
+        yield header
+    async for row in rows:
+        yield line(row)
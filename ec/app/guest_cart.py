@@ -0,0 +1,128 @@
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils.functional import cached_property
+
+from .counters import invalidate_cart
+from .models import Cart, Product
+from .money import ZERO
+
+COOKIE_NAME = 'guest_cart'
+COOKIE_SALT = 'app.guest_cart'
+COOKIE_MAX_AGE = 60 * 60 * 24 * 30
+MAX_LINES = 50  # mantiene la cookie por debajo de ~1 KB
+
+
+# -----------------------------
+# Carrito de invitados en una cookie firmada (sin escrituras en la BD)
+# -----------------------------
+
+class GuestLine:
+    """Línea del carrito de invitado con los mismos atributos que Cart.with_products()"""
+
+    def __init__(self, product, cantidad):
+        self.product = product
+        self.cantidad = cantidad
+        self.subtotal = cantidad * product.precio_descuento
+
+    @property
+    def total_cost(self):
+        return self.subtotal
+
+
+class GuestCart:
+    """
+    Carrito de un visitante anónimo: {product_id: cantidad} firmado en una cookie.
+
+    Lee igual que el queryset de Cart (with_products(), total(), count()) y se
+    modifica con add/minus/remove; `save(response)` escribe la cookie si cambió.
+    """
+
+    def __init__(self, request):
+        value = request.COOKIES.get(COOKIE_NAME)
+        try:
+            data = signing.loads(value, salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE) if value else {}
+        except signing.BadSignature:
+            data = {}  # alterada o vencida: se empieza de nuevo
+        self.lines = {int(pk): int(n) for pk, n in data.items() if pk.isdigit() and int(n) > 0}
+        self.changed = False
+
+    # Lectura (misma API que CartQuerySet)
+
+    @cached_property
+    def _products(self):
+        return Product.objects.in_bulk(list(self.lines))
+
+    def with_products(self):
+        return [
+            GuestLine(self._products[pk], cantidad) for pk, cantidad in self.lines.items() if pk in self._products
+        ]
+
+    def total(self):
+        return sum((line.subtotal for line in self.with_products()), ZERO)
+
+    def count(self):
+        return len(self.lines)
+
+    def exists(self):
+        return bool(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    # Escritura
+
+    def add(self, product_id):
+        if product_id not in self.lines and len(self.lines) >= MAX_LINES:
+            return False
+        self.lines[product_id] = self.lines.get(product_id, 0) + 1
+        self.changed = True
+        return True
+
+    def minus(self, product_id):
+        if self.lines.get(product_id, 0) > 1:
+            self.lines[product_id] -= 1
+            self.changed = True
+
+    def remove(self, product_id):
+        if self.lines.pop(product_id, None) is not None:
+            self.changed = True
+
+    def save(self, response):
+        if not self.changed:
+            return response
+        if not self.lines:
+            response.delete_cookie(COOKIE_NAME)
+            return response
+        value = signing.dumps({str(pk): n for pk, n in self.lines.items()}, salt=COOKIE_SALT, compress=True)
+        response.set_cookie(COOKIE_NAME, value, max_age=COOKIE_MAX_AGE, httponly=True, samesite='Lax')
+        return response
+
+
+def merge_into_cart(request, user, response):
+    """
+    Pasa el carrito de invitado a Cart al iniciar sesión y borra la cookie.
+
+    Una consulta lee los productos válidos junto con la cantidad que el usuario ya
+    tenía y un solo bulk_create(update_conflicts) escribe todas las líneas sumadas.
+    La lectura va dentro de la transacción con el usuario bloqueado (como
+    refresh_cart_total), así un add_to_cart simultáneo no se pisa con una cantidad vieja.
+    Retorna cuántas líneas escribió.
+    """
+    guest = GuestCart(request)
+    if not guest.lines:
+        return 0
+    in_cart = Cart.objects.filter(user=user, product=OuterRef('pk')).values('cantidad')[:1]
+    # default: la cantidad del carrito se suma y se vuelve a escribir, no puede venir atrasada
+    rows = (Product.objects.using('default').filter(pk__in=list(guest.lines))
+            .annotate(in_cart=Subquery(in_cart)).values_list('pk', 'in_cart'))
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk'))
+        lines = [Cart(user=user, product_id=pk, cantidad=(in_cart or 0) + guest.lines[pk]) for pk, in_cart in rows]
+        Cart.objects.bulk_create(
+            lines, update_conflicts=True, unique_fields=['user', 'product'], update_fields=['cantidad'],
+        )
+        invalidate_cart(user)
+    response.delete_cookie(COOKIE_NAME)
+    return len(lines)
@@ -0,0 +1,94 @@
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .catalog import bump_catalog_version
+
+
+# -----------------------------
+# Derivados redimensionados (AVIF/WebP/JPEG) de las imágenes
+# -----------------------------
+
+WIDTHS = (320, 640, 1280)
+FORMATS = tuple(f for f in ('avif', 'webp') if features.check(f)) + ('jpeg',)
+QUALITY = {'avif': 55, 'webp': 75, 'jpeg': 80}
+MIME = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def derivative_name(name, width, fmt):
+    """'product/c1.png' -> 'product/derivatives/c1-320.webp'"""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'derivatives', f"{stem}-{width}.{'jpg' if fmt == 'jpeg' else fmt}")
+
+
+def _encode(image, width, fmt):
+    copy = image.copy()
+    copy.thumbnail((width, width * 4), Image.LANCZOS)  # nunca agranda la original
+    if fmt == 'jpeg' and copy.mode != 'RGB':
+        background = Image.new('RGB', copy.size, 'white')
+        background.paste(copy, mask=copy.getchannel('A') if 'A' in copy.getbands() else None)
+        copy = background
+    buffer = BytesIO()
+    copy.save(buffer, format=fmt.upper(), quality=QUALITY[fmt], optimize=fmt == 'jpeg')
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, storage=None, force=False):
+    """Genera todos los anchos y formatos de una imagen; retorna los nombres creados"""
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    created = []
+    for width in WIDTHS:
+        for fmt in FORMATS:
+            target = derivative_name(name, width, fmt)
+            if storage.exists(target):
+                if not force:
+                    continue
+                storage.delete(target)
+            storage.save(target, ContentFile(_encode(image, width, fmt)))
+            created.append(target)
+    return created
+
+
+def has_derivatives(name, storage=None):
+    """True si ya existe el último derivado que se genera (el set está completo)"""
+    storage = storage or default_storage
+    return bool(name) and storage.exists(derivative_name(name, WIDTHS[-1], FORMATS[-1]))
+
+
+# -----------------------------
+# Generación en segundo plano al subir imágenes
+# -----------------------------
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _generate_quietly(name):
+    try:
+        if generate_derivatives(name):
+            bump_catalog_version()  # responsive_image y las páginas cacheadas pasan a usarlos
+    except (OSError, ValueError):
+        pass  # la plantilla cae a la imagen original
+
+
+def schedule_derivatives(name):
+    """Genera los derivados de una imagen recién subida sin bloquear la petición"""
+    global _executor
+    if not name or has_derivatives(name):
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-derivatives')
+    _executor.submit(_generate_quietly, name)
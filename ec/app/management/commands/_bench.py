@@ -0,0 +1,136 @@
+"""Utilidades compartidas por los comandos bench_* (base de datos temporal, datos y tiempos)."""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import OuterRef, Subquery
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+
+from app.models import CATEGORY_CHOICES, STATE_CHOICES, Customer, OrderPlaced, Payment, Product
+from app.orders import backfill_snapshots
+
+BATCH = 5000
+CATEGORIAS = [c for c, _ in CATEGORY_CHOICES]
+PALABRAS = [
+    'camisa', 'camisón', 'pantalón', 'gorra', 'zapato', 'conjunto', 'deportivo', 'algodón',
+    'negro', 'blanco', 'azul', 'rojo', 'clásico', 'edición', 'nike', 'adidas', 'slim', 'urbano',
+]
+
+
+@contextmanager
+def scratch_database():
+    """Crea una base de datos de prueba desechable para no tocar la de desarrollo"""
+    old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def timed(fn, repeat=20):
+    """Ejecuta fn varias veces y retorna la mediana en milisegundos"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+SILABAS = ['ka', 'lo', 'mi', 'ra', 'tu', 'ne', 'so', 'vi', 'da', 'pe', 'gu', 'zo', 'li', 'ba', 'fe', 'ro']
+
+
+def random_word(rng):
+    """Palabra sintética (modelo, color, marca...) para que el vocabulario no sea diminuto"""
+    return ''.join(rng.choice(SILABAS) for _ in range(rng.randint(2, 4)))
+
+
+def random_title(rng):
+    return f"{rng.choice(PALABRAS).capitalize()} {random_word(rng)} {random_word(rng)}"
+
+
+def seed_products(n, rng=None):
+    rng = rng or random.Random(1)
+    Product.objects.bulk_create((
+        Product(
+            title=f"{random_title(rng)} {i}",
+            selling_price=price + 5,
+            precio_descuento=price,
+            description=' '.join(rng.choice(PALABRAS) if rng.random() < 0.2 else random_word(rng) for _ in range(20)),
+            categoria=rng.choice(CATEGORIAS),
+            imagen_producto='product/c1.png',
+        )
+        for i, price in ((i, rng.randint(5, 120)) for i in range(n))
+    ), batch_size=BATCH)
+    return list(Product.objects.values_list('pk', flat=True))
+
+
+def seed_users(n, rng=None):
+    rng = rng or random.Random(2)
+    offset = User.objects.count()
+    User.objects.bulk_create(
+        (User(username=f"bench{offset + i}", password='!') for i in range(n)), batch_size=BATCH,
+    )
+    users = list(User.objects.filter(username__startswith='bench').values_list('pk', flat=True))
+    states = [label for _, label in STATE_CHOICES]
+    Customer.objects.bulk_create((
+        Customer(user_id=u, name=f"Cliente {u}", localidad='Centro', departamento=rng.choice(states), codigopostal=1101)
+        for u in users
+    ), batch_size=BATCH)
+    return users
+
+
+def seed_pairs(model, users, products, n, rng=None, **extra):
+    """Crea n pares (user, product) únicos para Cart o Wishlist"""
+    rng = rng or random.Random(3)
+    seen = set()
+    objs = []
+    while len(objs) < n:
+        pair = (rng.choice(users), rng.choice(products))
+        if pair not in seen:
+            seen.add(pair)
+            objs.append(model(user_id=pair[0], product_id=pair[1], **extra))
+    model.objects.bulk_create(objs, batch_size=BATCH)
+
+
+def seed_orders(users, products, n_lines, lines_per_payment=4, days=365, rng=None):
+    """Crea n_lines órdenes agrupadas en pagos, repartidas en los últimos `days` días"""
+    rng = rng or random.Random(4)
+    customers = dict(Customer.objects.filter(user__in=users).values_list('user_id', 'pk'))
+    now = timezone.now()
+    statuses = ['Pending', 'Accepted', 'Packed', 'On The Way', 'Delivered', 'Cancel']
+    created = 0
+    while created < n_lines:
+        chunk = min(BATCH, n_lines - created)
+        payments = []
+        for _ in range(max(1, chunk // lines_per_payment)):
+            payments.append(Payment(
+                user_id=rng.choice(users), amount=0, paid=True, status='COMPLETED',
+                created_at=now - timedelta(days=rng.random() * days),
+            ))
+        payments = Payment.objects.bulk_create(payments)
+        lines = []
+        for i in range(chunk):
+            payment = payments[i % len(payments)]
+            lines.append(OrderPlaced(
+                user_id=payment.user_id, customer_id=customers[payment.user_id],
+                product_id=rng.choice(products), cantidad=rng.randint(1, 3),
+                payment=payment, status=rng.choice(statuses),
+            ))
+        OrderPlaced.objects.bulk_create(lines)
+        # auto_now_add pone la fecha actual: se copia la fecha del pago en un solo UPDATE
+        OrderPlaced.objects.filter(payment__in=payments).update(
+            ordered_date=Subquery(Payment.objects.filter(pk=OuterRef('payment_id')).values('created_at')[:1])
+        )
+        created += chunk
+    backfill_snapshots()
+    return created
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.orders import backfill_snapshots
+
+
+class Command(BaseCommand):
+    help = "Copia precio, título e imagen del producto a las órdenes anteriores a la copia en OrderPlaced"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = backfill_snapshots(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{total} órdenes actualizadas"))
@@ -0,0 +1,89 @@
+import time
+from contextlib import ExitStack, contextmanager
+from unittest.mock import patch
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import Client
+from django.urls import reverse
+
+from app.models import Cart, OrderPlaced, OrderPlacedQuerySet, Wishlist
+
+from ._bench import scratch_database, seed_orders, seed_pairs, seed_products, seed_users, timed
+
+PAGES = [
+    ('OrderPlaced', OrderPlaced, ''),
+    ('OrderPlaced ?status', OrderPlaced, '?status__exact=Delivered'),
+    ('OrderPlaced ?año', OrderPlaced, '?ordered_date__year={year}'),
+    ('Cart', Cart, ''),
+    ('Wishlist', Wishlist, ''),
+]
+
+
+@contextmanager
+def default_admin(model):
+    """Configuración por defecto del admin (sin list_select_related, conteo estimado ni fechas por índice)"""
+    model_admin = admin.site._registry[model]
+    with ExitStack() as stack:
+        for name, value in (('list_select_related', False), ('paginator', Paginator),
+                            ('show_full_result_count', True), ('ordering', None)):
+            stack.enter_context(patch.object(model_admin, name, value))
+        stack.enter_context(patch.object(OrderPlacedQuerySet, 'datetimes', QuerySet.datetimes))
+        yield
+
+
+class Command(BaseCommand):
+    help = "Mide los listados del admin (tiempo y consultas) antes y después de las optimizaciones (BD temporal)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--rows', type=int, default=200000, help="Filas de OrderPlaced, Cart y Wishlist")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        with scratch_database():
+            self.stdout.write("Generando datos...")
+            products = seed_products(options['products'])
+            users = seed_users(options['users'])
+            seed_orders(users, products, options['rows'])
+            seed_pairs(Cart, users, products, options['rows'])
+            seed_pairs(Wishlist, users, products, options['rows'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            client = Client()
+            client.force_login(User.objects.create_superuser('bench-admin', 'admin@example.com', '!'))
+            year = OrderPlaced.objects.latest('ordered_date').ordered_date.year
+
+            self.stdout.write(f"\n{'listado':<22} {'antes':>10} {'#sql':>5} {'después':>10} {'#sql':>5}")
+            for name, model, query in PAGES:
+                url = reverse(f'admin:app_{model._meta.model_name}_changelist') + query.format(year=year)
+                with default_admin(model):
+                    before = self.measure(client, url, options['repeat'])
+                after = self.measure(client, url, options['repeat'])
+                self.stdout.write(f"{name:<22} {before[0]:>8.1f}ms {before[1]:>5} {after[0]:>8.1f}ms {after[1]:>5}")
+
+    def measure(self, client, url, repeat):
+        queries = []
+
+        def log(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append(((time.perf_counter() - start) * 1000, sql))
+
+        # CaptureQueriesContext no sirve aquí: request_started reinicia connection.queries
+        with connection.execute_wrapper(log):
+            response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        if self.verbosity > 1:
+            for ms, sql in queries:
+                self.stdout.write(f"    {ms:8.1f}ms  {sql[:150]}")
+        return timed(lambda: client.get(url), repeat), len(queries)
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from app.models import Cart, Payment
+from app.paypal import AsyncPayPalClient, PayPalClient
+from app.paypal_stub import StubPayPalServer
+from app.verification import averify_with_retries, verify_with_retries
+
+from ._bench import percentile, scratch_database, seed_products, seed_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara confirmaciones de pago lentas (hilos + requests contra un event loop + httpx) y los "
+        "endpoints AJAX del carrito servidos por WSGI (hilos) y por ASGI (async), en una BD temporal"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=200)
+        parser.add_argument('--delay', type=float, default=0.5, help="Segundos que tarda el stub de PayPal")
+        parser.add_argument('--threads', type=int, default=2, help="Hilos del verificador síncrono")
+        parser.add_argument('--concurrency', type=int, default=50, help="Verificaciones a la vez en el event loop")
+        parser.add_argument('--clients', type=int, default=16, help="Usuarios simultáneos en el carrito")
+        parser.add_argument('--requests', type=int, default=50, help="Peticiones de carrito por usuario")
+
+    def handle(self, *args, **options):
+        db = connections['default'].settings_dict
+        sqlite = db['ENGINE'] == 'django.db.backends.sqlite3'
+        if sqlite:
+            # Varios hilos escriben a la vez: un archivo en WAL y no la BD en memoria
+            fd, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+            db.setdefault('TEST', {})['NAME'] = path
+        try:
+            with scratch_database():
+                self.stdout.write("Generando datos...")
+                self.products = seed_products(200)
+                self.users = seed_users(options['clients'])
+                self.bench_confirmations(options)
+                self.bench_cart(options)
+        finally:
+            if sqlite:
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+
+    # -----------------------------
+    # Confirmaciones de pago
+    # -----------------------------
+
+    def _payments(self, server, n):
+        orders = [server.create_order('10.00') for _ in range(n)]
+        Payment.objects.bulk_create(Payment(user_id=self.users[0], amount=10, order_id=o['id']) for o in orders)
+        return list(Payment.objects.filter(order_id__in=[o['id'] for o in orders]).values_list('pk', flat=True))
+
+    def bench_confirmations(self, options):
+        server = StubPayPalServer(delay=options['delay']).start()
+        n = options['payments']
+        self.stdout.write(f"\nConfirmaciones: {n} pagos, PayPal tarda {options['delay']} s")
+        try:
+            client = PayPalClient(base_url=server.base_url, client_id='id', client_secret='secret')
+            payments = self._payments(server, n)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options['threads']) as pool:
+                list(pool.map(lambda pk: verify_with_retries(pk, client=client), payments))
+            self._confirmations(f"{options['threads']} hilos + requests", n, time.perf_counter() - start)
+
+            if find_spec('httpx') is None:
+                self.stdout.write("  event loop + httpx: httpx no está instalado, se omite")
+                return
+            payments = self._payments(server, n)
+
+            async def run():
+                aclient = AsyncPayPalClient(base_url=server.base_url, client_id='id', client_secret='secret')
+                slots = asyncio.Semaphore(options['concurrency'])
+
+                async def verify(pk):
+                    async with slots:
+                        return await averify_with_retries(pk, aclient)
+                try:
+                    await asyncio.gather(*(verify(pk) for pk in payments))
+                finally:
+                    await aclient.aclose()
+
+            start = time.perf_counter()
+            asyncio.run(run())
+            self._confirmations(f"1 hilo, event loop ({options['concurrency']} a la vez)", n, time.perf_counter() - start)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def _confirmations(self, name, n, elapsed):
+        self.stdout.write(f"  {name:<36} {elapsed:>7.1f} s {n / elapsed:>8.1f} pagos/s")
+
+    # -----------------------------
+    # Endpoints del carrito
+    # -----------------------------
+
+    def _reset_cart(self):
+        Cart.objects.all().delete()
+        Cart.objects.bulk_create(Cart(user_id=u, product_id=self.products[0]) for u in self.users)
+
+    def bench_cart(self, options):
+        urls = [reverse('pluscart'), reverse('minuscart')]
+        params = {'prod_id': self.products[0]}
+        n = options['requests']
+        self.stdout.write(f"\nCarrito: {options['clients']} usuarios x {n} peticiones plus/minus")
+
+        users = User.objects.in_bulk(self.users)
+        self._reset_cart()
+        connections.close_all()
+
+        def wsgi_user(user_id):
+            client = Client()
+            client.force_login(users[user_id])
+            samples = []
+            for i in range(n):
+                start = time.perf_counter()
+                response = client.get(urls[i % 2], params)
+                samples.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f"{urls[i % 2]} respondió {response.status_code}")
+            connections.close_all()
+            return samples
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(self.users)) as pool:
+            samples = [ms for user in pool.map(wsgi_user, self.users) for ms in user]
+        self._cart_row("WSGI, un hilo por usuario", samples, time.perf_counter() - start)
+
+        self._reset_cart()
+
+        async def asgi_user(user_id):
+            client = AsyncClient()
+            await client.aforce_login(users[user_id])
+            samples = []
+            for i in range(n):
+                start = time.perf_counter()
+                response = await client.get(urls[i % 2], params)
+                samples.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f"{urls[i % 2]} respondió {response.status_code}")
+            return samples
+
+        async def run():
+            return await asyncio.gather(*(asgi_user(pk) for pk in self.users))
+
+        start = time.perf_counter()
+        samples = [ms for user in asyncio.run(run()) for ms in user]
+        self._cart_row("ASGI, un event loop", samples, time.perf_counter() - start)
+
+    def _cart_row(self, name, samples, elapsed):
+        self.stdout.write(
+            f"  {name:<36} {len(samples) / elapsed:>7.0f} pet/s  p50 {percentile(samples, 50):>6.1f}ms"
+            f"  p99 {percentile(samples, 99):>6.1f}ms"
+        )
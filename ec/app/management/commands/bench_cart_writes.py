@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.db.models import F
+
+from app.models import Cart
+
+from ._bench import scratch_database, seed_products, seed_users
+
+
+def _worker(args):
+    """Proceso hijo: `writes` clics de "agregar al carrito" como add_to_cart; retorna (ok, errores)"""
+    users, products, writes, seed = args
+    connections.close_all()  # no compartir la conexión heredada del padre
+    rng = random.Random(seed)
+    ok = errors = 0
+    for _ in range(writes):
+        user, product = rng.choice(users), rng.choice(products)
+        try:
+            if not Cart.objects.filter(user_id=user, product_id=product).update(cantidad=F('cantidad') + 1):
+                Cart.objects.create(user_id=user, product_id=product)
+            ok += 1
+        except OperationalError:  # database is locked
+            errors += 1
+    connections.close_all()
+    return ok, errors
+
+
+class Command(BaseCommand):
+    help = "Mide escrituras del carrito por segundo con 1..N procesos (como workers de gunicorn) en una BD temporal"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument('--writes', type=int, default=500, help="Escrituras por proceso")
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--products', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        db = connections['default'].settings_dict
+        sqlite = db['ENGINE'] == 'django.db.backends.sqlite3'
+        profiles = [('perfil actual', db.get('OPTIONS', {}))]
+        if sqlite:
+            # Se mide el perfil del servidor: gunicorn activa WAL (SQLITE_WAL=1)
+            init_command = '; '.join(settings.SQLITE_PRAGMAS + settings.SQLITE_WAL_PRAGMAS)
+            profiles[0] = ('perfil actual', {**profiles[0][1], 'init_command': init_command})
+            # Los procesos necesitan un archivo compartido (la BD de pruebas sería en memoria)
+            fd, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+            db.setdefault('TEST', {})['NAME'] = path
+            profiles.insert(0, ("SQLite por defecto", {}))
+        self.stdout.write(f"Motor: {db['ENGINE']}  CONN_MAX_AGE={db.get('CONN_MAX_AGE')}")
+
+        with scratch_database():
+            products = seed_products(options['products'])
+            users = seed_users(options['users'])
+            results = {}
+            for name, db_options in profiles:
+                connections.close_all()
+                db['OPTIONS'] = db_options
+                if sqlite:
+                    with connections['default'].cursor() as cursor:
+                        cursor.execute(f"PRAGMA journal_mode={'WAL' if db_options else 'DELETE'}")
+                for workers in options['workers']:
+                    Cart.objects.all().delete()
+                    connections.close_all()
+                    jobs = [(users, products, options['writes'], seed) for seed in range(workers)]
+                    start = time.perf_counter()
+                    with multiprocessing.get_context('fork').Pool(workers) as pool:
+                        done = pool.map(_worker, jobs)
+                    elapsed = time.perf_counter() - start
+                    ok = sum(d[0] for d in done)
+                    results[name, workers] = (ok / elapsed, sum(d[1] for d in done))
+
+        if sqlite:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+        self.stdout.write(f"\n{'workers':>8} " + ' '.join(f"{name:>28}" for name, _ in profiles))
+        for workers in options['workers']:
+            cells = ' '.join(
+                f"{results[name, workers][0]:>15.0f} escr/s {results[name, workers][1]:>4} err" for name, _ in profiles
+            )
+            self.stdout.write(f"{workers:>8} {cells}")
@@ -0,0 +1,98 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.models import Cart, OrderPlaced, Payment, Product, Wishlist
+
+from ._bench import scratch_database, seed_orders, seed_pairs, seed_products, seed_users, timed
+
+
+class Command(BaseCommand):
+    help = "Compara planes y tiempos de las consultas calientes con y sin los índices de 0004 (BD temporal)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--rows', type=int, default=100000, help="Filas de Cart, Wishlist y OrderPlaced")
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write("Generando datos...")
+            products = seed_products(options['products'])
+            users = seed_users(options['users'])
+            seed_pairs(Cart, users, products, options['rows'])
+            seed_pairs(Wishlist, users, products, options['rows'])
+            seed_orders(users, products, options['rows'])
+            order_id = 'BENCH-ORDER'
+            Payment.objects.filter(pk=Payment.objects.order_by('?').values('pk')[:1]).update(order_id=order_id)
+
+            rng = random.Random(5)
+            cart = Cart.objects.order_by('?').first()
+            wish = Wishlist.objects.order_by('?').first()
+            title = Product.objects.values_list('title', flat=True)[rng.randrange(len(products))]
+            user = rng.choice(users)
+            queries = {
+                'Cart(user, product)': Cart.objects.filter(user_id=cart.user_id, product_id=cart.product_id),
+                'Wishlist(user, product)': Wishlist.objects.filter(user_id=wish.user_id, product_id=wish.product_id),
+                'Product(categoria)': Product.objects.filter(categoria='CA').values('title')[:24],
+                'Product(title)': Product.objects.filter(title=title),
+                'OrderPlaced(user, -ordered_date)': OrderPlaced.objects.filter(user_id=user).order_by('-ordered_date')[:20],
+                'Payment(order_id)': Payment.objects.filter(order_id=order_id),
+            }
+
+            self.drop_indexes()
+            before = self.measure(queries, options['repeat'])
+            self.create_indexes()
+            after = self.measure(queries, options['repeat'])
+
+            for name in queries:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}"))
+                self.stdout.write(f"  sin índice : {before[name][0]:8.3f} ms  | {before[name][1]}")
+                self.stdout.write(f"  con índice : {after[name][0]:8.3f} ms  | {after[name][1]}")
+
+    def model_indexes(self):
+        """Restricciones primero: en SQLite cambiarlas reconstruye la tabla con sus índices"""
+        models = (Product, Cart, Wishlist, OrderPlaced, Payment)
+        for model in models:
+            for constraint in model._meta.constraints:
+                yield model, 'constraint', constraint
+        for model in models:
+            for index in model._meta.indexes:
+                yield model, 'index', index
+
+    def existing(self, model):
+        with connection.cursor() as cursor:
+            return connection.introspection.get_constraints(cursor, model._meta.db_table)
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, kind, obj in self.model_indexes():
+                if obj.name not in self.existing(model):
+                    continue
+                if kind == 'index':
+                    editor.remove_index(model, obj)
+                    continue
+                # SQLite reconstruye la tabla a partir de Meta: se oculta la restricción mientras tanto
+                constraints = model._meta.constraints
+                model._meta.constraints = [c for c in constraints if c is not obj]
+                try:
+                    editor.remove_constraint(model, obj)
+                finally:
+                    model._meta.constraints = constraints
+
+    def create_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, kind, obj in self.model_indexes():
+                if obj.name not in self.existing(model):
+                    (editor.add_index if kind == 'index' else editor.add_constraint)(model, obj)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def measure(self, queries, repeat):
+        results = {}
+        for name, qs in queries.items():
+            plan = ' / '.join(line.strip() for line in qs.explain().splitlines())
+            results[name] = (timed(lambda: list(qs.all()), repeat), plan)
+        return results
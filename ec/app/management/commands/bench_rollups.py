@@ -0,0 +1,72 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from app.analytics import refresh_rollups, sales_dashboard
+from app.models import OrderPlaced
+from app.money import line_total
+from app.workflow import change_status
+
+from ._bench import scratch_database, seed_orders, seed_products, seed_users, timed
+
+
+def dashboard_from_orders(days):
+    """Lo mismo que sales_dashboard pero agrupando OrderPlaced directamente (lo que se evita)"""
+    start = timezone.now() - timedelta(days=days)
+    orders = OrderPlaced.objects.filter(ordered_date__gte=start).exclude(status='Cancel')
+    totals = {'lines': Count('pk'), 'units': Sum('cantidad'), 'revenue': Sum(line_total(price='unit_price'))}
+    return (
+        list(orders.annotate(day=TruncDate('ordered_date')).values('day').annotate(**totals).order_by('day')),
+        list(orders.values('product__categoria').annotate(**totals).order_by()),
+        list(orders.values('customer__departamento').annotate(**totals).order_by()),
+        list(orders.values('product_id').annotate(**totals).order_by('-revenue')[:10]),
+    )
+
+
+class Command(BaseCommand):
+    help = "Mide la actualización de las ventas diarias y el tablero contra consultas sobre OrderPlaced (BD temporal)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--rows', type=int, default=10_000_000, help="Filas de OrderPlaced")
+        parser.add_argument('--new', type=int, default=10000, help="Órdenes nuevas antes de la corrida incremental")
+        parser.add_argument('--cancel', type=int, default=1000, help="Órdenes antiguas canceladas antes de la corrida incremental")
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write("Generando datos...")
+            products = seed_products(options['products'])
+            users = seed_users(options['users'])
+            seed_orders(users, products, options['rows'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            start = time.perf_counter()
+            days = refresh_rollups()
+            self.stdout.write(f"Carga inicial       : {days:>4} días {(time.perf_counter() - start):8.1f} s")
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            seed_orders(users, products, options['new'], days=1, rng=random.Random(6))
+            pending = OrderPlaced.objects.filter(status='Pending').order_by('pk').values_list('pk', flat=True)
+            change_status(OrderPlaced.objects.filter(pk__in=list(pending[:options['cancel']])), 'Cancel')
+            start = time.perf_counter()
+            days = refresh_rollups()
+            self.stdout.write(f"Incremental         : {days:>4} días {(time.perf_counter() - start):8.1f} s")
+            start = time.perf_counter()
+            days = refresh_rollups()
+            self.stdout.write(f"Sin cambios         : {days:>4} días {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+            self.stdout.write(f"\n{'tablero':<10} {'OrderPlaced':>12} {'rollups':>10}")
+            for days in (7, 30, 365):
+                before = timed(lambda: dashboard_from_orders(days), options['repeat'])
+                after = timed(lambda: sales_dashboard(days), options['repeat'])
+                self.stdout.write(f"{f'{days} días':<10} {before:>10.1f}ms {after:>8.1f}ms")
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from app.models import Product
+from app.search import rebuild_index, search
+
+from ._bench import scratch_database, seed_products, timed
+
+QUERIES = ['camison', 'camisón azul', 'pantalon kalo', 'gorra nike', 'clasico rami', 'zapato deportivo negro', 'karatu']
+
+
+class Command(BaseCommand):
+    help = "Compara la búsqueda por icontains con el índice de texto completo (BD temporal)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write(f"Generando {options['products']} productos...")
+            seed_products(options['products'])
+            self.stdout.write(f"Indexando... ({timed(rebuild_index, 1):.0f} ms)")
+
+            self.stdout.write(f"\n{'consulta':<25} {'icontains':>12} {'icontains p1':>14} {'índice p1':>12} {'icontains #':>12} {'índice #':>9}")
+            for query in QUERIES:
+                old = Product.objects.filter(Q(title__icontains=query))
+                old_all = timed(lambda: list(old.all()), options['repeat'])
+                old_page = timed(lambda: list(old.all()[:24]), options['repeat'])
+                new = timed(lambda: list(search(query)), options['repeat'])
+                old_matches = old.count()
+                matches = len(search(query).object_list)
+                self.stdout.write(
+                    f"{query:<25} {old_all:>10.2f}ms {old_page:>12.2f}ms {new:>10.2f}ms {old_matches:>12} {matches:>9}"
+                )
+            self.stdout.write("\n# = coincidencias (icontains: total, índice: primera página). "
+                              "icontains no ignora acentos ni busca en la descripción.")
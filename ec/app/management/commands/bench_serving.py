@@ -0,0 +1,197 @@
+import http.client
+import importlib.util
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app.models import CATEGORY_CHOICES
+from app.recommendations import refresh_recommendations
+
+from ._bench import percentile, scratch_database, seed_orders, seed_products, seed_users
+
+MODES = ('sync', 'gthread', 'asgi')
+CONFIG = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+
+
+def page_urls(products, rng):
+    """Páginas principales que se reparten la carga: (nombre, generador de URL)"""
+    categorias = [c for c, _ in CATEGORY_CHOICES]
+    return [
+        ('home', lambda: '/'),
+        ('categoria', lambda: f'/categoria/{rng.choice(categorias)}'),
+        ('producto', lambda: f'/product-detail/{rng.choice(products)}'),
+        ('búsqueda', lambda: f'/search/?search={rng.choice(["camisa", "gorra", "zapato", "nike+azul"])}'),
+    ]
+
+
+def _client(port, pages, deadline, samples, errors, seed):
+    """Un cliente con su propia conexión keep-alive pidiendo páginas al azar hasta `deadline`"""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.perf_counter() < deadline:
+        name, url = rng.choice(pages)
+        start = time.perf_counter()
+        try:
+            conn.request('GET', url())
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            ok = False
+        if ok:
+            samples[name].append((time.perf_counter() - start) * 1000)
+        else:
+            errors[name] += 1
+    conn.close()
+
+
+def _wait_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            conn.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        "Levanta gunicorn con gunicorn.conf.py en cada WEB_MODE sobre una BD temporal y mide "
+        "peticiones/s y latencia p99 de las páginas principales"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--concurrency', type=int, default=16, help="Clientes simultáneos")
+        parser.add_argument('--duration', type=float, default=20, help="Segundos de carga por modo")
+        parser.add_argument('--workers', type=int, help="WEB_CONCURRENCY (por defecto el de gunicorn.conf.py)")
+        parser.add_argument('--threads', type=int, help="WEB_THREADS (por defecto el de gunicorn.conf.py)")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--rows', type=int, default=50000, help="Filas de OrderPlaced")
+
+    def handle(self, *args, **options):
+        db = connections['default'].settings_dict
+        if db['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("bench_serving usa una BD SQLite temporal; corre sin DATABASE_URL")
+        modes = options['modes']
+        if 'asgi' in modes and importlib.util.find_spec('uvicorn') is None:
+            self.stderr.write("uvicorn no está instalado: se omite el modo asgi")
+            modes = [mode for mode in modes if mode != 'asgi']
+
+        # Los workers de gunicorn abren la misma BD: tiene que ser un archivo
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        db.setdefault('TEST', {})['NAME'] = path
+        results = {}
+        try:
+            with scratch_database():
+                self.stdout.write("Generando datos...")
+                products = seed_products(options['products'])
+                users = seed_users(options['users'])
+                seed_orders(users, products, options['rows'])
+                refresh_recommendations()
+                connections.close_all()
+                for mode in modes:
+                    results[mode] = self.run_mode(mode, path, products, options)
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+        self.report(results, options)
+
+    def run_mode(self, mode, path, products, options):
+        env = {k: v for k, v in os.environ.items() if not k.startswith('DATABASE_')}
+        env.update(WEB_MODE=mode, PORT=str(options['port']), SQLITE_PATH=path, WEB_ACCESS_LOG='0')
+        if options['workers']:
+            env['WEB_CONCURRENCY'] = str(options['workers'])
+        if options['threads']:
+            env['WEB_THREADS'] = str(options['threads'])
+        self.stdout.write(f"\n[{mode}] levantando gunicorn...")
+        # El log va a un archivo: un PIPE sin leer podría llenarse y bloquear a gunicorn.
+        # Cada modo empieza con la caché compartida vacía.
+        with tempfile.TemporaryFile('w+') as log, tempfile.TemporaryDirectory() as cache_dir:
+            env['CACHE_URL'] = f'file://{cache_dir}'
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', CONFIG], env=env, stdout=subprocess.DEVNULL, stderr=log,
+            )
+            try:
+                if not _wait_ready(options['port'], process):
+                    process.kill()
+                    process.wait()
+                    log.seek(0)
+                    raise CommandError(f"gunicorn ({mode}) no respondió:\n{log.read()[-2000:]}")
+                pages = page_urls(products, random.Random(7))
+                # Calentamiento: cada worker arma sus cachés antes de medir
+                self._load(options['port'], pages, min(options['concurrency'], 4), 2)
+                samples, errors, elapsed = self._load(
+                    options['port'], pages, options['concurrency'], options['duration'],
+                )
+            finally:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+            log.seek(0)
+            ready = [line[line.index('WEB_MODE='):].strip() for line in log if 'WEB_MODE=' in line]
+        return samples, errors, elapsed, ready[0] if ready else ''
+
+    def _load(self, port, pages, concurrency, duration):
+        samples, errors = defaultdict(list), defaultdict(int)
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        clients = [
+            threading.Thread(target=_client, args=(port, pages, deadline, samples, errors, seed))
+            for seed in range(concurrency)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        return samples, errors, time.perf_counter() - start
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"\n{options['concurrency']} clientes, {options['duration']:.0f} s por modo "
+            f"(clientes y servidor en la misma máquina)"
+        )
+        self.stdout.write(f"\n{'modo':<8} {'pet/s':>8} {'p50':>8} {'p99':>8} {'errores':>8}  configuración")
+        for mode, (samples, errors, elapsed, config) in results.items():
+            every = [ms for page in samples.values() for ms in page]
+            if not every:
+                self.stdout.write(f"{mode:<8} {'sin respuestas':>26} {sum(errors.values()):>8}")
+                continue
+            self.stdout.write(
+                f"{mode:<8} {len(every) / elapsed:>8.0f} {percentile(every, 50):>6.1f}ms "
+                f"{percentile(every, 99):>6.1f}ms {sum(errors.values()):>8}  {config}"
+            )
+        pages = [name for name, _ in page_urls([0], random.Random())]
+        self.stdout.write(f"\np99 por página: {'modo':<8} " + ' '.join(f"{name:>10}" for name in pages))
+        for mode, (samples, _, _, _) in results.items():
+            cells = ' '.join(
+                f"{percentile(samples[name], 99):>8.1f}ms" if samples[name] else f"{'-':>10}" for name in pages
+            )
+            self.stdout.write(f"{'':<16}{mode:<8} {cells}")
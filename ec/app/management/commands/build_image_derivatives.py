@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import django
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand
+
+from app.catalog import bump_catalog_version
+from app.images import generate_derivatives
+from app.models import Product
+
+STATIC_ROOT = Path(__file__).resolve().parents[2] / 'static'
+EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def _build(location, name, force):
+    storage = FileSystemStorage(location=location) if location else default_storage
+    return name, generate_derivatives(name, storage=storage, force=force)
+
+
+class Command(BaseCommand):
+    help = "Genera en paralelo los derivados AVIF/WebP/JPEG de las imágenes de productos (y de static/ con --static)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--static', action='store_true', help="Procesar app/static/app/images en lugar de MEDIA_ROOT")
+        parser.add_argument('--force', action='store_true', help="Regenerar aunque ya existan")
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        if options['static']:
+            location = str(STATIC_ROOT)
+            names = sorted(
+                path.relative_to(STATIC_ROOT).as_posix()
+                for path in (STATIC_ROOT / 'app' / 'images').rglob('*')
+                if path.suffix.lower() in EXTENSIONS and 'derivatives' not in path.parts
+            )
+        else:
+            location = None
+            names = sorted(set(
+                Product.objects.exclude(imagen_producto='').values_list('imagen_producto', flat=True)
+            ))
+
+        self.stdout.write(f"{len(names)} imágenes, {options['workers']} procesos")
+        created = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            futures = [pool.submit(_build, location, name, options['force']) for name in names]
+            for future in as_completed(futures):
+                try:
+                    name, files = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Error: {e}")
+                    continue
+                created += len(files)
+                self.stdout.write(f"  {name}: {len(files)} derivados")
+        if created and location is None:
+            bump_catalog_version()  # las plantillas dejan de usar la existencia cacheada
+        self.stdout.write(self.style.SUCCESS(f"{created} archivos generados, {failed} errores"))
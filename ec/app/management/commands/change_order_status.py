@@ -0,0 +1,38 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from app.models import STATUS_CHOICES, OrderPlaced
+from app.workflow import BATCH_SIZE, change_status
+
+
+class Command(BaseCommand):
+    help = "Pasa líneas de orden a otro estado en lotes (valida las transiciones y guarda el historial)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('status', choices=[code for code, _ in STATUS_CHOICES])
+        parser.add_argument('--from', dest='from_status', choices=[code for code, _ in STATUS_CHOICES],
+                            help="Solo líneas en este estado")
+        parser.add_argument('--ids', help="Ids de OrderPlaced separados por coma")
+        parser.add_argument('--before', help="Solo órdenes anteriores a esta fecha (AAAA-MM-DD)")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Filas por UPDATE/transacción (1000-10000)")
+
+    def handle(self, *args, **options):
+        qs = OrderPlaced.objects.all()
+        if options['from_status']:
+            qs = qs.filter(status=options['from_status'])
+        if options['ids']:
+            try:
+                qs = qs.filter(pk__in=[int(pk) for pk in options['ids'].split(',')])
+            except ValueError:
+                raise CommandError("--ids debe ser una lista de números separados por coma")
+        if options['before']:
+            before = parse_date(options['before'])
+            if before is None:
+                raise CommandError("--before debe tener el formato AAAA-MM-DD")
+            qs = qs.filter(ordered_date__lt=timezone.make_aware(datetime.combine(before, time.min)))
+
+        changed = change_status(qs, options['status'], source='command', batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{changed} líneas pasaron a '{options['status']}'"))
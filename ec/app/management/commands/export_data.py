@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from app.exports import CHUNK_SIZE, EXPORTS, FORMATS, export_rows, stream
+
+
+class Command(BaseCommand):
+    help = "Exporta órdenes o pagos en CSV/JSONL leyendo la BD por bloques (memoria constante)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(EXPORTS), default='orders')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--start', help="Desde esta fecha, inclusive (AAAA-MM-DD)")
+        parser.add_argument('--end', help="Hasta esta fecha, inclusive (AAAA-MM-DD)")
+        parser.add_argument('--status')
+        parser.add_argument('--output', '-o', help="Archivo de salida (por defecto la salida estándar)")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        dates = {}
+        for name in ('start', 'end'):
+            try:
+                dates[name] = parse_date(options[name]) if options[name] else None
+            except ValueError:  # bien formada pero inexistente, como 2024-02-30
+                dates[name] = None
+            if options[name] and dates[name] is None:
+                raise CommandError(f"--{name} debe ser una fecha válida con el formato AAAA-MM-DD")
+
+        rows = export_rows(options['kind'], status=options['status'], chunk_size=options['chunk_size'], **dates)
+        lines = stream(options['kind'], options['format'], rows)
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        written = 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+            for line in lines:
+                out.write(line)
+                written += 1
+        if options['format'] == 'csv':
+            written -= 1  # encabezado
+        self.stderr.write(f"{written} filas exportadas a {options['output']}")
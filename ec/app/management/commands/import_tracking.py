@@ -0,0 +1,36 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import STATUS_CHOICES
+from app.workflow import BATCH_SIZE, import_tracking
+
+
+class Command(BaseCommand):
+    help = "Importa un CSV de la transportadora (order,tracking_number[,status]) leyéndolo por lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--status', default='On The Way', choices=[code for code, _ in STATUS_CHOICES],
+                            help="Estado para las filas sin columna status")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            f = open(options['path'], newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(e)
+        with f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or 'order' not in reader.fieldnames:
+                raise CommandError("El CSV necesita al menos la columna 'order'")
+            result = import_tracking(
+                reader, default_status=options['status'], batch_size=options['batch_size'],
+            )
+
+        for line, message in result['errors']:
+            self.stderr.write(f"Línea {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rows']} filas leídas, {result['changed']} líneas cambiaron de estado, "
+            f"{len(result['errors'])} errores"
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from app.paypal_stub import StubPayPalServer
+
+
+class Command(BaseCommand):
+    help = "Levanta un servidor stub de la API de PayPal (usar con PAYPAL_API_BASE)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=0, help="Latencia simulada por consulta (segundos)")
+
+    def handle(self, *args, **options):
+        server = StubPayPalServer((options['host'], options['port']), delay=options['delay'])
+        self.stdout.write(f"Stub de PayPal en {server.base_url} (Ctrl+C para salir)")
+        self.stdout.write(f"Exporta PAYPAL_API_BASE={server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de productos (FTS5 en SQLite, tsvector en Postgres)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{total} productos indexados"))
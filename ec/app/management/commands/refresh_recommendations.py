@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.recommendations import refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = "Recalcula más vendidos, comprados juntos y favoritos de la lista de deseos para los carruseles"
+
+    def handle(self, *args, **options):
+        counts = refresh_recommendations()
+        self.stdout.write(self.style.SUCCESS(', '.join(f"{name}: {n} filas" for name, n in counts.items())))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.analytics import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Actualiza las ventas diarias (categoría, producto, departamento) desde la última corrida"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recalcula todo el historial")
+
+    def handle(self, *args, **options):
+        days = refresh_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"{days} días recalculados"))
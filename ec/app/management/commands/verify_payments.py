@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Payment
+from app.verification import STATUS_FAILED, STATUS_VERIFYING, verify_with_retries
+
+
+class Command(BaseCommand):
+    help = "Verifica contra PayPal los pagos pendientes o fallidos (p. ej. tras un reinicio)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-failed', action='store_true', help="Reintentar también los VERIFICATION_FAILED")
+
+    def handle(self, *args, **options):
+        statuses = [STATUS_VERIFYING]
+        if options['include_failed']:
+            statuses.append(STATUS_FAILED)
+
+        pending = Payment.objects.filter(status__in=statuses).exclude(order_id=None).values_list('pk', flat=True)
+        for payment_id in pending.iterator():
+            status = verify_with_retries(payment_id)
+            self.stdout.write(f"Pago {payment_id}: {status}")
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def remove_duplicates(apps, schema_editor):
+    """Fusiona filas repetidas antes de crear las restricciones de unicidad"""
+    Cart = apps.get_model('app', 'Cart')
+    Wishlist = apps.get_model('app', 'Wishlist')
+    Payment = apps.get_model('app', 'Payment')
+    OrderPlaced = apps.get_model('app', 'OrderPlaced')
+
+    # Carrito: se conserva la primera línea con la suma de las cantidades
+    dups = (Cart.objects.values('user', 'product')
+            .annotate(n=Count('id'), keep=Min('id'), cantidad=Sum('cantidad')).filter(n__gt=1))
+    for dup in dups:
+        Cart.objects.filter(pk=dup['keep']).update(cantidad=dup['cantidad'])
+        Cart.objects.filter(user=dup['user'], product=dup['product']).exclude(pk=dup['keep']).delete()
+
+    dups = Wishlist.objects.values('user', 'product').annotate(n=Count('id'), keep=Min('id')).filter(n__gt=1)
+    for dup in dups:
+        Wishlist.objects.filter(user=dup['user'], product=dup['product']).exclude(pk=dup['keep']).delete()
+
+    # Pagos repetidos por reintentos: los que no tienen órdenes se eliminan,
+    # al resto se le quita el order_id para no perder sus órdenes
+    dups = (Payment.objects.exclude(order_id=None).values('order_id')
+            .annotate(n=Count('id'), keep=Min('id')).filter(n__gt=1))
+    for dup in dups:
+        extra = Payment.objects.filter(order_id=dup['order_id']).exclude(pk=dup['keep'])
+        with_orders = OrderPlaced.objects.filter(payment__in=extra).values('payment')
+        extra.exclude(pk__in=with_orders).delete()
+        extra.update(order_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_payment_payer_email_payment_status_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='orderplaced',
+            index=models.Index(fields=['user', '-ordered_date'], name='order_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', '-created_at'], name='payment_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['categoria'], name='product_categoria_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['title'], name='product_title_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_cart_user_product'),
+        ),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(fields=('order_id',), name='unique_payment_order_id'),
+        ),
+        migrations.AddConstraint(
+            model_name='wishlist',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_wishlist_user_product'),
+        ),
+    ]
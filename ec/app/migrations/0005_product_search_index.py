@@ -0,0 +1,65 @@
+import unicodedata
+
+from django.db import migrations
+
+CATEGORY_LABELS = {
+    'AD': 'Adidas', 'NK': 'NIKE', 'CA': 'Camisas', 'CO': 'Conjuntos', 'PA': 'Pantalones', 'GO': 'Gorras',
+}
+
+
+def fold(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def create_index(apps, schema_editor):
+    """Índice invertido: FTS5 en SQLite, tsvector + GIN en Postgres"""
+    Product = apps.get_model('app', 'Product')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS app_product_fts "
+            "USING fts5(title, description, categoria, tokenize='unicode61 remove_diacritics 2')"
+        )
+        # Relevancia: título pesa más que categoría y esta más que la descripción
+        schema_editor.execute("INSERT INTO app_product_fts (app_product_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0)')")
+        sql = "INSERT INTO app_product_fts (rowid, title, description, categoria) VALUES (%s, %s, %s, %s)"
+    elif vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE app_product ADD COLUMN IF NOT EXISTS search_document tsvector")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS product_search_document_idx ON app_product USING GIN (search_document)"
+        )
+        sql = (
+            "UPDATE app_product SET search_document = "
+            "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'C') || "
+            "setweight(to_tsvector('simple', %s), 'B') WHERE id = %s"
+        )
+    else:
+        return
+
+    rows = []
+    for p in Product.objects.only('id', 'title', 'description', 'categoria').iterator():
+        doc = (fold(p.title), fold(p.description), fold(f"{p.categoria} {CATEGORY_LABELS.get(p.categoria, '')}"))
+        rows.append((p.pk, *doc) if vendor == 'sqlite' else (*doc, p.pk))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS app_product_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS product_search_document_idx")
+        schema_editor.execute("ALTER TABLE app_product DROP COLUMN IF EXISTS search_document")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_indexes_and_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:21
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def round_amounts(apps, schema_editor):
+    """Normaliza a 2 decimales los montos que venían de FloatField (p. ej. 19.990000000000002)"""
+    cent = Decimal('0.01')
+    for model, fields in (('Product', ['selling_price', 'precio_descuento']), ('Payment', ['amount'])):
+        Model = apps.get_model('app', model)
+        rows = list(Model.objects.only('pk', *fields))
+        for row in rows:
+            for field in fields:
+                value = getattr(row, field)
+                if value is not None:
+                    setattr(row, field, Decimal(str(value)).quantize(cent, rounding=ROUND_HALF_UP))
+        Model.objects.bulk_update(rows, fields, batch_size=500)
+
+
+def create_default_shipping_rule(apps, schema_editor):
+    """El envío fijo de 40 USD que antes estaba en las vistas"""
+    ShippingRule = apps.get_model('app', 'ShippingRule')
+    ShippingRule.objects.create(name='Envío estándar', min_subtotal=Decimal('0.00'), cost=Decimal('40.00'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShippingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('min_subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='precio_descuento',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='selling_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+        migrations.RunPython(round_amounts, migrations.RunPython.noop),
+        migrations.RunPython(create_default_shipping_rule, migrations.RunPython.noop),
+    ]
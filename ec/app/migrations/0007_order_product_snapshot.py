@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_decimal_money_and_shipping_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderplaced',
+            name='product_image',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderplaced',
+            name='product_title',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderplaced',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def build_summaries(apps, schema_editor):
+    """Un solo GROUP BY sobre el historial existente"""
+    OrderPlaced = apps.get_model('app', 'OrderPlaced')
+    OrderSummary = apps.get_model('app', 'OrderSummary')
+    line = ExpressionWrapper(
+        F('cantidad') * Coalesce('unit_price', 'product__precio_descuento'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    rows = (OrderPlaced.objects.values('user')
+            .annotate(n=Count('payment', distinct=True), spent=Sum(line, filter=~Q(status='Cancel')),
+                      last=Max('ordered_date'))
+            .order_by())
+    OrderSummary.objects.bulk_create([
+        OrderSummary(user_id=r['user'], order_count=r['n'], total_spent=r['spent'] or 0, last_order_date=r['last'])
+        for r in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_order_product_snapshot'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_order_date', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_order_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderplaced',
+            index=models.Index(fields=['ordered_date', 'id'], name='order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderplaced',
+            index=models.Index(fields=['status'], name='order_status_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_order_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderplaced',
+            name='tracking_number',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.CreateModel(
+            name='OrderStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('Accepted', 'Accepted'), ('Packed', 'Pacled'), ('On The Way', 'On The way'), ('Delivered', 'Delivered'), ('Cancel', 'Cancel'), ('Pending', 'Pending')], max_length=50)),
+                ('to_status', models.CharField(choices=[('Accepted', 'Accepted'), ('Packed', 'Pacled'), ('On The Way', 'On The way'), ('Delivered', 'Delivered'), ('Cancel', 'Cancel'), ('Pending', 'Pending')], max_length=50)),
+                ('source', models.CharField(max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='app.orderplaced')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'changed_at'], name='status_change_order_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WishlistPopular',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(unique=True)),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Bestseller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(blank=True, choices=[('AD', 'Adidas'), ('NK', 'NIKE'), ('CA', 'Camisas'), ('CO', 'Conjuntos'), ('PA', 'Pantalones'), ('GO', 'Gorras')], max_length=2)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('categoria', 'rank'), name='unique_bestseller_rank')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BoughtTogether',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('payments', models.PositiveIntegerField(default=0)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='unique_bought_together_rank')],
+            },
+        ),
+    ]
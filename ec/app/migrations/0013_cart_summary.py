@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_recommendations'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cart_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def _field():
+    field = django.contrib.postgres.search.SearchVectorField(null=True, editable=False)
+    field.set_attributes_from_name('search_document')
+    return field
+
+
+def add_column(apps, schema_editor):
+    """En Postgres la columna ya existe (0005, con su índice GIN); en los demás motores se crea vacía"""
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.add_field(apps.get_model('app', 'Product'), _field())
+
+
+def remove_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.remove_field(apps.get_model('app', 'Product'), _field())
+
+
+class Migration(migrations.Migration):
+    """search_document pasa al estado de las migraciones sin tocar la columna que 0005 creó en Postgres"""
+
+    dependencies = [
+        ('app', '0013_cart_summary'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='product',
+                    name='search_document',
+                    field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_column, remove_column),
+            ],
+        ),
+    ]
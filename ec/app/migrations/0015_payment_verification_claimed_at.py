@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_product_search_document_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='verification_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_payment_verification_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartsummary',
+            name='refreshed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,7 +1,14 @@
+from datetime import timedelta
+
 from django.db import models
+from django.conf import settings
+from django.db.models import Sum
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 
 from django.utils import timezone
+
+from .money import ZERO, line_total
 # Create your models here.
 
 STATE_CHOICES = (
@@ -32,13 +39,46 @@ CATEGORY_CHOICES=(
 
 )
 
+class ProductQuerySet(models.QuerySet):
+    def with_in_wishlist(self, user):
+        """
+        Anota in_wishlist con un EXISTS en la misma consulta (False para anónimos).
+
+        Con usuario se lee de default: la réplica puede no tener aún el cambio
+        que el usuario acaba de hacer en su wishlist.
+        """
+        if not user.is_authenticated:
+            return self.annotate(in_wishlist=models.Value(False))
+        return self.using('default').annotate(in_wishlist=models.Exists(
+            Wishlist.objects.filter(user=user, product=models.OuterRef('pk'))
+        ))
+
+
+class ProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    def get_queryset(self):
+        # search_document solo lo lee y escribe el índice de Postgres (app/search.py);
+        # diferido, un save() tampoco lo pisa
+        return super().get_queryset().defer('search_document')
+
+
 class Product(models.Model):
     title = models.CharField(max_length=100)
-    selling_price = models.FloatField()
-    precio_descuento = models.FloatField()
+    selling_price = models.DecimalField(max_digits=10, decimal_places=2)
+    precio_descuento = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField()
     categoria = models.CharField(choices=CATEGORY_CHOICES, max_length=2)
     imagen_producto = models.ImageField(upload_to='product')
+    # tsvector con índice GIN en Postgres; en otros motores queda vacío (SQLite usa app_product_fts)
+    search_document = SearchVectorField(null=True, editable=False)
+
+    objects = ProductManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['categoria'], name='product_categoria_idx'),
+            models.Index(fields=['title'], name='product_title_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -52,14 +92,42 @@ class Customer(models.Model):
     def __str__(self):
         return self.name
     
+class CartQuerySet(models.QuerySet):
+    def with_products(self):
+        """Trae el producto en la misma consulta y anota el subtotal de cada línea"""
+        return self.select_related('product').annotate(subtotal=line_total())
+
+    def total(self):
+        """Suma cantidad * precio_descuento en la BD como Decimal (0.00 si no hay líneas)"""
+        total = self.aggregate(total=Sum(line_total()))['total']
+        return total or ZERO
+
+
 class Cart(models.Model):
     user = models.ForeignKey(User,on_delete=models.CASCADE)
     product = models.ForeignKey(Product,on_delete=models.CASCADE)
     cantidad = models.PositiveIntegerField(default=1)
+
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_cart_user_product'),
+        ]
     
     @property
     def total_cost(self):
         return self.cantidad * self.product.precio_descuento
+
+
+class CartSummary(models.Model):
+    """Total del carrito por usuario; se ajusta con F() junto con las líneas (ver app/counters.py)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='cart_summary')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField(default=timezone.now)  # último SUM completo
+
+    def __str__(self):
+        return f"{self.user} - {self.total} USD"
     
 STATUS_CHOICES = (
     ('Accepted','Accepted'),
@@ -70,20 +138,84 @@ STATUS_CHOICES = (
     ('Pending','Pending'),
 )    
 
+# Flujo de estados de una línea de orden: estado -> estados a los que puede pasar
+STATUS_TRANSITIONS = {
+    'Pending': ('Accepted', 'Cancel'),
+    'Accepted': ('Packed', 'Cancel'),
+    'Packed': ('On The Way', 'Cancel'),
+    'On The Way': ('Delivered',),
+    'Delivered': (),
+    'Cancel': (),
+}
+
 
 class Payment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    amount = models.FloatField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
     paid = models.BooleanField(default=False)
     order_id = models.CharField(max_length=255, blank=True, null=True)    # ID de la orden de PayPal
     payment_id = models.CharField(max_length=255, blank=True, null=True)  # ID del pago de PayPal
     payer_email = models.EmailField(blank=True, null=True)                 # Email del comprador
     status = models.CharField(max_length=50, blank=True, null=True)        # Estado del pago ('COMPLETED', etc.)
     created_at = models.DateTimeField(default=timezone.now)
+    # Cuándo un worker retomó la verificación huérfana (app.verification.claim_stale_payments)
+    verification_claimed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order_id'], name='unique_payment_order_id'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='payment_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.amount} USD - {'✅' if self.paid else '❌'}"
 
+class OrderPlacedQuerySet(models.QuerySet):
+    HISTORY_FIELDS = (
+        'id', 'payment', 'product', 'cantidad', 'ordered_date', 'status', 'unit_price', 'product_title', 'product_image',
+    )
+
+    def history(self):
+        """Solo las columnas del historial y el subtotal con el precio congelado, sin unir Product"""
+        return self.only(*self.HISTORY_FIELDS).annotate(subtotal=line_total(price='unit_price'))
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        """
+        Fechas distintas de ordered_date (las usa el date_hierarchy del admin).
+
+        En lugar de un DISTINCT sobre toda la tabla, prueba cada año/mes/día entre
+        la primera y la última orden con un EXISTS por rango sobre order_date_idx.
+        """
+        if field_name != 'ordered_date' or kind not in ('year', 'month', 'day') or not settings.USE_TZ:
+            return super().datetimes(field_name, kind, order, tzinfo)
+        # MIN y MAX por separado: así cada uno es una sola búsqueda en el índice
+        dates = self.order_by().values_list('ordered_date', flat=True)
+        first = dates.order_by('ordered_date').first()
+        if first is None:
+            return []
+        last = dates.order_by('-ordered_date').first()
+        tz = tzinfo or timezone.get_current_timezone()
+        first, last = timezone.localtime(first, tz), timezone.localtime(last, tz)
+
+        start = first.replace(hour=0, minute=0, second=0, microsecond=0)
+        start = start.replace(day=1) if kind != 'day' else start
+        start = start.replace(month=1) if kind == 'year' else start
+        buckets = []
+        while start <= last:
+            if kind == 'year':
+                end = start.replace(year=start.year + 1)
+            elif kind == 'month':
+                end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+            else:
+                end = (start + timedelta(days=1)).replace(hour=0)
+            if self.filter(ordered_date__gte=start, ordered_date__lt=end).exists():
+                buckets.append(start)
+            start = end
+        return buckets if order == 'ASC' else buckets[::-1]
+
+
 class OrderPlaced(models.Model):
     user = models.ForeignKey(User,on_delete=models.CASCADE)
     customer = models.ForeignKey(Customer,on_delete=models.CASCADE)
@@ -92,11 +224,190 @@ class OrderPlaced(models.Model):
     ordered_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=50,choices=STATUS_CHOICES, default='Pending')
     payment = models.ForeignKey(Payment,on_delete=models.CASCADE,default="")
+    # Copia del producto al momento de la compra
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    product_title = models.CharField(max_length=100, blank=True)
+    product_image = models.CharField(max_length=100, blank=True)
+    tracking_number = models.CharField(max_length=100, blank=True)
+
+    objects = OrderPlacedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-ordered_date'], name='order_user_date_idx'),
+            models.Index(fields=['ordered_date', 'id'], name='order_date_idx'),
+            models.Index(fields=['status'], name='order_status_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.snapshot_product()
+        super().save(*args, **kwargs)
+
+    def snapshot_product(self):
+        """Congela precio, título e imagen: editar el producto no cambia órdenes pasadas"""
+        self.unit_price = self.product.precio_descuento
+        self.product_title = self.product.title
+        self.product_image = self.product.imagen_producto.name
+
     @property
     def total_cost(self):
-        return self.cantidad * self.product.precio_descuento
+        # Filas que backfill_order_snapshots aún no alcanzó: precio actual del producto
+        price = self.unit_price if self.unit_price is not None else self.product.precio_descuento
+        return self.cantidad * price
+
+    def can_change_to(self, status):
+        return status in STATUS_TRANSITIONS.get(self.status, ())
+
+
+class OrderStatusChange(models.Model):
+    """Historial de cambios de estado de las líneas de orden"""
+    order = models.ForeignKey(OrderPlaced, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=50, choices=STATUS_CHOICES)
+    to_status = models.CharField(max_length=50, choices=STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    source = models.CharField(max_length=20)  # admin, comando o archivo de tracking
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'changed_at'], name='status_change_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.order_id}: {self.from_status} -> {self.to_status}"
     
 
+class OrderSummary(models.Model):
+    """Resumen de compras por usuario; se mantiene al registrar órdenes y al cambiar estados"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='order_summary')
+    order_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # sin órdenes canceladas
+    last_order_date = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.order_count} órdenes - {self.total_spent} USD"
+
+
+class ShippingRule(models.Model):
+    """Costo de envío: aplica la regla activa con el mayor monto mínimo que no supere el subtotal"""
+    name = models.CharField(max_length=100)
+    min_subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=10, decimal_places=2)
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.name} (desde {self.min_subtotal} USD: {self.cost} USD)"
+
+
+# -----------------------------
+# Ventas diarias precalculadas (ver app/analytics.py)
+# -----------------------------
+
+class DailySales(models.Model):
+    """Totales de un día sin las líneas canceladas"""
+    day = models.DateField()
+    lines = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailyCategorySales(DailySales):
+    categoria = models.CharField(choices=CATEGORY_CHOICES, max_length=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'categoria'], name='unique_daily_category'),
+        ]
+
+
+class DailyProductSales(DailySales):
+    # Sin índice propio: (day, product) ya lo cubre y con él SQLite recorre toda la tabla para agrupar
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_product'),
+        ]
+
+
+class DailyDepartmentSales(DailySales):
+    departamento = models.CharField(max_length=50)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'departamento'], name='unique_daily_department'),
+        ]
+
+
+class TopProductSales(models.Model):
+    """Productos más vendidos de los últimos `days` días (se recalcula en cada actualización)"""
+    days = models.PositiveSmallIntegerField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['days', '-revenue'], name='top_product_days_idx'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """Último id procesado por la actualización incremental de las ventas diarias"""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+
+# -----------------------------
+# Recomendaciones precalculadas (ver app/recommendations.py)
+# -----------------------------
+
+class Bestseller(models.Model):
+    """Más vendidos por categoría; categoria vacía es el ranking de toda la tienda"""
+    categoria = models.CharField(choices=CATEGORY_CHOICES, max_length=2, blank=True)
+    rank = models.PositiveSmallIntegerField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['categoria', 'rank'], name='unique_bestseller_rank'),
+        ]
+
+
+class BoughtTogether(models.Model):
+    """Productos comprados en el mismo pago que `product`, de más a menos frecuente"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    payments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_bought_together_rank'),
+        ]
+
+
+class WishlistPopular(models.Model):
+    """Productos en más listas de deseos"""
+    rank = models.PositiveSmallIntegerField(unique=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    users = models.PositiveIntegerField(default=0)
+
+
 class Wishlist(models.Model):
     user = models.ForeignKey(User,on_delete=models.CASCADE)
-    product = models.ForeignKey(Product,on_delete=models.CASCADE)
\ No newline at end of file
+    product = models.ForeignKey(Product,on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_wishlist_user_product'),
+        ]
@@ -0,0 +1,32 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+
+# -----------------------------
+# Montos en Decimal (2 decimales) y conversión a centavos
+# -----------------------------
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def to_decimal(value):
+    """Convierte float/str/int a Decimal con 2 decimales: 10.499999 -> Decimal('10.50')"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_cents(value):
+    """Convierte un monto en dólares a centavos enteros"""
+    return int(to_decimal(value) * 100)
+
+
+def from_cents(cents):
+    return (Decimal(cents) / 100).quantize(CENT)
+
+
+def line_total(cantidad='cantidad', price='product__precio_descuento'):
+    """Expresión SQL cantidad * precio tipada como DECIMAL (para annotate/aggregate)"""
+    return ExpressionWrapper(F(cantidad) * F(price), output_field=DecimalField(max_digits=14, decimal_places=2))
@@ -0,0 +1,287 @@
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .counters import refresh_cart_total
+from .models import Cart, Customer, OrderPlaced, OrderSummary, Payment, Product
+from .money import ZERO, line_total
+from .shipping import order_total
+from .verification import STATUS_VERIFYING, enqueue_verification
+
+
+# -----------------------------
+# Creación de órdenes desde el carrito
+# -----------------------------
+
+def place_order(user, data):
+    """
+    Registra el pago de PayPal y convierte el carrito en órdenes en una sola transacción.
+
+    Es idempotente por el order_id de PayPal: si el pago ya existe (reintento del
+    navegador o webhook) se devuelve el existente sin duplicar órdenes.
+    Con `prod_id` ("Comprar Ahora") la orden es una unidad de ese producto y el
+    carrito no se toca.
+    El monto del pago es el total de las líneas más el envío calculado aquí (el
+    que manda el navegador no se usa): la verificación lo compara con lo que
+    PayPal capturó. El pago queda en VERIFYING hasta esa confirmación.
+    Retorna (payment, created).
+    """
+    order_id = data['id']
+    try:
+        with transaction.atomic():
+            payment = Payment.objects.select_for_update().filter(order_id=order_id).first()
+            if payment is not None:
+                return payment, False
+
+            buy_now = data.get('prod_id')
+            if buy_now:
+                cart_items = [
+                    (None, pk, 1, precio, title, image)
+                    for pk, precio, title, image in Product.objects.using('default').filter(pk=buy_now)
+                    .values_list('pk', 'precio_descuento', 'title', 'imagen_producto')
+                ]
+                if not cart_items:
+                    raise Product.DoesNotExist(f"El producto {buy_now} no existe")
+            else:
+                # Bloquear las líneas del carrito mientras se crean las órdenes
+                cart_items = list(
+                    Cart.objects.select_for_update(of=('self',))
+                    .filter(user=user)
+                    .values_list(
+                        'pk', 'product_id', 'cantidad',
+                        'product__precio_descuento', 'product__title', 'product__imagen_producto',
+                    )
+                )
+
+            subtotal = sum((cantidad * precio for _, _, cantidad, precio, _, _ in cart_items), ZERO)
+            payment = Payment.objects.create(
+                user=user,
+                order_id=order_id,
+                payment_id=order_id,
+                payer_email=data['payer']['email_address'],
+                amount=order_total(subtotal)[1],
+                status=STATUS_VERIFYING,
+                paid=False
+            )
+            # PayPal confirma el pago en segundo plano una vez confirmada la transacción
+            transaction.on_commit(lambda: enqueue_verification(payment.pk))
+
+            # Dirección seleccionada (o la última registrada)
+            customer_id = data.get('customer_id')
+            customers = Customer.objects.filter(user=user)
+            customer = customers.get(pk=customer_id) if customer_id else customers.last()
+
+            OrderPlaced.objects.bulk_create([
+                OrderPlaced(
+                    user=user,
+                    customer=customer,
+                    product_id=product_id,
+                    cantidad=cantidad,
+                    payment=payment,
+                    status="Pending",
+                    unit_price=precio,
+                    product_title=title,
+                    product_image=image,
+                )
+                for _, product_id, cantidad, precio, title, image in cart_items
+            ])
+
+            if not buy_now:
+                Cart.objects.filter(pk__in=[item[0] for item in cart_items]).delete()
+                refresh_cart_total(user.pk)
+            record_order(user, subtotal)
+    except IntegrityError:
+        # Otra petición registró el mismo order_id en paralelo
+        payment = Payment.objects.filter(order_id=order_id).first()
+        if payment is None:
+            raise
+        return payment, False
+
+    return payment, True
+
+
+async def aplace_order(user, data):
+    """
+    place_order para las vistas async.
+
+    El reintento de un order_id ya registrado (el caso repetido) se responde con
+    el ORM async, sin ocupar un hilo. La creación sigue siendo síncrona: necesita
+    transaction.atomic() y select_for_update(), que el ORM async de Django no
+    ofrece, y un carrito a medio convertir no es aceptable.
+    """
+    payment = await Payment.objects.filter(order_id=data['id']).afirst()
+    if payment is not None:
+        return payment, False
+    return await sync_to_async(place_order)(user, data)
+
+
+def backfill_snapshots(batch_size=2000):
+    """Copia precio, título e imagen del producto a las órdenes sin copia; retorna cuántas actualizó"""
+    product = Product.objects.filter(pk=OuterRef('product_id'))
+    pending = OrderPlaced.objects.filter(unit_price=None).order_by('pk')
+    last = 0
+    total = 0
+    while True:
+        ids = list(pending.filter(pk__gt=last).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += OrderPlaced.objects.filter(pk__in=ids).update(
+            unit_price=Subquery(product.values('precio_descuento')[:1]),
+            product_title=Subquery(product.values('title')[:1]),
+            product_image=Subquery(product.values('imagen_producto')[:1]),
+        )
+        last = ids[-1]
+
+
+# -----------------------------
+# Resumen de compras por usuario (OrderSummary)
+# -----------------------------
+
+def record_order(user, spent):
+    """Suma una orden al resumen del usuario con un UPDATE atómico; lo crea desde el historial si no existe"""
+    updated = OrderSummary.objects.filter(user=user).update(
+        order_count=F('order_count') + 1,
+        total_spent=F('total_spent') + spent,
+        last_order_date=timezone.now(),
+    )
+    if not updated:
+        refresh_order_summary(user)
+
+
+def refresh_order_summary(user):
+    """Recalcula el resumen de un usuario (p. ej. tras cambiar estados); las canceladas no suman al gasto"""
+    totals = OrderPlaced.objects.filter(user=user).aggregate(
+        order_count=Count('payment', distinct=True),
+        total_spent=Sum(line_total(price='unit_price'), filter=~Q(status='Cancel')),
+        last_order_date=Max('ordered_date'),
+    )
+    totals['total_spent'] = totals['total_spent'] or ZERO
+    OrderSummary.objects.update_or_create(user_id=getattr(user, 'pk', user), defaults=totals)
+
+
+def refresh_summaries_after_delete(origin, user_id):
+    """
+    Agenda el recálculo del resumen de `user_id` para cuando se confirme el borrado `origin`.
+
+    Un borrado en cascada (producto, pago) manda post_delete por cada línea: se
+    junta un solo recálculo por usuario. Los usuarios que ya no existen (el borrado
+    era del usuario mismo) se omiten, así no se vuelve a crear su resumen.
+    """
+    pending = getattr(origin, '_summary_users', None)
+    if pending is None:
+        pending = origin._summary_users = set()
+        transaction.on_commit(lambda: _refresh_existing(pending))
+    pending.add(user_id)
+
+
+def _refresh_existing(user_ids):
+    for user_id in User.objects.filter(pk__in=user_ids).values_list('pk', flat=True):
+        refresh_order_summary(user_id)
+
+
+def get_order_summary(user):
+    return OrderSummary.objects.filter(user=user).first()
+
+
+# -----------------------------
+# Historial de órdenes agrupado por pago (paginación por cursor)
+# -----------------------------
+
+HISTORY_PAGE_SIZE = 10
+
+
+def encode_cursor(payment):
+    """(fecha, id) del último pago de la página como texto: '1718000000123456.42'"""
+    ts = payment.created_at
+    return f"{int(ts.timestamp()) * 10**6 + ts.microsecond}.{payment.pk}"
+
+
+def decode_cursor(value):
+    try:
+        micros, pk = (int(part) for part in value.split('.'))
+        created_at = datetime.fromtimestamp(micros // 10**6, tz=dt_timezone.utc).replace(microsecond=micros % 10**6)
+    except (AttributeError, ValueError, OverflowError, OSError):
+        # mal formado o fuera del rango de fechas de la plataforma
+        return None
+    return created_at, pk
+
+
+def fill_missing_snapshots(lines):
+    """
+    Completa en memoria las líneas sin copia del producto (aún no pasó el backfill)
+    con sus datos actuales; solo hace la consulta extra si existe alguna.
+    """
+    legacy = [line for line in lines if line.unit_price is None]
+    if not legacy:
+        return
+    products = Product.objects.only('title', 'precio_descuento', 'imagen_producto').in_bulk(
+        {line.product_id for line in legacy}
+    )
+    for line in legacy:
+        product = products[line.product_id]
+        line.unit_price = product.precio_descuento
+        line.subtotal = line.cantidad * product.precio_descuento
+        line.product_title = line.product_title or product.title
+        line.product_image = line.product_image or product.imagen_producto.name
+
+
+class OrderHistoryPage:
+    """
+    Página de pagos del usuario, del más reciente al más antiguo, cada uno con sus líneas.
+
+    Dos consultas por página sin importar el tamaño del historial: los pagos
+    (índice user, -created_at) y las líneas de esos pagos.
+    """
+
+    def __init__(self, user, cursor=None, size=HISTORY_PAGE_SIZE):
+        self.user = user
+        self.cursor = decode_cursor(cursor)
+        self.size = size
+
+    @cached_property
+    def _payments(self):
+        qs = (Payment.objects.filter(user=self.user)
+              .filter(Exists(OrderPlaced.objects.filter(payment=OuterRef('pk'))))
+              .only('id', 'amount', 'status', 'paid', 'created_at')
+              .order_by('-created_at', '-pk'))
+        if self.cursor is not None:
+            created_at, pk = self.cursor
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        return list(qs[:self.size + 1])
+
+    @cached_property
+    def groups(self):
+        payments = self._payments[:self.size]
+        lines = {}
+        history = list(OrderPlaced.objects.filter(payment__in=payments).history().order_by('pk'))
+        fill_missing_snapshots(history)
+        for line in history:
+            lines.setdefault(line.payment_id, []).append(line)
+        return [(payment, lines.get(payment.pk, [])) for payment in payments]
+
+    @property
+    def has_next(self):
+        return len(self._payments) > self.size
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self._payments[self.size - 1]) if self.has_next else None
+
+    @property
+    def is_first(self):
+        return self.cursor is None
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def __bool__(self):
+        return bool(self._payments)
+
+
+def order_history(user, cursor=None):
+    return OrderHistoryPage(user, cursor)
@@ -0,0 +1,98 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag, urlencode
+
+from .caching import cached_query
+from .catalog import CATALOG_VERSION_KEY
+from .guest_cart import COOKIE_NAME as CART_COOKIE
+from .recommendations import RECS_VERSION_KEY
+
+PAGE_KEY = "page:{}"
+PAGE_TIMEOUT = 60 * 10
+BROWSER_MAX_AGE = 60   # el navegador o la CDN revalidan (304) pasado este tiempo
+VERSION_KEYS = [CATALOG_VERSION_KEY, RECS_VERSION_KEY]
+
+
+# -----------------------------
+# Caché de páginas completas para visitantes anónimos
+# -----------------------------
+
+def _has_state(request):
+    """Con sesión, carrito de invitado o mensajes pendientes la página es propia del visitante"""
+    cookies = request.COOKIES
+    return settings.SESSION_COOKIE_NAME in cookies or CART_COOKIE in cookies or CookieStorage.cookie_name in cookies
+
+
+def _cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')  # la página lleva un token CSRF
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def _entry(response, last_modified):
+    content = response.content
+    return {
+        'content': content,
+        'content_type': response['Content-Type'],
+        'etag': quote_etag(hashlib.md5(content).hexdigest()),
+        'last_modified': last_modified,
+    }
+
+
+def _page_key(request, params):
+    """Ruta más los parámetros que lee la vista, ordenados; los demás (utm, basura) no cuentan"""
+    query = urlencode(sorted((name, value) for name in params for value in request.GET.getlist(name)))
+    return PAGE_KEY.format(hashlib.md5(f"{request.path}?{query}".encode()).hexdigest())
+
+
+def anonymous_page_cache(*params):
+    """
+    Sirve la página ya renderizada a los visitantes sin sesión ni carrito.
+
+    La clave es la ruta con los parámetros `params` (los únicos que lee la
+    vista), así el número de entradas está acotado y el orden no importa. Vale
+    mientras no cambien el catálogo ni las recomendaciones (cached_query: una
+    sola petición la renderiza). La respuesta lleva ETag, Last-Modified y
+    Cache-Control público, así el navegador o una CDN revalidan con
+    If-None-Match y reciben un 304.
+    Si la vista responde algo que no se puede compartir (cookies, token CSRF,
+    redirecciones) se guarda una marca y esa ruta se sirve sin caché.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _has_state(request):
+                return view(request, *args, **kwargs)
+
+            rendered = {}
+
+            def build():
+                response = rendered['response'] = view(request, *args, **kwargs)
+                if not _cacheable(request, response):
+                    return None
+                return _entry(response, int(time.time()))
+
+            entry = cached_query(_page_key(request, params), build, PAGE_TIMEOUT, versions=VERSION_KEYS)
+            if entry is None:
+                return rendered.get('response') or view(request, *args, **kwargs)
+
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            response['ETag'] = entry['etag']
+            response['Last-Modified'] = http_date(entry['last_modified'])
+            patch_cache_control(response, public=True, max_age=BROWSER_MAX_AGE)
+            patch_vary_headers(response, ['Cookie'])
+            return get_conditional_response(
+                request, etag=entry['etag'], last_modified=entry['last_modified'], response=response,
+            )
+        return wrapper
+    return decorator
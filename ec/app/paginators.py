@@ -0,0 +1,48 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 100_000
+
+
+def estimated_row_count(model, using='default'):
+    """Filas de la tabla según las estadísticas del motor; None si no hay estadísticas"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s", [table],
+            )
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 solo existe después de un ANALYZE; su columna stat empieza por el número de filas
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator que evita el COUNT(*) de tablas grandes sin filtrar.
+
+    Si la consulta no tiene WHERE y las estadísticas indican más de
+    ESTIMATE_THRESHOLD filas, usa la estimación; en otro caso cuenta normalmente.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and not qs.query.where:
+            estimate = estimated_row_count(qs.model, qs.db)
+            if estimate is not None and estimate > ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+# -----------------------------
+# Cliente HTTP de la API REST de PayPal
+# -----------------------------
+
+class PayPalError(Exception):
+    """Error al consultar la API de PayPal"""
+
+    def __init__(self, message, retriable=False):
+        super().__init__(message)
+        self.retriable = retriable
+
+
+class PayPalClient:
+    """
+    Cliente para la API de órdenes de PayPal.
+
+    Usa una sesión de requests con pool de conexiones keep-alive y cachea el
+    token OAuth hasta poco antes de que expire. La URL base es configurable
+    (PAYPAL_API_BASE) para poder apuntarlo a un servidor stub local.
+    """
+
+    TOKEN_MARGIN = 60  # segundos antes de la expiración en que se renueva el token
+
+    def __init__(self, base_url=None, client_id=None, client_secret=None, timeout=None, pool_size=None):
+        self.base_url = (base_url or settings.PAYPAL_API_BASE).rstrip('/')
+        self.client_id = client_id or settings.PAYPAL_CLIENT_ID
+        self.client_secret = client_secret or settings.PAYPAL_CLIENT_SECRET
+        self.timeout = timeout or settings.PAYPAL_HTTP_TIMEOUT
+        pool_size = pool_size or settings.PAYPAL_HTTP_POOL_SIZE
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._token = None
+        self._token_expires = 0
+        self._token_lock = threading.Lock()
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise PayPalError(f"Error de red con PayPal: {e}", retriable=True) from e
+        if response.status_code >= 500 or response.status_code == 429:
+            raise PayPalError(f"PayPal respondió {response.status_code}", retriable=True)
+        return response
+
+    def get_token(self, force=False):
+        """Retorna un token OAuth válido, pidiendo uno nuevo solo si expiró"""
+        with self._token_lock:
+            if force or self._token is None or time.monotonic() >= self._token_expires:
+                response = self._request(
+                    'POST', '/v1/oauth2/token',
+                    data={'grant_type': 'client_credentials'},
+                    auth=(self.client_id, self.client_secret),
+                )
+                if response.status_code != 200:
+                    raise PayPalError(f"No se pudo obtener token de PayPal ({response.status_code})")
+                data = response.json()
+                self._token = data['access_token']
+                self._token_expires = time.monotonic() + int(data.get('expires_in', 0)) - self.TOKEN_MARGIN
+            return self._token
+
+    def get_order(self, order_id):
+        """Consulta una orden en la API v2 de PayPal"""
+        path = f'/v2/checkout/orders/{order_id}'
+        response = self._request('GET', path, headers={'Authorization': f'Bearer {self.get_token()}'})
+        if response.status_code == 401:
+            # Token revocado o expirado antes de tiempo: se renueva una vez
+            response = self._request('GET', path, headers={'Authorization': f'Bearer {self.get_token(force=True)}'})
+        if response.status_code == 404:
+            raise PayPalError(f"La orden {order_id} no existe en PayPal")
+        if response.status_code != 200:
+            raise PayPalError(f"PayPal respondió {response.status_code} para la orden {order_id}")
+        return response.json()
+
+
+class AsyncPayPalClient:
+    """
+    La misma API que PayPalClient con `await`, sobre httpx.AsyncClient.
+
+    Un solo hilo con un event loop espera muchas respuestas lentas de PayPal a la
+    vez. El cliente pertenece al loop en que se crea; se cierra con `aclose()`.
+    """
+
+    TOKEN_MARGIN = PayPalClient.TOKEN_MARGIN
+
+    def __init__(self, base_url=None, client_id=None, client_secret=None, timeout=None, pool_size=None):
+        import httpx  # solo la verificación en segundo plano lo necesita
+
+        self._httpx = httpx
+        self.base_url = (base_url or settings.PAYPAL_API_BASE).rstrip('/')
+        self.client_id = client_id or settings.PAYPAL_CLIENT_ID
+        self.client_secret = client_secret or settings.PAYPAL_CLIENT_SECRET
+        pool_size = pool_size or settings.PAYPAL_HTTP_POOL_SIZE
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout or settings.PAYPAL_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._token = None
+        self._token_expires = 0
+        self._token_lock = asyncio.Lock()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _request(self, method, path, **kwargs):
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except self._httpx.HTTPError as e:
+            raise PayPalError(f"Error de red con PayPal: {e}", retriable=True) from e
+        if response.status_code >= 500 or response.status_code == 429:
+            raise PayPalError(f"PayPal respondió {response.status_code}", retriable=True)
+        return response
+
+    async def get_token(self, force=False):
+        async with self._token_lock:
+            if force or self._token is None or time.monotonic() >= self._token_expires:
+                response = await self._request(
+                    'POST', '/v1/oauth2/token',
+                    data={'grant_type': 'client_credentials'},
+                    auth=(self.client_id, self.client_secret),
+                )
+                if response.status_code != 200:
+                    raise PayPalError(f"No se pudo obtener token de PayPal ({response.status_code})")
+                data = response.json()
+                self._token = data['access_token']
+                self._token_expires = time.monotonic() + int(data.get('expires_in', 0)) - self.TOKEN_MARGIN
+            return self._token
+
+    async def get_order(self, order_id):
+        path = f'/v2/checkout/orders/{order_id}'
+        response = await self._request('GET', path, headers={'Authorization': f'Bearer {await self.get_token()}'})
+        if response.status_code == 401:
+            token = await self.get_token(force=True)
+            response = await self._request('GET', path, headers={'Authorization': f'Bearer {token}'})
+        if response.status_code == 404:
+            raise PayPalError(f"La orden {order_id} no existe en PayPal")
+        if response.status_code != 200:
+            raise PayPalError(f"PayPal respondió {response.status_code} para la orden {order_id}")
+        return response.json()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Cliente compartido por el proceso (reutiliza conexiones y token)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PayPalClient()
+        return _client
@@ -0,0 +1,104 @@
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# -----------------------------
+# Servidor stub de la API de PayPal (pruebas y benchmarks)
+# -----------------------------
+
+ORDER_PATH = re.compile(r'^/v2/checkout/orders/(?P<order_id>[\w-]+)$')
+
+
+class StubPayPalHandler(BaseHTTPRequestHandler):
+    """Implementa lo mínimo de /v1/oauth2/token y /v2/checkout/orders"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, igual que la API real
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def do_POST(self):
+        body = self._read_body()
+        server = self.server
+        if self.path == '/v1/oauth2/token':
+            server.token_requests += 1
+            return self._send(200, {
+                'access_token': f'stub-token-{server.token_requests}',
+                'token_type': 'Bearer',
+                'expires_in': server.token_ttl,
+            })
+        if self.path == '/v2/checkout/orders':
+            data = json.loads(body or b'{}')
+            order = server.create_order(
+                data.get('purchase_units', [{}])[0].get('amount', {}).get('value', '0.00'),
+                status=data.get('status', 'COMPLETED'),
+            )
+            return self._send(201, order)
+        self._send(404, {'name': 'RESOURCE_NOT_FOUND'})
+
+    def do_GET(self):
+        server = self.server
+        if server.delay:
+            time.sleep(server.delay)
+        if not self.headers.get('Authorization', '').startswith('Bearer stub-token-'):
+            return self._send(401, {'error': 'invalid_token'})
+        match = ORDER_PATH.match(self.path)
+        order = server.orders.get(match.group('order_id')) if match else None
+        if order is None:
+            return self._send(404, {'name': 'RESOURCE_NOT_FOUND'})
+        self._send(200, order)
+
+
+class StubPayPalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), delay=0, token_ttl=32400):
+        super().__init__(address, StubPayPalHandler)
+        self.delay = delay
+        self.token_ttl = token_ttl
+        self.token_requests = 0
+        self.orders = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def create_order(self, amount, status='COMPLETED', payer_email='comprador@example.com', currency='USD'):
+        """Registra una orden capturada y la retorna con el formato de la API v2"""
+        order_id = f'STUB{next(self._ids):08d}'
+        amount = {'currency_code': currency, 'value': str(amount)}
+        order = {
+            'id': order_id,
+            'status': status,
+            'payer': {'email_address': payer_email},
+            'purchase_units': [{
+                'amount': amount,
+                'payments': {'captures': [{'id': f'CAP-{order_id}', 'status': status, 'amount': amount}]},
+            }],
+        }
+        self.orders[order_id] = order
+        return order
+
+    def start(self):
+        """Atiende peticiones en un hilo en segundo plano"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
@@ -0,0 +1,130 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, FilteredRelation, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .analytics import refresh_rollups
+from .caching import bump_version, cached_query
+from .catalog import CATALOG_VERSION_KEY
+from .models import (
+    Bestseller, BoughtTogether, DailyProductSales, OrderPlaced, Wishlist, WishlistPopular,
+)
+
+PER_LIST = 12
+BESTSELLER_DAYS = 90
+TOGETHER_DAYS = 365
+RECS_VERSION_KEY = "recs:version"
+HOME_KEY = "recs:home"
+PRODUCT_KEY = "recs:product:{}"
+TIMEOUT = 60 * 60 * 24
+CARD_FIELDS = ('id', 'title', 'precio_descuento', 'selling_price', 'imagen_producto')
+
+
+# -----------------------------
+# Precálculo (refresh_recommendations)
+# -----------------------------
+
+def _ranked(qs, partition, order):
+    """Agrega `rank` (1..n dentro de cada `partition`) y deja solo los PER_LIST primeros"""
+    return qs.annotate(
+        rank=Window(RowNumber(), partition_by=[F(partition)], order_by=order),
+    ).filter(rank__lte=PER_LIST)
+
+
+def _replace(model, rows):
+    with transaction.atomic():
+        model.objects.all().delete()
+        model.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+def build_bestsellers():
+    """Ranking por categoría y de toda la tienda desde las ventas diarias de los últimos BESTSELLER_DAYS días"""
+    sales = (
+        DailyProductSales.objects.using('default')  # refresh_rollups() los acaba de escribir
+        .filter(day__gt=timezone.localdate() - timedelta(days=BESTSELLER_DAYS))
+        .values('product_id', 'product__categoria')
+        .annotate(units=Sum('units'))
+        .order_by()
+    )
+    by_category = _ranked(sales, 'product__categoria', [F('units').desc(), F('product_id')])
+    rows = [
+        Bestseller(categoria=row['product__categoria'], rank=row['rank'], product_id=row['product_id'], units=row['units'])
+        for row in by_category
+    ]
+    top = sales.order_by('-units', 'product_id')[:PER_LIST]
+    rows += [Bestseller(categoria='', rank=i, product_id=row['product_id'], units=row['units']) for i, row in enumerate(top, 1)]
+    return _replace(Bestseller, rows)
+
+
+def build_bought_together():
+    """Pares de productos en el mismo pago (últimos TOGETHER_DAYS días), agrupados en la BD"""
+    pairs = (
+        OrderPlaced.objects
+        .filter(payment__created_at__gte=timezone.now() - timedelta(days=TOGETHER_DAYS))
+        .exclude(status='Cancel')
+        .annotate(line=FilteredRelation('payment__orderplaced', condition=~Q(payment__orderplaced__status='Cancel')))
+        .annotate(other=F('line__product_id'))
+        .exclude(other=F('product_id'))
+        .values('product_id', 'other')
+        .annotate(payments=Count('payment_id', distinct=True))
+        .order_by()
+    )
+    ranked = _ranked(pairs, 'product_id', [F('payments').desc(), F('other')])
+    return _replace(BoughtTogether, [
+        BoughtTogether(product_id=row['product_id'], rank=row['rank'], other_id=row['other'], payments=row['payments'])
+        for row in ranked.iterator()
+    ])
+
+
+def build_wishlist_popular():
+    top = Wishlist.objects.values('product_id').annotate(users=Count('pk')).order_by('-users', 'product_id')[:PER_LIST]
+    return _replace(WishlistPopular, [
+        WishlistPopular(rank=i, product_id=row['product_id'], users=row['users']) for i, row in enumerate(top, 1)
+    ])
+
+
+def refresh_recommendations():
+    """Recalcula las tres tablas e invalida los carruseles cacheados; retorna filas por tabla"""
+    refresh_rollups()
+    counts = {
+        'bestsellers': build_bestsellers(),
+        'bought_together': build_bought_together(),
+        'wishlist': build_wishlist_popular(),
+    }
+    bump_version(RECS_VERSION_KEY)
+    return counts
+
+
+# -----------------------------
+# Lectura cacheada para las plantillas
+# -----------------------------
+
+def _cards(qs, relation='product'):
+    """Datos del producto para las tarjetas del carrusel, en el orden del ranking"""
+    fields = [f'{relation}__{name}' for name in CARD_FIELDS]
+    return [dict(zip(CARD_FIELDS, row)) for row in qs.order_by('rank').values_list(*fields)]
+
+
+def _cached(key, build):
+    """Carrusel cacheado hasta que cambie el catálogo o se recalculen las recomendaciones"""
+    return cached_query(key, build, TIMEOUT, versions=[CATALOG_VERSION_KEY, RECS_VERSION_KEY])
+
+
+def home_carousels():
+    return _cached(HOME_KEY, lambda: {
+        'bestsellers': _cards(Bestseller.objects.filter(categoria='')),
+        'wishlist_popular': _cards(WishlistPopular.objects.all()),
+    })
+
+
+def product_carousels(product):
+    def build():
+        same_category = Bestseller.objects.filter(categoria=product.categoria).exclude(product_id=product.pk)
+        return {
+            'bought_together': _cards(BoughtTogether.objects.filter(product_id=product.pk), 'other'),
+            'bestsellers': _cards(same_category),
+        }
+    return _cached(PRODUCT_KEY.format(product.pk), build)
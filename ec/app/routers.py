@@ -0,0 +1,38 @@
+from .models import (
+    Bestseller, BoughtTogether, DailyCategorySales, DailyDepartmentSales, DailyProductSales,
+    Product, TopProductSales, WishlistPopular,
+)
+
+# Lecturas que toleran unos segundos de retraso de la réplica
+CATALOG_MODELS = {
+    Product, Bestseller, BoughtTogether, WishlistPopular,
+    DailyCategorySales, DailyDepartmentSales, DailyProductSales, TopProductSales,
+}
+
+
+class CatalogReplicaRouter:
+    """
+    Lecturas del catálogo a la réplica; todo lo demás (y toda escritura) a default.
+
+    Las consultas que no toleran el retraso (subconsultas sobre tablas que solo
+    están al día en default, lecturas justo después de escribir) se fijan con
+    .using('default'). Las relaciones de un objeto se leen de la base de la que
+    salió ese objeto (hint `instance`).
+    """
+
+    replica = 'replica'
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return self.replica if model in CATALOG_MODELS else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # la réplica es una copia de default
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,194 @@
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .models import CATEGORY_CHOICES, Product
+
+
+# -----------------------------
+# Normalización de texto
+# -----------------------------
+
+CATEGORY_LABELS = dict(CATEGORY_CHOICES)
+PER_PAGE = 24
+MAX_PAGE = 1000  # más allá el OFFSET no aporta resultados y puede desbordar el parámetro de SQLite
+FTS_TABLE = 'app_product_fts'
+
+
+def fold(text):
+    """Minúsculas y sin acentos: 'Camisón' -> 'camison'"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(query):
+    return re.findall(r'\w+', fold(query))
+
+
+def document(product):
+    """Campos indexados de un producto, ya normalizados (título, descripción, categoría)"""
+    categoria = f"{product.categoria} {CATEGORY_LABELS.get(product.categoria, '')}"
+    return fold(product.title), fold(product.description), fold(categoria)
+
+
+# -----------------------------
+# Backends (SQLite FTS5, Postgres tsvector/GIN, icontains)
+# -----------------------------
+
+class SQLiteBackend:
+    """Índice invertido en una tabla virtual FTS5 cuyo rowid es el id del producto"""
+
+    def index(self, products):
+        rows = [(p.pk, *document(p)) for p in products]
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(r[0],) for r in rows])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, categoria) VALUES (%s, %s, %s, %s)", rows,
+            )
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def search(self, tokens, limit, offset):
+        match = ' '.join(f'"{t}"*' for t in tokens)
+        # Se ordena y recorta dentro del índice y solo se unen las filas de la página
+        return Product.objects.raw(
+            f"SELECT p.* FROM (SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            "ORDER BY rank LIMIT %s OFFSET %s) f JOIN app_product p ON p.id = f.rowid ORDER BY f.rank",
+            [match, limit, offset],
+        )
+
+
+class PostgresBackend:
+    """Columna tsvector con pesos (A título, B categoría, C descripción) e índice GIN"""
+
+    UPDATE = (
+        "UPDATE app_product SET search_document = "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'B') WHERE id = %s"
+    )
+
+    def index(self, products):
+        with connection.cursor() as cursor:
+            cursor.executemany(self.UPDATE, [(*document(p), p.pk) for p in products])
+
+    def remove(self, pk):
+        pass  # la fila del producto desaparece con él
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE app_product SET search_document = NULL")
+
+    def search(self, tokens, limit, offset):
+        tsquery = ' & '.join(f'{t}:*' for t in tokens)
+        return Product.objects.raw(
+            "SELECT p.*, ts_rank(p.search_document, q) AS rank "
+            "FROM app_product p, to_tsquery('simple', %s) q "
+            "WHERE p.search_document @@ q ORDER BY rank DESC, p.id LIMIT %s OFFSET %s",
+            [tsquery, limit, offset],
+        )
+
+
+class FallbackBackend:
+    """Para otros motores: búsqueda por icontains sin índice"""
+
+    def index(self, products):
+        pass
+
+    def remove(self, pk):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, tokens, limit, offset):
+        qs = Product.objects.all()
+        for token in tokens:
+            qs = qs.filter(Q(title__icontains=token) | Q(description__icontains=token))
+        return qs.order_by('pk')[offset:offset + limit]
+
+
+def get_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return FallbackBackend()
+
+
+# -----------------------------
+# API pública
+# -----------------------------
+
+def index_product(product):
+    get_backend().index([product])
+
+
+def remove_product(pk):
+    get_backend().remove(pk)
+
+
+def rebuild_index(batch_size=2000):
+    """Reconstruye el índice completo por lotes; retorna cuántos productos indexó"""
+    backend = get_backend()
+    backend.clear()
+    total = 0
+    batch = []
+    for product in Product.objects.only('id', 'title', 'description', 'categoria').iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) == batch_size:
+            backend.index(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        backend.index(batch)
+        total += len(batch)
+    return total
+
+
+class SearchPage:
+    """Página de resultados ordenados por relevancia (?page=N)"""
+
+    def __init__(self, query, page=1, per_page=PER_PAGE):
+        self.query = query
+        self.tokens = tokenize(query)
+        self.number = min(max(page, 1), MAX_PAGE)
+        self.per_page = per_page
+
+    @cached_property
+    def _rows(self):
+        if not self.tokens:
+            return []
+        offset = (self.number - 1) * self.per_page
+        return list(get_backend().search(self.tokens, self.per_page + 1, offset))
+
+    @property
+    def object_list(self):
+        return self._rows[:self.per_page]
+
+    @property
+    def has_next(self):
+        return len(self._rows) > self.per_page
+
+    @property
+    def has_previous(self):
+        return self.number > 1
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def search(query, page=1):
+    return SearchPage(query, page)
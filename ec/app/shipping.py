@@ -0,0 +1,58 @@
+from django.core.cache import cache
+
+from .models import ShippingRule
+from .money import ZERO
+
+
+# -----------------------------
+# Costo de envío según las reglas configuradas en el admin
+# -----------------------------
+
+SHIPPING_RULES_KEY = "shipping:rules"
+
+
+def shipping_rules():
+    """Reglas activas como [(monto mínimo, costo)], de mayor a menor mínimo; se cachean hasta que cambian"""
+    rules = cache.get(SHIPPING_RULES_KEY)
+    if rules is None:
+        rules = list(
+            ShippingRule.objects.filter(active=True).order_by('-min_subtotal').values_list('min_subtotal', 'cost')
+        )
+        cache.set(SHIPPING_RULES_KEY, rules, None)
+    return rules
+
+
+async def ashipping_rules():
+    rules = await cache.aget(SHIPPING_RULES_KEY)
+    if rules is None:
+        qs = ShippingRule.objects.filter(active=True).order_by('-min_subtotal').values_list('min_subtotal', 'cost')
+        rules = [rule async for rule in qs]
+        await cache.aset(SHIPPING_RULES_KEY, rules, None)
+    return rules
+
+
+def invalidate_shipping_rules():
+    cache.delete(SHIPPING_RULES_KEY)
+
+
+def _cost(rules, subtotal):
+    for min_subtotal, cost in rules:
+        if subtotal >= min_subtotal:
+            return cost
+    return ZERO
+
+
+def shipping_cost(subtotal):
+    """Costo de la regla activa con el mayor mínimo que no supera el subtotal (0 si ninguna aplica)"""
+    return _cost(shipping_rules(), subtotal)
+
+
+def order_total(subtotal):
+    """Retorna (envío, total) para un subtotal en Decimal"""
+    shipping = shipping_cost(subtotal)
+    return shipping, subtotal + shipping
+
+
+async def aorder_total(subtotal):
+    shipping = _cost(await ashipping_rules(), subtotal)
+    return shipping, subtotal + shipping
@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import search, suggest
+from .catalog import bump_catalog_version
+from .counters import forget_cart_total, forget_cart_totals, invalidate_cart_count, invalidate_wishlist_count
+from .images import schedule_derivatives
+from .models import Cart, OrderPlaced, Product, ShippingRule, Wishlist
+from .orders import refresh_order_summary, refresh_summaries_after_delete
+from .shipping import invalidate_shipping_rules
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """Cualquier cambio de producto (p. ej. desde el admin) invalida las cachés del catálogo"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def product_price_changed(sender, instance, **kwargs):
+    """El precio pudo cambiar o las líneas se borran en cascada: los totales de esos carritos se recalculan"""
+    forget_cart_totals(instance)
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def cart_line_changed(sender, instance, **kwargs):
+    """Cualquier línea guardada o borrada fuera de los ajustes con F() (admin, shell): el total se recalcula"""
+    forget_cart_total(instance.user_id)
+    invalidate_cart_count(instance.user_id)
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def wishlist_changed(sender, instance, **kwargs):
+    """También las del admin y las cascadas al borrar un producto"""
+    invalidate_wishlist_count(instance.user_id)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    """Actualiza el índice de búsqueda del producto guardado"""
+    search.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def product_saved_suggest(sender, instance, **kwargs):
+    """Mantiene al día el índice de autocompletado de este proceso"""
+    suggest.index.update_product(instance.pk, instance.title)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted_suggest(sender, instance, **kwargs):
+    suggest.index.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def product_saved_images(sender, instance, **kwargs):
+    """Genera en segundo plano los derivados de la imagen una vez confirmado el guardado"""
+    name = instance.imagen_producto.name
+    transaction.on_commit(lambda: schedule_derivatives(name))
+
+
+@receiver(post_save, sender=ShippingRule)
+@receiver(post_delete, sender=ShippingRule)
+def shipping_rule_changed(sender, instance, **kwargs):
+    invalidate_shipping_rules()
+
+
+@receiver(post_save, sender=OrderPlaced)
+def order_changed(sender, instance, **kwargs):
+    """Cambios sueltos (p. ej. el estado desde el admin) recalculan el resumen del usuario"""
+    refresh_order_summary(instance.user_id)
+
+
+@receiver(post_delete, sender=OrderPlaced)
+def order_deleted(sender, instance, origin=None, **kwargs):
+    """Un recálculo por usuario al confirmar el borrado, también en cascadas (ver refresh_summaries_after_delete)"""
+    refresh_summaries_after_delete(origin if origin is not None else instance, instance.user_id)
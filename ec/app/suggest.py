@@ -0,0 +1,108 @@
+import threading
+from bisect import bisect_left, insort
+
+from django.urls import reverse
+
+from .catalog import catalog_version
+from .models import CATEGORY_CHOICES, Product
+from .search import fold
+
+MAX_RESULTS = 20
+
+
+# -----------------------------
+# Índice de prefijos en memoria para el autocompletado
+# -----------------------------
+
+class PrefixIndex:
+    """
+    Arreglo ordenado de (clave, id, título) consultado con bisect.
+
+    Cada producto aporta una clave por palabra de su título (así 'nike' encuentra
+    'Zapatos Nike'). Se carga la primera vez que se usa, se actualiza de forma
+    incremental con las señales de Product de este proceso y se recarga completo
+    si la versión del catálogo cambió en otro proceso.
+    """
+
+    CATEGORIES = [(fold(label), code, label) for code, label in CATEGORY_CHOICES]
+
+    def __init__(self):
+        self._entries = []
+        self._by_product = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _product_entries(pk, title):
+        words = fold(title).split()
+        return sorted({(' '.join(words[i:]), pk, title) for i in range(len(words))})
+
+    def load(self):
+        entries, by_product = [], {}
+        for pk, title in Product.objects.values_list('pk', 'title').iterator():
+            by_product[pk] = self._product_entries(pk, title)
+            entries.extend(by_product[pk])
+        entries.sort()
+        with self._lock:
+            self._entries, self._by_product = entries, by_product
+            self._version = catalog_version()
+
+    def _ensure_fresh(self):
+        if self._version is None or self._version != catalog_version():
+            self.load()
+
+    def update_product(self, pk, title):
+        if self._version is None:
+            return  # aún no se ha cargado: se cargará completo al primer uso
+        with self._lock:
+            self._remove(pk)
+            self._by_product[pk] = self._product_entries(pk, title)
+            for entry in self._by_product[pk]:
+                insort(self._entries, entry)
+            self._version = catalog_version()
+
+    def remove_product(self, pk):
+        if self._version is None:
+            return
+        with self._lock:
+            self._remove(pk)
+            self._version = catalog_version()
+
+    def _remove(self, pk):
+        for entry in self._by_product.pop(pk, []):
+            i = bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def lookup(self, prefix, limit=8):
+        """Retorna hasta `limit` coincidencias (categorías primero) sin consultar la BD"""
+        prefix = ' '.join(fold(prefix).split())
+        if not prefix:
+            return []
+        self._ensure_fresh()
+
+        results = [
+            {'label': label, 'type': 'categoria', 'url': reverse('categoria', args=[code])}
+            for key, code, label in self.CATEGORIES if key.startswith(prefix)
+        ][:limit]
+        matches = {}
+        # update_product modifica la lista en su lugar (insort/del): se recorre con el lock
+        with self._lock:
+            entries = self._entries
+            i = bisect_left(entries, (prefix,))
+            while len(results) + len(matches) < limit and i < len(entries) and entries[i][0].startswith(prefix):
+                _, pk, title = entries[i]
+                i += 1
+                matches.setdefault(pk, title)
+        results.extend(
+            {'label': title, 'type': 'producto', 'url': reverse('product-detail', args=[pk])}
+            for pk, title in matches.items()
+        )
+        return results
+
+
+index = PrefixIndex()
+
+
+def suggest(prefix, limit=8):
+    return index.lookup(prefix, min(max(limit, 1), MAX_RESULTS))
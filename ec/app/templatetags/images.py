@@ -0,0 +1,70 @@
+import hashlib
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from app.caching import cached_query
+from app.catalog import CATALOG_VERSION_KEY
+from app.images import FORMATS, MIME, WIDTHS, derivative_name, has_derivatives
+
+register = template.Library()
+
+DEFAULT_SIZES = "(max-width: 576px) 50vw, 320px"
+DERIVATIVES_KEY = "images:derivatives:{}"
+DERIVATIVES_TIMEOUT = 60 * 60 * 24
+
+
+def _img(src, alt, css_class, loading):
+    return format_html('<img src="{}" alt="{}" class="{}" loading="{}">', src, alt, css_class, loading)
+
+
+def _picture(name, url, alt, sizes, css_class, loading):
+    """<picture> con un <source> por formato moderno y <img> JPEG con srcset"""
+    def srcset(fmt):
+        return ', '.join(f"{url(derivative_name(name, w, fmt))} {w}w" for w in WIDTHS)
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME[fmt], srcset(fmt), sizes) for fmt in FORMATS if fmt != 'jpeg'),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}" decoding="async"></picture>',
+        sources, url(derivative_name(name, WIDTHS[1], 'jpeg')), srcset('jpeg'), sizes, alt, css_class, loading,
+    )
+
+
+def _media_has_derivatives(name):
+    """has_derivatives sin ir al storage en cada render; generarlos sube la versión del catálogo"""
+    return cached_query(
+        DERIVATIVES_KEY.format(hashlib.md5(name.encode()).hexdigest()),
+        lambda: has_derivatives(name),
+        DERIVATIVES_TIMEOUT, versions=[CATALOG_VERSION_KEY],
+    )
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes=DEFAULT_SIZES, css_class='', loading='lazy'):
+    """Imagen subida (ImageField o ruta en MEDIA_ROOT) con srcset; usa la original si no hay derivados"""
+    name = getattr(image, 'name', image) or ''
+    if not name or not _media_has_derivatives(name):
+        return _img(default_storage.url(name) if name else '', alt, css_class, loading)
+    return _picture(name, default_storage.url, alt, sizes, css_class, loading)
+
+
+@lru_cache(maxsize=None)
+def _static_has_derivatives(path):
+    target = derivative_name(path, WIDTHS[-1], FORMATS[-1])
+    return bool(finders.find(target)) or staticfiles_storage.exists(target)
+
+
+@register.simple_tag
+def responsive_static(path, alt='', sizes='100vw', css_class='', loading='lazy'):
+    """Imagen de static/ con srcset (derivados creados con build_image_derivatives --static)"""
+    if not _static_has_derivatives(path):
+        return _img(static(path), alt, css_class, loading)
+    return _picture(path, static, alt, sizes, css_class, loading)
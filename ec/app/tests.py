@@ -1,3 +1,1352 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import runpy
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import QuerySet, Sum
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from ec import settings as project_settings
+
+from .analytics import refresh_rollups
+from .caching import MISSING, bump_version, cached_query
+from .catalog import CATALOG_VERSION_KEY, bump_catalog_version, catalog_version
+from .counters import CART_TOTAL_MAX_AGE, get_cart_total
+from .images import FORMATS, WIDTHS, _generate_quietly, generate_derivatives
+from .models import (
+    Bestseller, BoughtTogether, Cart, CartSummary, Customer, DailyCategorySales, DailyDepartmentSales, DailyProductSales, OrderPlaced,
+    OrderStatusChange, OrderSummary, Payment, Product, ShippingRule, Wishlist, WishlistPopular,
+)
+from .money import to_cents
+from .orders import place_order, refresh_order_summary
+from .paginators import EstimatedCountPaginator
+from .paypal import AsyncPayPalClient, PayPalClient
+from .paypal_stub import StubPayPalServer
+from .recommendations import refresh_recommendations
+from .routers import CatalogReplicaRouter
+from .shipping import order_total, shipping_cost
+from .verification import (
+    STATUS_MISMATCH, STATUS_VERIFYING, averify_with_retries, claim_stale_payments, verify_with_retries,
+)
+from .views import _plus_cart_line
+from .workflow import InvalidStatus, change_status, import_tracking
+
+
+def crear_producto(n, precio=10.0):
+    return Product.objects.create(
+        title=f"Producto {n}",
+        selling_price=precio + 5,
+        precio_descuento=precio,
+        description="Descripción",
+        categoria='CA',
+        imagen_producto='product/c1.png',
+    )
+
+
+class CartQueryCountTests(TestCase):
+    """El número de consultas del carrito y las órdenes no depende de la cantidad de líneas"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        self.customer = Customer.objects.create(
+            user=self.user, name='Cliente', localidad='Centro',
+            departamento='San Salvador', codigopostal=1101,
+        )
+        self.client.force_login(self.user)
+
+    def llenar_carrito(self, n):
+        Cart.objects.filter(user=self.user).delete()
+        for i in range(n):
+            Cart.objects.create(user=self.user, product=crear_producto(i), cantidad=2)
+
+    def llenar_ordenes(self, n):
+        OrderPlaced.objects.filter(user=self.user).delete()
+        payment = Payment.objects.create(user=self.user, amount=100, paid=True)
+        for i in range(n):
+            OrderPlaced.objects.create(
+                user=self.user, customer=self.customer, product=crear_producto(i),
+                cantidad=1, payment=payment,
+            )
+
+    def assertConsultasFijas(self, url, llenar, num):
+        for n in (1, 6):
+            llenar(n)
+            self.client.get(url)  # calienta la caché de contadores
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_show_cart(self):
+        # sesión, usuario, líneas con producto, fila del total (sin SUM)
+        self.assertConsultasFijas(reverse('showcart'), self.llenar_carrito, 4)
+
+    def test_checkout(self):
+        # sesión, usuario, direcciones, líneas con producto, total
+        self.assertConsultasFijas(reverse('checkout'), self.llenar_carrito, 5)
+
+    def test_orders(self):
+        # sesión, usuario, resumen, pagos de la página, sus líneas (sin JOIN a producto)
+        self.assertConsultasFijas(reverse('orders'), self.llenar_ordenes, 5)
+
+    def test_total_calculado_en_bd(self):
+        self.llenar_carrito(3)
+        with self.assertNumQueries(1):
+            total = Cart.objects.filter(user=self.user).total()
+        self.assertEqual(total, 3 * 2 * 10.0)
+        self.assertEqual(Cart.objects.none().total(), 0)
+
+
+class HeaderCountsTests(TestCase):
+    """Badges del header desde la caché, invalidados al agregar al carrito o a la wishlist"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        self.productos = [crear_producto(i) for i in range(2)]
+        self.client.force_login(self.user)
+
+    def contadores(self):
+        context = self.client.get(reverse('about')).context
+        return context['totalitem'], context['wishitem']
+
+    def test_contadores_cacheados_e_invalidados(self):
+        self.assertEqual(self.contadores(), (0, 0))
+        with self.assertNumQueries(2):  # sesión y usuario: los contadores salen de la caché
+            self.assertEqual(self.contadores(), (0, 0))
+
+        # la caché se invalida al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            for producto in self.productos:
+                self.client.get(reverse('add-to-cart'), {'prod_id': producto.pk})
+            self.client.get(reverse('add-to-cart'), {'prod_id': self.productos[0].pk})  # solo suma cantidad
+            self.client.post(reverse('pluswishlist'), {'prod_id': self.productos[0].pk})
+        self.assertEqual(self.contadores(), (2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('removecart'), {'prod_id': self.productos[1].pk})
+            self.client.post(reverse('minuswishlist'), {'prod_id': self.productos[0].pk})
+        self.assertEqual(self.contadores(), (1, 0))
+
+    def test_cambios_fuera_de_las_vistas(self):
+        self.assertEqual(self.contadores(), (0, 0))
+        with self.captureOnCommitCallbacks() as callbacks:
+            Cart.objects.create(user=self.user, product=self.productos[0])
+            Wishlist.objects.create(user=self.user, product=self.productos[1])
+        self.assertEqual(self.contadores(), (0, 0))  # sin confirmar sigue la cifra vieja
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.contadores(), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.productos[0].delete()  # la cascada borra la línea del carrito
+            Wishlist.objects.filter(user=self.user).delete()
+        self.assertEqual(self.contadores(), (0, 0))
+
+
+class GuestCartTests(TestCase):
+    """Carrito de invitado en cookie: sin escrituras en la BD hasta iniciar sesión"""
+
+    def setUp(self):
+        cache.clear()
+        self.productos = [crear_producto(i) for i in range(2)]
+
+    def test_invitado_no_escribe_en_la_bd(self):
+        p0, p1 = self.productos
+        with CaptureQueriesContext(connection) as ctx:
+            for producto in (p0, p1, p1):
+                self.client.get(reverse('add-to-cart'), {'prod_id': producto.pk})
+            response = self.client.get(reverse('pluscart'), {'prod_id': p0.pk})
+            self.assertEqual(response.json()['amount'], 40.0)
+            self.client.get(reverse('minuscart'), {'prod_id': p1.pk})
+        self.assertTrue(all(q['sql'].startswith('SELECT') for q in ctx.captured_queries))
+        self.assertFalse(Cart.objects.exists())
+
+        # una sola consulta: los productos de la cookie
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('showcart'))
+        self.assertEqual([(l.product, l.cantidad) for l in response.context['cart']], [(p0, 2), (p1, 1)])
+        self.assertEqual(response.context['amount'], Decimal('30.00'))
+        self.assertEqual(response.context['totalitem'], 2)
+
+        self.client.cookies['guest_cart'] = 'alterada'
+        self.assertEqual(len(self.client.get(reverse('showcart')).context['cart']), 0)
+
+    def test_se_fusiona_al_iniciar_sesion(self):
+        p0, p1 = self.productos
+        user = User.objects.create_user('cliente', password='clave-segura-123')
+        Cart.objects.create(user=user, product=p0, cantidad=2)
+        for producto in (p0, p1, p1):
+            self.client.get(reverse('add-to-cart'), {'prod_id': producto.pk})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('login'), {'username': 'cliente', 'password': 'clave-segura-123'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'INTO "app_cart"' in q['sql']]), 1)
+        # las cantidades se leen dentro de la transacción de la fusión
+        sql = [q['sql'] for q in ctx.captured_queries]
+        read = next(i for i, q in enumerate(sql) if 'FROM "app_product"' in q and '"app_cart"' in q)
+        self.assertTrue(any(q.startswith('SAVEPOINT') for q in sql[read - 2:read]))
+        self.assertEqual(
+            sorted(Cart.objects.filter(user=user).values_list('product_id', 'cantidad')), [(p0.pk, 3), (p1.pk, 2)],
+        )
+        self.assertEqual(response.cookies['guest_cart'].value, '')
+        self.assertEqual(self.client.get(reverse('showcart')).context['totalitem'], 2)
+
+
+class WishlistTests(TestCase):
+    """Detalle del producto en una consulta y toggle de wishlist por POST sin leer el producto"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        self.product = crear_producto(1)
+        self.client.force_login(self.user)
+
+    def consultas(self, method, url, data=None):
+        """Consultas de una petición sin contar los SAVEPOINT de la transacción del test"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data)
+        sql = [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        return response, len(sql)
+
+    def test_detalle_una_consulta(self):
+        url = reverse('product-detail', args=[self.product.pk])
+        Wishlist.objects.create(user=self.user, product=self.product)
+        self.client.get(url)  # calienta contadores y carruseles
+        # sesión, usuario, producto con in_wishlist
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertTrue(response.context['wishlist'])
+
+        self.client.logout()
+        # anónimo: solo el producto al renderizar; después la sirve la caché de páginas
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertFalse(response.context['wishlist'])
+        # sin sesión el corazón lleva al login en vez de hacer un POST sin token CSRF
+        self.assertContains(response, f'href="{reverse("login")}?next={url}"')
+        self.assertNotContains(response, 'class="plus-wishlist')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_toggle_por_post(self):
+        plus, minus = reverse('pluswishlist'), reverse('minuswishlist')
+        self.assertEqual(self.client.get(plus, {'prod_id': self.product.pk}).status_code, 405)
+
+        for _ in range(2):
+            # sesión, usuario, INSERT que ignora el duplicado
+            response, n = self.consultas('post', plus, {'prod_id': self.product.pk})
+            self.assertEqual((response.status_code, n), (200, 3))
+        self.assertTrue(response.json()['in_wishlist'])
+        self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 1)
+
+        response, n = self.consultas('post', minus, {'prod_id': self.product.pk})
+        self.assertEqual((response.status_code, n), (200, 4))  # el DELETE lee la fila para la señal
+        self.assertFalse(Wishlist.objects.exists())
+        self.assertEqual(self.client.post(plus, {'prod_id': 'x'}).status_code, 404)
+
+
+class WishlistMissingProductTests(TransactionTestCase):
+    """En SQLite la FK se verifica al confirmar: hace falta una transacción real"""
+
+    def test_producto_inexistente(self):
+        self.client.force_login(User.objects.create_user('cliente', password='clave-segura-123'))
+        self.assertEqual(self.client.post(reverse('pluswishlist'), {'prod_id': 999999}).status_code, 404)
+        self.assertFalse(Wishlist.objects.exists())
+
+
+class CartAjaxTests(TestCase):
+    """Los endpoints AJAX actualizan el total incrementalmente sin recorrer el carrito"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        self.client.force_login(self.user)
+        for i in range(5):
+            Cart.objects.create(user=self.user, product=crear_producto(i, precio=10.5), cantidad=2)
+        self.product = Cart.objects.filter(user=self.user).first().product
+        self.client.get(reverse('showcart'))  # crea la fila del total
+
+    def test_plus_minus_remove(self):
+        url_args = {'prod_id': self.product.pk}
+        # sesión, usuario, SAVEPOINT, UPDATE y SELECT de la línea, UPDATE y SELECT del total, RELEASE
+        with self.assertNumQueries(8):
+            data = self.client.get(reverse('pluscart'), url_args).json()
+        self.assertEqual(data, {'cantidad': 3, 'amount': 115.5, 'shipping': 40.0, 'totalamount': 155.5})
+
+        data = self.client.get(reverse('minuscart'), url_args).json()
+        self.assertEqual(data['cantidad'], 2)
+        self.assertEqual(data['amount'], 105.0)
+
+        data = self.client.get(reverse('removecart'), url_args).json()
+        self.assertEqual(data['cantidad'], 0)
+        self.assertEqual(data['amount'], 84.0)
+        self.assertEqual(data['amount'], Cart.objects.filter(user=self.user).total())
+
+    def test_minus_no_baja_de_uno(self):
+        Cart.objects.filter(user=self.user, product=self.product).update(cantidad=1)
+        CartSummary.objects.all().delete()
+        data = self.client.get(reverse('minuscart'), {'prod_id': self.product.pk}).json()
+        self.assertEqual(data['cantidad'], 1)
+        self.assertEqual(data['amount'], Cart.objects.filter(user=self.user).total())
+
+    def test_add_to_cart_incrementa_linea_existente(self):
+        self.client.get(reverse('add-to-cart'), {'prod_id': self.product.pk})
+        self.assertEqual(Cart.objects.get(user=self.user, product=self.product).cantidad, 3)
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 5)
+
+    def test_linea_editada_fuera_de_las_vistas(self):
+        line = Cart.objects.get(user=self.user, product=self.product)
+        line.cantidad = 5  # p. ej. desde el admin
+        line.save()
+        self.assertEqual(self.client.get(reverse('showcart')).context['amount'], Decimal('136.50'))
+        line.delete()
+        self.assertEqual(self.client.get(reverse('showcart')).context['amount'], Decimal('84.00'))
+
+    def test_total_viejo_se_recalcula(self):
+        # update() no manda señales: el SUM periódico corrige el total
+        Product.objects.filter(pk=self.product.pk).update(precio_descuento=Decimal('0.50'))
+        self.assertEqual(self.client.get(reverse('showcart')).context['amount'], Decimal('105.00'))
+        CartSummary.objects.update(refreshed_at=timezone.now() - timedelta(seconds=CART_TOTAL_MAX_AGE + 1))
+        self.assertEqual(self.client.get(reverse('showcart')).context['amount'], Decimal('85.00'))
+
+    def test_producto_fuera_del_carrito(self):
+        otro = crear_producto(99)
+        response = self.client.get(reverse('pluscart'), {'prod_id': otro.pk})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cambio_de_precio_recalcula_el_total(self):
+        self.product.precio_descuento = Decimal('1.00')
+        self.product.save()
+        self.assertEqual(self.client.get(reverse('showcart')).context['amount'], Decimal('86.00'))
+        self.product.delete()
+        self.assertEqual(self.client.get(reverse('showcart')).context['amount'], Decimal('84.00'))
+
+    async def test_endpoints_asincronos_por_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        url_args = {'prod_id': self.product.pk}
+        data = (await self.async_client.get(reverse('pluscart'), url_args)).json()
+        self.assertEqual((data['cantidad'], data['amount']), (3, 115.5))
+
+        response = await self.async_client.post(reverse('pluswishlist'), url_args)
+        self.assertTrue(response.json()['in_wishlist'])
+        self.assertTrue(await Wishlist.objects.filter(user=self.user, product=self.product).aexists())
+
+        data = (await self.async_client.get(reverse('removecart'), url_args)).json()
+        self.assertEqual((data['cantidad'], data['amount']), (0, 84.0))
+        response = await self.async_client.get(reverse('minuscart'), url_args)
+        self.assertEqual(response.status_code, 404)
+
+
+class CartTotalConcurrencyTests(TransactionTestCase):
+    """Clics simultáneos en el carrito no pierden deltas del total"""
+
+    def test_incrementos_concurrentes(self):
+        user = User.objects.create_user('cliente', password='clave-segura-123')
+        with patch('app.signals.schedule_derivatives'):  # aquí on_commit corre de verdad
+            productos = [crear_producto(i, precio=1.25) for i in range(4)]
+        for producto in productos:
+            Cart.objects.create(user=user, product=producto)
+        get_cart_total(user)
+
+        def clics(producto):
+            # lo que hace plus_cart: línea y total en una transacción
+            hechos = 0
+            while hechos < 25:
+                try:
+                    _plus_cart_line(user, Cart.objects.filter(user=user, product=producto))
+                except OperationalError:
+                    # la BD de pruebas en memoria no espera el lock como busy_timeout:
+                    # la transacción se revirtió entera y el clic se repite
+                    continue
+                hechos += 1
+            connection.close()
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(clics, productos * 2))
+        self.assertEqual(get_cart_total(user), Cart.objects.filter(user=user).total())
+        self.assertEqual(get_cart_total(user), Decimal('1.25') * (4 + 8 * 25))
+
+
+class MoneyTests(TestCase):
+    """Totales exactos en Decimal y envío según ShippingRule"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        self.client.force_login(self.user)
+
+    def test_total_exacto_en_la_bd(self):
+        for i in range(3):
+            Cart.objects.create(user=self.user, product=crear_producto(i, precio=0.1), cantidad=1)
+        total = Cart.objects.filter(user=self.user).total()
+        self.assertEqual(total, Decimal('0.30'))
+        self.assertEqual(to_cents(total), 30)
+        self.assertEqual(Cart.objects.none().total(), Decimal('0.00'))
+
+    def test_reglas_de_envio(self):
+        self.assertEqual(order_total(Decimal('10.00')), (Decimal('40.00'), Decimal('50.00')))
+        ShippingRule.objects.create(name='Gratis', min_subtotal=Decimal('100.00'), cost=Decimal('0.00'))
+        self.assertEqual(shipping_cost(Decimal('99.99')), Decimal('40.00'))
+        self.assertEqual(order_total(Decimal('100.00')), (Decimal('0.00'), Decimal('100.00')))
+
+        Cart.objects.create(user=self.user, product=crear_producto(1, precio=60), cantidad=2)
+        response = self.client.get(reverse('checkout'))
+        self.assertEqual(response.context['totalamount'], '120.00')
+        self.assertEqual(response.context['razoraumont'], 12000)
+
+
+class OrderSnapshotTests(TestCase):
+    """Las órdenes guardan precio, título e imagen del producto al momento de la compra"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        self.customer = Customer.objects.create(
+            user=self.user, name='Cliente', localidad='Centro',
+            departamento='San Salvador', codigopostal=1101,
+        )
+        self.payment = Payment.objects.create(user=self.user, amount=100, paid=True)
+        self.product = crear_producto(1, precio=12.5)
+        self.client.force_login(self.user)
+
+    def crear_orden(self):
+        return OrderPlaced.objects.create(
+            user=self.user, customer=self.customer, product=self.product, cantidad=2, payment=self.payment,
+        )
+
+    def test_editar_producto_no_cambia_la_orden(self):
+        self.crear_orden()
+        Product.objects.filter(pk=self.product.pk).update(precio_descuento=99, title='Otro')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('orders'))
+        self.assertFalse([q for q in ctx.captured_queries if 'app_product' in q['sql']])
+        op = response.context['page'].groups[0][1][0]
+        self.assertEqual((op.product_title, op.subtotal), ('Producto 1', Decimal('25.00')))
+        self.assertContains(response, 'Producto 1')
+
+    def test_backfill(self):
+        orden = self.crear_orden()
+        OrderPlaced.objects.filter(pk=orden.pk).update(unit_price=None, product_title='', product_image='')
+        call_command('backfill_order_snapshots', batch_size=1, stdout=StringIO())
+        orden.refresh_from_db()
+        self.assertEqual(
+            (orden.unit_price, orden.product_title, orden.product_image),
+            (Decimal('12.50'), 'Producto 1', 'product/c1.png'),
+        )
+        self.assertEqual(orden.total_cost, Decimal('25.00'))
+
+
+class AdminChangelistTests(TestCase):
+    """Listados del admin con consultas fijas y conteo estimado"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.customer = Customer.objects.create(
+            user=self.admin, name='Cliente Admin', localidad='Centro',
+            departamento='San Salvador', codigopostal=1101,
+        )
+        self.payment = Payment.objects.create(user=self.admin, amount=100, paid=True)
+        self.client.force_login(self.admin)
+
+    def crear_ordenes(self, n):
+        for i in range(n):
+            OrderPlaced.objects.create(
+                user=self.admin, customer=self.customer, product=crear_producto(i), payment=self.payment,
+            )
+
+    def test_consultas_fijas_y_enlace_al_cliente(self):
+        url = reverse('admin:app_orderplaced_changelist')
+        self.crear_ordenes(1)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.crear_ordenes(5)
+        with self.assertNumQueries(len(ctx.captured_queries)):
+            response = self.client.get(url)
+        self.assertContains(response, reverse('admin:app_customer_change', args=[self.customer.pk]))
+        self.assertEqual(self.client.get(url, {'status__exact': 'Pending'}).status_code, 200)
+
+    def test_fechas_por_indice_igual_que_distinct(self):
+        self.crear_ordenes(3)
+        for i, dias in enumerate((400, 35)):
+            OrderPlaced.objects.filter(pk=OrderPlaced.objects.order_by('pk')[i].pk).update(
+                ordered_date=timezone.now() - timedelta(days=dias)
+            )
+        for kind in ('year', 'month', 'day'):
+            qs = OrderPlaced.objects.all()
+            self.assertEqual(qs.datetimes('ordered_date', kind), list(QuerySet.datetimes(qs, 'ordered_date', kind)))
+        self.assertEqual(OrderPlaced.objects.none().datetimes('ordered_date', 'year'), [])
+
+    def test_conteo_estimado(self):
+        for i in range(3):
+            crear_producto(i)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        crear_producto(3)
+        with patch('app.paginators.ESTIMATE_THRESHOLD', 1):
+            # sin filtros usa las estadísticas (desactualizadas a propósito); con filtros cuenta
+            self.assertEqual(EstimatedCountPaginator(Product.objects.order_by('pk'), 10).count, 3)
+            self.assertEqual(EstimatedCountPaginator(Product.objects.filter(categoria='CA').order_by('pk'), 10).count, 4)
+        self.assertEqual(EstimatedCountPaginator(Product.objects.order_by('pk'), 10).count, 4)
+
+
+class OrderStatusWorkflowTests(TestCase):
+    """Transiciones validadas en lote, historial e importación de tracking"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        customer = Customer.objects.create(
+            user=self.user, name='Cliente', localidad='Centro',
+            departamento='San Salvador', codigopostal=1101,
+        )
+        payment = Payment.objects.create(user=self.user, amount=100, paid=True)
+        product = crear_producto(1)
+        self.ordenes = [
+            OrderPlaced.objects.create(user=self.user, customer=customer, product=product, payment=payment, status=status)
+            for status in ('Pending', 'Pending', 'Accepted', 'Delivered', 'Pending')
+        ]
+
+    def estados(self):
+        return list(OrderPlaced.objects.order_by('pk').values_list('status', flat=True))
+
+    def test_cambio_en_lotes_omite_transiciones_invalidas(self):
+        changed = change_status(OrderPlaced.objects.all(), 'Accepted', user=self.user, source='admin', batch_size=2)
+        self.assertEqual(changed, 3)
+        self.assertEqual(self.estados(), ['Accepted', 'Accepted', 'Accepted', 'Delivered', 'Accepted'])
+        self.assertEqual(OrderStatusChange.objects.filter(to_status='Accepted', changed_by=self.user).count(), 3)
+        with self.assertRaises(InvalidStatus):
+            change_status(OrderPlaced.objects.all(), 'Perdido')
+
+    def test_cancelar_actualiza_el_resumen(self):
+        call_command('change_order_status', 'Cancel', '--from', 'Pending', stdout=StringIO())
+        self.assertEqual(self.estados(), ['Cancel', 'Cancel', 'Accepted', 'Delivered', 'Cancel'])
+        self.assertEqual(OrderSummary.objects.get(user=self.user).total_spent, Decimal('20.00'))
+
+    def test_accion_del_admin(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('admin:app_orderplaced_changelist'), {
+            'action': 'mark_packed', '_selected_action': [o.pk for o in self.ordenes],
+        }, follow=True)
+        self.assertContains(response, "1 líneas pasaron a &#x27;Packed&#x27;")
+        self.assertEqual(self.estados()[2], 'Packed')
+
+    def test_importar_tracking(self):
+        pk = [o.pk for o in self.ordenes]
+        rows = [
+            {'order': pk[2], 'tracking_number': 'GUIA-1', 'status': 'Packed'},
+            {'order': pk[0], 'tracking_number': 'GUIA-2', 'status': ''},  # Pending -> On The Way no es válido
+            {'order': 'x', 'tracking_number': 'GUIA-3'},
+            {'order': 999999, 'tracking_number': 'GUIA-4'},
+            {'order': pk[1], 'tracking_number': '', 'status': 'Volando'},
+        ]
+        path = Path(tempfile.mkdtemp()) / 'guias.csv'
+        self.addCleanup(shutil.rmtree, path.parent)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, ['order', 'tracking_number', 'status'])
+            writer.writeheader()
+            writer.writerows(rows)
+
+        err = StringIO()
+        call_command('import_tracking', str(path), '--batch-size', 2, stdout=StringIO(), stderr=err)
+        self.assertEqual(self.estados()[:3], ['Pending', 'Pending', 'Packed'])
+        self.assertEqual(
+            list(OrderPlaced.objects.filter(pk__in=pk[:3]).order_by('pk').values_list('tracking_number', flat=True)),
+            ['', '', 'GUIA-1'],  # la fila rechazada no guarda la guía
+        )
+        self.assertEqual(
+            err.getvalue().splitlines(),
+            [
+                f"Línea 3: La orden {pk[0]} no puede pasar de Pending a On The Way",
+                "Línea 4: Número de orden inválido: 'x'",
+                "Línea 5: La orden 999999 no existe",
+                "Línea 6: Estado desconocido: Volando",
+            ],
+        )
+        # ya en el estado pedido: solo cambia la guía
+        result = import_tracking([{'order': pk[2], 'tracking_number': 'GUIA-5', 'status': 'Packed'}])
+        self.assertEqual((result['changed'], result['errors']), (0, []))
+        self.assertEqual(OrderPlaced.objects.get(pk=pk[2]).tracking_number, 'GUIA-5')
+
+
+class ExportTests(TestCase):
+    """Exportación en stream de órdenes y pagos (CSV/JSONL)"""
+
+    def setUp(self):
+        self.staff = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        customer = Customer.objects.create(
+            user=self.staff, name='Cliente Ñandú', localidad='Centro',
+            departamento='San Salvador', codigopostal=1101,
+        )
+        payment = Payment.objects.create(user=self.staff, amount=Decimal('25.50'), paid=True, order_id='PP-1')
+        product = crear_producto(1, precio=12.75)
+        self.ordenes = [
+            OrderPlaced.objects.create(user=self.staff, customer=customer, product=product, payment=payment, status=status)
+            for status in ('Pending', 'Delivered', 'Pending')
+        ]
+        # La primera orden es de hace un mes
+        OrderPlaced.objects.filter(pk=self.ordenes[0].pk).update(ordered_date=timezone.now() - timedelta(days=30))
+
+    def descargar(self, **params):
+        response = self.client.get(reverse('export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_solo_staff(self):
+        cliente = User.objects.create_user('cliente', password='clave-segura-123')
+        self.client.force_login(cliente)
+        self.assertEqual(self.client.get(reverse('export')).status_code, 302)
+
+    def test_csv_con_filtros(self):
+        self.client.force_login(self.staff)
+        rows = list(csv.DictReader(StringIO(self.descargar(status='Pending'))))
+        self.assertEqual([int(r['id']) for r in rows], [self.ordenes[0].pk, self.ordenes[2].pk])
+        self.assertEqual(rows[0]['cliente'], 'Cliente Ñandú')
+        self.assertEqual(rows[0]['precio_unitario'], '12.75')
+        self.assertEqual(rows[0]['paypal_order_id'], 'PP-1')
+
+        desde = (timezone.localdate() - timedelta(days=1)).isoformat()
+        rows = list(csv.DictReader(StringIO(self.descargar(start=desde))))
+        self.assertEqual([int(r['id']) for r in rows], [o.pk for o in self.ordenes[1:]])
+        for fecha in ('ayer', '2024-02-30'):
+            self.assertEqual(self.client.get(reverse('export'), {'start': fecha}).status_code, 400)
+
+    def test_jsonl_de_pagos(self):
+        self.client.force_login(self.staff)
+        lines = self.descargar(kind='payments', format='jsonl').splitlines()
+        self.assertEqual(len(lines), 1)
+        pago = json.loads(lines[0])
+        self.assertEqual((pago['monto'], pago['pagado'], pago['usuario']), ('25.50', True, 'admin'))
+
+    async def test_stream_asincrono_por_asgi(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('export'), {'status': 'Pending'})
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([int(r['id']) for r in csv.DictReader(StringIO(body))], [self.ordenes[0].pk, self.ordenes[2].pk])
+
+    def test_comando(self):
+        path = Path(tempfile.mkdtemp()) / 'ordenes.jsonl'
+        self.addCleanup(shutil.rmtree, path.parent)
+        call_command('export_data', '--format', 'jsonl', '--output', str(path), '--chunk-size', 1, stderr=StringIO())
+        ids = [json.loads(line)['id'] for line in path.read_text(encoding='utf-8').splitlines()]
+        self.assertEqual(ids, [o.pk for o in self.ordenes])
+        with self.assertRaisesMessage(CommandError, 'fecha válida'):
+            call_command('export_data', '--start', '2024-02-30', stdout=StringIO())
+
+
+class SalesRollupTests(TestCase):
+    """Ventas diarias: carga inicial, corrida incremental y tablero que solo lee los rollups"""
+
+    def setUp(self):
+        self.staff = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.customer = Customer.objects.create(
+            user=self.staff, name='Cliente', localidad='Centro', departamento='SS', codigopostal=1101,
+        )
+        self.payment = Payment.objects.create(user=self.staff, amount=100, paid=True)
+        self.productos = [crear_producto(1, precio=10), crear_producto(2, precio=25)]
+        self.productos[1].categoria = 'GO'
+        self.productos[1].save()
+        self.ordenes = [self.ordenar(p, cantidad, dias) for p, cantidad, dias in (
+            (self.productos[0], 2, 0), (self.productos[1], 1, 0), (self.productos[0], 1, 3), (self.productos[1], 3, 40),
+        )]
+
+    def ordenar(self, product, cantidad, dias):
+        orden = OrderPlaced.objects.create(
+            user=self.staff, customer=self.customer, product=product, payment=self.payment, cantidad=cantidad,
+        )
+        OrderPlaced.objects.filter(pk=orden.pk).update(ordered_date=timezone.now() - timedelta(days=dias))
+        return orden
+
+    def por_categoria(self):
+        return dict(DailyCategorySales.objects.values('categoria').annotate(r=Sum('revenue')).values_list('categoria', 'r'))
+
+    def test_incremental_igual_que_completa(self):
+        self.assertEqual(refresh_rollups(), 41)
+        self.assertEqual(self.por_categoria(), {'CA': Decimal('30.00'), 'GO': Decimal('100.00')})
+        self.assertEqual(DailyDepartmentSales.objects.get(day=timezone.localdate()).units, 3)
+
+        self.ordenar(self.productos[1], 2, 0)
+        change_status(OrderPlaced.objects.filter(pk=self.ordenes[3].pk), 'Cancel')
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertEqual(self.por_categoria(), {'CA': Decimal('30.00'), 'GO': Decimal('75.00')})
+        incremental = sorted(DailyProductSales.objects.values_list('day', 'product_id', 'lines', 'units', 'revenue'))
+        self.assertEqual(refresh_rollups(), 0)
+
+        refresh_rollups(full=True)
+        self.assertEqual(
+            sorted(DailyProductSales.objects.values_list('day', 'product_id', 'lines', 'units', 'revenue')), incremental,
+        )
+
+    def test_tablero(self):
+        refresh_rollups()
+        self.client.force_login(self.staff)
+        self.client.get(reverse('sales-dashboard'))  # calienta la caché de contadores
+        # sesión, usuario, productos, categorías, departamentos, días, última actualización
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('sales-dashboard'), {'days': 7})
+        self.assertEqual(response.context['total'], Decimal('55.00'))
+        self.assertEqual([row['product_id'] for row in response.context['top_products']], [p.pk for p in self.productos])
+        self.assertContains(response, 'San Salvador')
+
+        cliente = User.objects.create_user('cliente', password='clave-segura-123')
+        self.client.force_login(cliente)
+        self.assertEqual(self.client.get(reverse('sales-dashboard')).status_code, 302)
+
+
+class RecommendationTests(TestCase):
+    """Carruseles precalculados: se leen de la caché sin agregar en vivo"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        customer = Customer.objects.create(
+            user=self.user, name='Cliente', localidad='Centro', departamento='San Salvador', codigopostal=1101,
+        )
+        self.p = [crear_producto(i) for i in range(4)]
+        for productos, cancelado in (([0, 1], None), ([0, 1, 2], None), ([0, 2], 2)):
+            payment = Payment.objects.create(user=self.user, amount=10, paid=True)
+            for i in productos:
+                OrderPlaced.objects.create(
+                    user=self.user, customer=customer, product=self.p[i], payment=payment, cantidad=i + 1,
+                    status='Cancel' if i == cancelado else 'Pending',
+                )
+        for i, producto in enumerate([self.p[3], self.p[3], self.p[1]]):
+            Wishlist.objects.create(user=User.objects.create_user(f'fan{i}'), product=producto)
+
+    def test_tablas_precalculadas(self):
+        refresh_recommendations()
+        self.assertEqual(
+            list(BoughtTogether.objects.filter(product=self.p[0]).order_by('rank').values_list('other_id', 'payments')),
+            [(self.p[1].pk, 2), (self.p[2].pk, 1)],
+        )
+        self.assertEqual(
+            list(Bestseller.objects.filter(categoria='').order_by('rank').values_list('product_id', 'units')),
+            [(self.p[1].pk, 4), (self.p[0].pk, 3), (self.p[2].pk, 3)],  # empate: menor id primero
+        )
+        self.assertEqual(list(WishlistPopular.objects.order_by('rank').values_list('product_id', 'users')),
+                         [(self.p[3].pk, 2), (self.p[1].pk, 1)])
+
+    def test_paginas_sin_agregacion(self):
+        refresh_recommendations()
+        response = self.client.get(reverse('home'))
+        self.assertEqual([c['id'] for c in response.context['wishlist_popular']], [self.p[3].pk, self.p[1].pk])
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'id="slider1"')
+
+        url = reverse('product-detail', args=[self.p[0].pk])
+        response = self.client.get(url)
+        self.assertEqual([c['id'] for c in response.context['bought_together']], [self.p[1].pk, self.p[2].pk])
+        with self.assertNumQueries(0):  # la página anónima completa sale de la caché
+            self.client.get(url)
+
+        # Editar un producto cambia la versión del catálogo y reconstruye el carrusel
+        Product.objects.filter(pk=self.p[1].pk).update(title='Renombrado')
+        self.p[1].refresh_from_db()
+        self.p[1].save()
+        self.assertContains(self.client.get(url), 'Renombrado')
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    """Perfil de BD desde el entorno y router de la réplica"""
+
+    def test_postgres_con_pool_y_pgbouncer(self):
+        env = {'DB_POOL': '1', 'DB_POOL_MAX_SIZE': '20', 'DB_PGBOUNCER': '1'}
+        with patch.dict('os.environ', env):
+            config = project_settings.database_config('postgres://tienda:secreto@db:5432/tienda')
+        self.assertEqual((config['NAME'], config['HOST'], config['CONN_MAX_AGE']), ('tienda', 'db', 0))
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['OPTIONS']['pool']['max_size'], 20)
+        self.assertTrue(config['DISABLE_SERVER_SIDE_CURSORS'])
+
+        config = project_settings.database_config('postgres://tienda:secreto@db:5432/tienda')
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertNotIn('pool', config.get('OPTIONS', {}))
+
+    def test_wal_solo_con_la_variable(self):
+        with patch.dict('os.environ', {'SQLITE_WAL': ''}):
+            self.assertNotIn('journal_mode', project_settings.sqlite_options()['init_command'])
+        with patch.dict('os.environ', {'SQLITE_WAL': '1'}):
+            self.assertIn('PRAGMA journal_mode=WAL', project_settings.sqlite_options()['init_command'])
+
+    def test_router_catalogo(self):
+        router = CatalogReplicaRouter()
+        self.assertEqual(router.db_for_read(Product), 'replica')
+        self.assertEqual(router.db_for_read(Cart), 'default')
+        self.assertEqual(router.db_for_write(Product), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'app'))
+
+    def test_router_lecturas_fijadas_a_default(self):
+        router = CatalogReplicaRouter()
+        cart = Cart()
+        cart._state.db = 'default'
+        # la relación se lee de la misma base que el objeto
+        self.assertEqual(router.db_for_read(Product, instance=cart), 'default')
+        self.assertEqual(Product.objects.with_in_wishlist(User(pk=1)).db, 'default')
+
+
+class CachingTests(SimpleTestCase):
+    """cached_query: versiones, LRU del proceso y una sola reconstrucción a la vez"""
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return self.builds
+
+    def test_versiones_y_lru_local(self):
+        self.assertEqual(cached_query('k', self.build, versions=['v']), 1)
+        self.assertEqual(cached_query('k', self.build, versions=['v']), 1)
+        # otro worker cambia la versión: este proceso la ve cuando vence su LRU
+        caches['shared'].set('v', 2)
+        self.assertEqual(cached_query('k', self.build, versions=['v']), 1)
+        cache.local.clear()
+        self.assertEqual(cached_query('k', self.build, versions=['v']), 2)
+        # en el mismo proceso bump_version invalida al instante
+        bump_version('v')
+        self.assertEqual(cached_query('k', self.build, versions=['v']), 3)
+        self.assertEqual(self.builds, 3)
+
+    def test_version_sin_vencimiento_en_la_cache_de_archivos(self):
+        backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp()}
+        self.addCleanup(shutil.rmtree, backend['LOCATION'])
+        with override_settings(CACHES={'default': backend}):
+            file_cache = caches['default']
+            semilla = catalog_version()
+            bump_catalog_version()
+            version = file_cache.get(CATALOG_VERSION_KEY)
+            self.assertGreater(version, semilla)
+            with patch('django.core.cache.backends.filebased.time.time', return_value=time.time() + 10**6):
+                self.assertEqual(file_cache.get(CATALOG_VERSION_KEY), version)
+            # si la clave se pierde, la nueva semilla no repite una versión anterior
+            file_cache.delete(CATALOG_VERSION_KEY)
+            self.assertGreater(catalog_version(), version)
+
+    def test_ttl_con_jitter(self):
+        cached_query('k', self.build, timeout=100, jitter=0.1)
+        _, expires, _ = caches['shared'].get('k')
+        self.assertTrue(90 <= expires - time.time() <= 110)
+
+    def test_con_el_lock_tomado_se_sirve_la_anterior(self):
+        cached_query('k', self.build, timeout=100, local=False)
+        caches['shared'].set('v', 'nueva')
+        cache.add('k:lock', 1)  # otro proceso la está reconstruyendo
+        self.assertEqual(cached_query('k', self.build, versions=['v'], local=False), 1)
+        self.assertEqual(self.builds, 1)
+        cache.delete('k:lock')
+        self.assertEqual(cached_query('k', self.build, versions=['v'], local=False), 2)
+
+    def test_sin_entrada_espera_al_que_construye(self):
+        cache.add('k:lock', 1)
+        with patch('app.caching.WAIT_TIMEOUT', 0.1):
+            self.assertEqual(cached_query('k', self.build), 1)
+        self.assertIsNone(cache.get('k'))  # no pisa lo que guarde el dueño del lock
+
+    def test_escrituras_descartan_el_lru(self):
+        cache.local.set('k', 'vieja')
+        cache.set('k', 'nueva')
+        self.assertIs(cache.local.get('k'), MISSING)
+
+
+class ServingConfigTests(SimpleTestCase):
+    """gunicorn.conf.py: modo, tamaño de workers y reciclaje desde el entorno"""
+
+    def cargar(self, **env):
+        with patch.dict('os.environ', env), patch('os.sched_getaffinity', return_value={0, 1, 2, 3}):
+            return runpy.run_path(str(Path(project_settings.BASE_DIR) / 'gunicorn.conf.py'))
+
+    def test_modos(self):
+        config = self.cargar()
+        self.assertEqual((config['worker_class'], config['wsgi_app']), ('gthread', 'ec.wsgi:application'))
+        self.assertLessEqual(config['workers'], 5)
+        self.assertTrue(config['preload_app'])
+        self.assertGreater(config['max_requests_jitter'], 0)
+
+        config = self.cargar(WEB_MODE='asgi')
+        self.assertEqual(config['worker_class'], 'uvicorn.workers.UvicornWorker')
+        self.assertEqual(config['wsgi_app'], 'ec.asgi:application')
+
+        config = self.cargar(WEB_MODE='sync', WEB_CONCURRENCY='2', WEB_PRELOAD='0')
+        self.assertEqual((config['workers'], config['threads'], config['preload_app']), (2, 1, False))
+
+        with self.assertRaises(ValueError):
+            self.cargar(WEB_MODE='eventlet')
+
+    def test_cache_no_atomica(self):
+        server = Mock()
+        self.cargar(CACHE_URL='redis://localhost:6379/0', WEB_REQUIRE_ATOMIC_CACHE='1')['when_ready'](server)
+        server.log.warning.assert_not_called()
+
+        self.cargar(CACHE_URL='file:///tmp/ec-cache')['when_ready'](server)
+        server.log.warning.assert_called_once()
+        with self.assertRaises(RuntimeError):
+            self.cargar(CACHE_URL='file:///tmp/ec-cache', WEB_REQUIRE_ATOMIC_CACHE='1')
+
+
+class SavePaymentTests(TestCase):
+    """save_payment crea las órdenes en bloque y es idempotente por order_id"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        self.customer = Customer.objects.create(
+            user=self.user, name='Cliente', localidad='Centro',
+            departamento='San Salvador', codigopostal=1101,
+        )
+        self.client.force_login(self.user)
+        for i in range(3):
+            Cart.objects.create(user=self.user, product=crear_producto(i), cantidad=2)
+
+    def pagar(self, order_id='PAYPAL-1', **extra):
+        data = {
+            'id': order_id,
+            'status': 'COMPLETED',
+            'payer': {'email_address': 'cliente@example.com'},
+            'purchase_units': [{'amount': {'value': '100.00'}}],
+            'customer_id': self.customer.pk,
+            **extra,
+        }
+        return self.client.post(reverse('save-payment'), data, content_type='application/json').json()
+
+    def test_crea_ordenes_y_vacia_carrito(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.pagar(), {'success': True})
+        self.assertEqual(OrderPlaced.objects.filter(user=self.user).count(), 3)
+        self.assertFalse(OrderPlaced.objects.filter(user=self.user, unit_price=None).exists())
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+        # el pago no se da por bueno hasta verificarlo con PayPal
+        payment = Payment.objects.get(order_id='PAYPAL-1')
+        self.assertEqual((payment.status, payment.paid), (STATUS_VERIFYING, False))
+        # verificación con PayPal más la invalidación del contador por cada línea borrada
+        self.assertEqual(len(callbacks), 4)
+
+    def test_comprar_ahora(self):
+        producto = crear_producto(9, precio=40)
+        response = self.client.get(reverse('checkout'), {'prod_id': producto.pk})
+        self.assertContains(response, f'prod_id: {producto.pk}')
+
+        self.assertEqual(self.pagar(prod_id=producto.pk), {'success': True})
+        payment = Payment.objects.get(order_id='PAYPAL-1')
+        self.assertEqual(payment.amount, order_total(Decimal('40.00'))[1])
+        self.assertEqual(
+            list(OrderPlaced.objects.filter(payment=payment).values_list('product', 'cantidad', 'unit_price')),
+            [(producto.pk, 1, Decimal('40.00'))],
+        )
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 3)  # el carrito queda intacto
+        self.client.get(reverse('payment_success'))
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 3)
+
+    def test_reintento_no_duplica(self):
+        self.pagar()
+        Cart.objects.create(user=self.user, product=crear_producto(9))
+        self.assertEqual(self.pagar(), {'success': True})
+        self.assertEqual(Payment.objects.filter(order_id='PAYPAL-1').count(), 1)
+        self.assertEqual(OrderPlaced.objects.filter(user=self.user).count(), 3)
+        # el reintento se resuelve con el ORM async, sin pasar por place_order
+        with patch('app.orders.place_order') as place:
+            self.assertEqual(self.pagar(), {'success': True})
+        place.assert_not_called()
+
+    def test_resumen_de_compras(self):
+        self.pagar()  # crea el resumen desde el historial
+        Cart.objects.create(user=self.user, product=crear_producto(9), cantidad=1)
+        self.pagar('PAYPAL-2')  # UPDATE incremental
+        summary = OrderSummary.objects.get(user=self.user)
+        self.assertEqual((summary.order_count, summary.total_spent), (2, Decimal('70.00')))
+
+        orden = OrderPlaced.objects.filter(user=self.user).first()
+        orden.status = 'Cancel'
+        orden.save()
+        summary.refresh_from_db()
+        self.assertEqual((summary.order_count, summary.total_spent), (2, Decimal('50.00')))
+
+    def test_borrar_usuario_con_ordenes(self):
+        self.pagar()
+        user_id = self.user.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(OrderSummary.objects.filter(user_id=user_id).exists())
+
+    def test_borrado_en_cascada_recalcula_el_resumen_una_vez(self):
+        self.pagar()
+        with patch('app.orders.refresh_order_summary', wraps=refresh_order_summary) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                Payment.objects.get(order_id='PAYPAL-1').delete()  # borra sus 3 líneas
+        self.assertEqual(refresh.call_count, 1)
+        summary = OrderSummary.objects.get(user=self.user)
+        self.assertEqual((summary.order_count, summary.total_spent), (0, Decimal('0')))
+
+
+class OrderHistoryTests(TestCase):
+    """Historial paginado por cursor y agrupado por pago"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        customer = Customer.objects.create(
+            user=self.user, name='Cliente', localidad='Centro',
+            departamento='San Salvador', codigopostal=1101,
+        )
+        product = crear_producto(1)
+        now = timezone.now()
+        self.payments = []
+        for i in range(23):
+            # los pagos 0 y 1 tienen la misma fecha: el id desempata
+            payment = Payment.objects.create(user=self.user, amount=10, created_at=now - timedelta(hours=max(i, 1)))
+            OrderPlaced.objects.bulk_create([
+                OrderPlaced(user=self.user, customer=customer, product=product, payment=payment, unit_price=10)
+                for _ in range(2)
+            ])
+            self.payments.append(payment.pk)
+        Payment.objects.create(user=self.user, amount=5)  # pago sin órdenes: no se lista
+        self.client.force_login(self.user)
+
+    def test_recorre_todas_las_paginas(self):
+        vistos, url, paginas = [], reverse('orders'), 0
+        while url:
+            page = self.client.get(url).context['page']
+            self.assertTrue(all(len(lines) == 2 for _, lines in page))
+            vistos += [payment.pk for payment, _ in page]
+            url = f"{reverse('orders')}?after={page.next_cursor}" if page.has_next else None
+            paginas += 1
+        self.assertEqual(paginas, 3)
+        self.assertEqual(vistos, [self.payments[1], self.payments[0]] + self.payments[2:])
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        for after in ('xyz', f'{10**30}.1', f'-{10**20}.1'):
+            page = self.client.get(reverse('orders'), {'after': after}).context['page']
+            self.assertTrue(page.is_first)
+            self.assertEqual(len(page.groups), 10)
+
+    def test_fila_sin_precio_congelado_usa_el_precio_actual(self):
+        line = OrderPlaced.objects.filter(payment=self.payments[0]).first()
+        OrderPlaced.objects.filter(pk=line.pk).update(unit_price=None)
+        line.refresh_from_db()
+        self.assertEqual(line.total_cost, line.product.precio_descuento)
+        with self.assertNumQueries(6):  # sesión, usuario, resumen, pagos, líneas y los productos de la fila vieja
+            response = self.client.get(reverse('orders'))
+        op = next(op for _, lines in response.context['page'] for op in lines if op.pk == line.pk)
+        self.assertEqual((op.subtotal, op.product_title), (line.product.precio_descuento, line.product.title))
+
+
+class PayPalVerificationTests(TestCase):
+    """Verificación de pagos contra un stub local de la API de PayPal"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubPayPalServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        self.client_api = PayPalClient(base_url=self.server.base_url, client_id='id', client_secret='secret')
+
+    def crear_pago(self, order, amount):
+        return Payment.objects.create(
+            user=self.user, amount=amount, order_id=order['id'], status=STATUS_VERIFYING,
+        )
+
+    def test_pagos_huerfanos_los_reclama_un_solo_worker(self):
+        viejo = timezone.now() - timedelta(seconds=project_settings.PAYPAL_VERIFY_RESUME_AFTER + 1)
+        huerfano = self.crear_pago({'id': 'PP-VIEJO'}, 10)
+        nuevo = self.crear_pago({'id': 'PP-NUEVO'}, 10)  # sigue en la cola de algún worker
+        Payment.objects.create(user=self.user, amount=10, order_id='PP-PAGADO', status='COMPLETED', paid=True)
+        Payment.objects.filter(order_id__in=['PP-VIEJO', 'PP-PAGADO']).update(created_at=viejo)
+
+        self.assertEqual(claim_stale_payments(), [huerfano.pk])
+        self.assertEqual(claim_stale_payments(), [])  # ya lo tomó otro worker
+        # si ese worker tampoco terminó, vuelve a estar disponible pasado el plazo (y el nuevo también)
+        despues = timezone.now() + timedelta(seconds=project_settings.PAYPAL_VERIFY_RESUME_AFTER + 1)
+        self.assertEqual(claim_stale_payments(now=despues), [huerfano.pk, nuevo.pk])
+
+    def test_pago_completado(self):
+        order = self.server.create_order('140.50')
+        payment = self.crear_pago(order, 140.5)
+        self.assertEqual(verify_with_retries(payment.pk, client=self.client_api), 'COMPLETED')
+        payment.refresh_from_db()
+        self.assertTrue(payment.paid)
+        self.assertEqual(payment.payment_id, f"CAP-{order['id']}")
+
+    def test_monto_distinto(self):
+        order = self.server.create_order('1.00')
+        payment = self.crear_pago(order, 140.5)
+        verify_with_retries(payment.pk, client=self.client_api)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.paid), (STATUS_MISMATCH, False))
+
+    def test_captura_menor_que_el_carrito(self):
+        Customer.objects.create(
+            user=self.user, name='Cliente', localidad='Centro', departamento='San Salvador', codigopostal=1101,
+        )
+        for i in range(2):
+            Cart.objects.create(user=self.user, product=crear_producto(i), cantidad=2)
+        # el navegador creó la orden de PayPal por 0.01 y manda ese monto
+        order = self.server.create_order('0.01')
+        data = {**order, 'purchase_units': [{'amount': {'value': '0.01'}}]}
+        payment, _ = place_order(self.user, data)
+        self.assertEqual(payment.amount, Decimal('80.00'))  # 2 x 2 x 10 + 40 de envío
+
+        verify_with_retries(payment.pk, client=self.client_api)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.paid), (STATUS_MISMATCH, False))
+
+    def test_moneda_distinta(self):
+        order = self.server.create_order('140.50', currency='EUR')
+        payment = self.crear_pago(order, 140.5)
+        verify_with_retries(payment.pk, client=self.client_api)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.paid), (STATUS_MISMATCH, False))
+
+    def test_token_reutilizado(self):
+        tokens = self.server.token_requests
+        for _ in range(3):
+            order = self.server.create_order('10.00')
+            verify_with_retries(self.crear_pago(order, 10).pk, client=self.client_api)
+        self.assertEqual(self.server.token_requests, tokens + 1)
+
+    async def test_verificacion_asincrona_concurrente(self):
+        self.server.delay = 0.2
+        client = AsyncPayPalClient(base_url=self.server.base_url, client_id='id', client_secret='secret')
+        orders = [self.server.create_order('10.00') for _ in range(10)]
+        payments = [await sync_to_async(self.crear_pago)(order, 10) for order in orders]
+        try:
+            start = time.perf_counter()
+            statuses = await asyncio.gather(*(averify_with_retries(p.pk, client) for p in payments))
+            elapsed = time.perf_counter() - start
+        finally:
+            self.server.delay = 0
+            await client.aclose()
+        self.assertEqual(set(statuses), {'COMPLETED'})
+        self.assertLess(elapsed, 10 * 0.2)  # en paralelo, no una tras otra
+        self.assertEqual(await Payment.objects.filter(paid=True).acount(), 10)
+
+
+class CategoryPageTests(TestCase):
+    """Listado de categoría paginado por cursor y cacheado por versión del catálogo"""
+
+    def setUp(self):
+        cache.clear()
+        self.products = [crear_producto(i) for i in range(30)]
+        self.url = reverse('categoria', args=['CA'])
+
+    def test_paginacion_por_cursor(self):
+        response = self.client.get(self.url)
+        page = response.context['product']
+        self.assertEqual(len(page.object_list), 24)
+        self.assertContains(response, f'?after={page.next_cursor}')
+
+        response = self.client.get(self.url, {'after': page.next_cursor})
+        self.assertEqual(len(response.context['product'].object_list), 6)
+        self.assertFalse(response.context['product'].has_next)
+
+    def test_pagina_caliente_sin_consultas(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_invalidacion_al_guardar_producto(self):
+        self.client.get(self.url)
+        producto = self.products[0]
+        producto.title = 'Camisa renombrada'
+        producto.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Camisa renombrada')
+
+
+class PageCacheTests(TestCase):
+    """Páginas anónimas completas en caché con ETag, y fragmento de resultados de búsqueda"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = crear_producto(1)
+        self.url = reverse('product-detail', args=[self.product.pk])
+
+    def test_anonimo_cacheado_con_revalidacion(self):
+        primera = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.content, primera.content)
+        self.assertEqual(response['ETag'], primera['ETag'])
+        self.assertIn('Last-Modified', response)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+        response = self.client.get(self.url, headers={'If-None-Match': primera['ETag']})
+        self.assertEqual((response.status_code, response.content), (304, b''))
+
+        # Guardar el producto cambia la versión del catálogo: página y ETag nuevos
+        self.product.title = 'Camisa renombrada'
+        self.product.save()
+        response = self.client.get(self.url, headers={'If-None-Match': primera['ETag']})
+        self.assertContains(response, 'Camisa renombrada')
+        self.assertNotEqual(response['ETag'], primera['ETag'])
+
+    def test_clave_solo_con_parametros_de_la_vista(self):
+        url = reverse('categoria', args=['CA'])
+        self.client.get(url, {'after': 5, 'utm_source': 'correo'})
+        self.client.get(self.url)
+        with self.assertNumQueries(0):  # el orden y los parámetros ajenos no crean otra entrada
+            self.client.get(f'{url}?utm_source=otro&after=5')
+            self.client.get(self.url, {'utm_source': 'correo', 'x': 1})
+        self.assertIsNotNone(self.client.get(url, {'after': 6}).context)
+
+    def test_con_sesion_o_carrito_no_se_cachea(self):
+        self.client.get(self.url)
+        self.client.force_login(User.objects.create_user('cliente', password='clave-segura-123'))
+        response = self.client.get(self.url)
+        self.assertNotIn('ETag', response)
+        self.assertIsNotNone(response.context)
+
+        self.client.logout()
+        self.client.cookies.clear()
+        self.client.cookies['guest_cart'] = 'x'
+        response = self.client.get(self.url)
+        self.assertNotIn('ETag', response)
+
+    def test_fragmento_de_busqueda(self):
+        url = reverse('search')
+        self.client.get(url, {'search': 'producto'})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'search': 'producto'})
+        self.assertFalse([q for q in ctx.captured_queries if 'app_product' in q['sql']])
+        self.assertContains(response, 'Producto 1')
+
+        self.product.title = 'Gorra renombrada producto'
+        self.product.save()
+        self.assertContains(self.client.get(url, {'search': 'producto'}), 'Gorra renombrada')
+
+
+class SearchTests(TestCase):
+    """Búsqueda de texto completo con acentos, relevancia y actualización incremental"""
+
+    def setUp(self):
+        self.camison = crear_producto(1)
+        self.camison.title = 'Camisón de algodón'
+        self.camison.save()
+        self.otro = crear_producto(2)
+        self.otro.description = 'Combina con un camison'
+        self.otro.save()
+
+    def buscar(self, q):
+        return [p.pk for p in self.client.get(reverse('search'), {'search': q}).context['product']]
+
+    def test_ignora_acentos_y_ordena_por_relevancia(self):
+        self.assertEqual(self.buscar('camison'), [self.camison.pk, self.otro.pk])
+        self.assertEqual(self.buscar('CAMISÓN'), [self.camison.pk, self.otro.pk])
+
+    def test_indice_incremental(self):
+        self.camison.title = 'Pantalón'
+        self.camison.save()
+        self.assertEqual(self.buscar('camison'), [self.otro.pk])
+        self.otro.delete()
+        self.assertEqual(self.buscar('camison'), [])
+
+    def test_busca_por_categoria(self):
+        self.assertEqual(len(self.buscar('camisas')), 2)
+
+    def test_pagina_fuera_de_rango(self):
+        response = self.client.get(reverse('search'), {'search': 'camison', 'page': 10**20})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['product'])
+
+
+class SearchSuggestTests(TestCase):
+    """Autocompletado desde el índice de prefijos en memoria"""
+
+    def setUp(self):
+        cache.clear()
+        self.zapato = crear_producto(1)
+        self.zapato.title = 'Zapatos Nike Air'
+        self.zapato.save()
+
+    def sugerir(self, q):
+        return [r['label'] for r in self.client.get(reverse('search-suggest'), {'q': q}).json()['results']]
+
+    def test_prefijo_de_cualquier_palabra_y_categorias(self):
+        self.assertEqual(self.sugerir('nik'), ['NIKE', 'Zapatos Nike Air'])
+        self.assertEqual(self.sugerir('zap'), ['Zapatos Nike Air'])
+        self.assertEqual(self.sugerir('CAMI'), ['Camisas'])
+
+    def test_sin_consultas_a_la_bd(self):
+        self.sugerir('nik')
+        with self.assertNumQueries(0):
+            self.sugerir('nike a')
+
+    def test_actualizacion_incremental(self):
+        self.sugerir('zap')
+        self.zapato.title = 'Gorra Nike'
+        self.zapato.save()
+        otro = crear_producto(2)
+        self.assertEqual(self.sugerir('zap'), [])
+        self.assertEqual(self.sugerir('gorra'), ['Gorras', 'Gorra Nike'])
+        self.assertEqual(self.sugerir('producto'), ['Producto 2'])
+        otro.delete()
+        self.assertEqual(self.sugerir('producto'), [])
+
+
+class ResponsiveImageTests(TestCase):
+    """Derivados redimensionados y la etiqueta {% responsive_image %}"""
+
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        Image.new('RGBA', (2000, 1000), (200, 30, 30, 255)).save(Path(self.media) / 'foto.png')
+        settings = self.settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def render(self):
+        return Template('{% load images %}{% responsive_image "foto.png" alt="Foto" %}').render(Context())
+
+    def test_sin_derivados_usa_la_original(self):
+        self.assertEqual(self.render(), '<img src="/media/foto.png" alt="Foto" class="" loading="lazy">')
+
+    def test_genera_anchos_y_formatos(self):
+        creados = generate_derivatives('foto.png')
+        self.assertEqual(len(creados), len(WIDTHS) * len(FORMATS))
+        self.assertEqual(generate_derivatives('foto.png'), [])  # ya existen
+        with Image.open(Path(self.media) / 'derivatives' / 'foto-320.jpg') as im:
+            self.assertEqual(im.size, (320, 160))
+        html = self.render()
+        self.assertIn('<picture>', html)
+        self.assertIn('/media/derivatives/foto-640.jpg 640w', html)
+        self.assertIn('type="image/webp"', html)
+
+    def test_existencia_cacheada_por_version_del_catalogo(self):
+        self.render()
+        with patch.object(default_storage, 'exists') as exists:
+            self.assertNotIn('<picture>', self.render())
+        exists.assert_not_called()
+        # el hilo de fondo sube la versión del catálogo al terminar
+        _generate_quietly('foto.png')
+        self.assertIn('<picture>', self.render())
@@ -5,6 +5,7 @@ from django.conf.urls.static import static
 from django.contrib.auth import views as auth_view
 
 from . import views
+from .guest_cart import merge_into_cart
 from .forms import LoginForm, MyPasswordResetForm, MyPasswordChangeForm, CustomerRegistrationForm
 
 
@@ -15,6 +16,16 @@ class MyLogoutView(auth_view.LogoutView):
     http_method_names = ['get', 'post']
 
 
+# ----------------------------
+# Login que pasa el carrito de invitado a la cuenta
+# ----------------------------
+class CartMergeLoginView(auth_view.LoginView):
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        merge_into_cart(self.request, form.get_user(), response)
+        return response
+
+
 # ----------------------------
 # URL patterns principales
 # ----------------------------
@@ -53,16 +64,19 @@ urlpatterns = [
 
     # Órdenes
     path('orders/', views.orders, name='orders'),
+    path('staff/export/', views.export_data, name='export'),
+    path('staff/sales/', views.sales_dashboard, name='sales-dashboard'),
 
     # Busqueda
     path('search/', views.search, name='search'),
+    path('search/suggest/', views.search_suggest, name='search-suggest'),
 
     # Registro y perfil de usuario
     path('registration/', views.CustomerRegistrationView.as_view(), name='customerregistration'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
 
     # Autenticación / login / logout / contraseñas
-    path('accounts/login/', auth_view.LoginView.as_view(
+    path('accounts/login/', CartMergeLoginView.as_view(
         template_name='app/login.html', 
         authentication_form=LoginForm
     ), name='login'),
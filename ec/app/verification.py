@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Payment
+from .money import to_decimal
+from .paypal import AsyncPayPalClient, PayPalError, get_client
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Verificación de pagos contra la API de PayPal
+# -----------------------------
+
+STATUS_VERIFYING = 'VERIFYING'
+STATUS_FAILED = 'VERIFICATION_FAILED'
+STATUS_MISMATCH = 'AMOUNT_MISMATCH'
+RESUME_BATCH = 100
+
+
+def captured_amounts(order):
+    """Monto capturado por moneda ({'USD': Decimal}) sumando las capturas COMPLETED de todas las purchase_units"""
+    totals = {}
+    for unit in order.get('purchase_units', []):
+        for capture in unit.get('payments', {}).get('captures', []):
+            if capture.get('status') == 'COMPLETED':
+                amount = capture['amount']
+                totals[amount['currency_code']] = (
+                    totals.get(amount['currency_code'], Decimal('0')) + to_decimal(amount['value'])
+                )
+    return totals
+
+
+def _payment_fields(order, payment):
+    """
+    Campos de Payment según la orden de PayPal.
+
+    Solo marca paid=True si PayPal reporta la orden COMPLETED y lo capturado
+    es exactamente el total que calculó el servidor al registrar la orden, en
+    PAYPAL_CURRENCY (el monto que manda el navegador no cuenta).
+    """
+    status = order.get('status', '')
+    paid = False
+    try:
+        amount_ok = captured_amounts(order) == {settings.PAYPAL_CURRENCY: payment.amount}
+    except (KeyError, TypeError, InvalidOperation):
+        amount_ok = False
+
+    if status == 'COMPLETED':
+        if amount_ok:
+            paid = True
+        else:
+            status = STATUS_MISMATCH
+
+    fields = {'status': status, 'paid': paid}
+    payer_email = order.get('payer', {}).get('email_address')
+    if payer_email:
+        fields['payer_email'] = payer_email
+    captures = order.get('purchase_units', [{}])[0].get('payments', {}).get('captures', [])
+    if captures:
+        fields['payment_id'] = captures[0]['id']
+    return fields
+
+
+def verify_payment(payment_id, client=None):
+    """Confirma un pago consultando la orden en PayPal y actualiza Payment; lanza PayPalError si hay que reintentar"""
+    payment = Payment.objects.get(pk=payment_id)
+    order = (client or get_client()).get_order(payment.order_id)
+    fields = _payment_fields(order, payment)
+    Payment.objects.filter(pk=payment_id).update(**fields)
+    return fields['status']
+
+
+def _retry_delay(attempt):
+    delay = settings.PAYPAL_VERIFY_BACKOFF * (2 ** (attempt - 1))
+    return delay + random.uniform(0, delay / 2)
+
+
+def verify_with_retries(payment_id, client=None, sleep=time.sleep):
+    """Verifica con reintentos y backoff exponencial con jitter"""
+    attempts = settings.PAYPAL_VERIFY_MAX_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            return verify_payment(payment_id, client=client)
+        except PayPalError as e:
+            if not e.retriable or attempt == attempts:
+                logger.warning("No se pudo verificar el pago %s: %s", payment_id, e)
+                Payment.objects.filter(pk=payment_id).update(status=STATUS_FAILED, paid=False)
+                return STATUS_FAILED
+            sleep(_retry_delay(attempt))
+
+
+async def averify_payment(payment_id, client):
+    """verify_payment con el ORM asíncrono y un AsyncPayPalClient"""
+    payment = await Payment.objects.aget(pk=payment_id)
+    order = await client.get_order(payment.order_id)
+    fields = _payment_fields(order, payment)
+    await Payment.objects.filter(pk=payment_id).aupdate(**fields)
+    return fields['status']
+
+
+async def averify_with_retries(payment_id, client, sleep=asyncio.sleep):
+    """verify_with_retries sin bloquear el hilo: los reintentos esperan con asyncio.sleep"""
+    attempts = settings.PAYPAL_VERIFY_MAX_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            return await averify_payment(payment_id, client)
+        except PayPalError as e:
+            if not e.retriable or attempt == attempts:
+                logger.warning("No se pudo verificar el pago %s: %s", payment_id, e)
+                await Payment.objects.filter(pk=payment_id).aupdate(status=STATUS_FAILED, paid=False)
+                return STATUS_FAILED
+            await sleep(_retry_delay(attempt))
+
+
+# -----------------------------
+# Cola de trabajo en segundo plano
+# La cola vive en el proceso: si gunicorn recicla el worker (max_requests) o
+# muere, sus pagos quedan VERIFYING. Cada worker retoma esos huérfanos con
+# claim_stale_payments (la BD es la fuente de verdad de lo pendiente).
+# -----------------------------
+
+def claim_stale_payments(now=None, limit=RESUME_BATCH):
+    """
+    Reclama hasta `limit` pagos VERIFYING sin terminar tras PAYPAL_VERIFY_RESUME_AFTER segundos.
+
+    El UPDATE condicional por pago hace que cada huérfano lo tome un solo worker;
+    si tampoco ese termina, vuelve a estar disponible pasado el mismo plazo.
+    Retorna los ids reclamados.
+    """
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=settings.PAYPAL_VERIFY_RESUME_AFTER)
+    orphaned = (
+        Payment.objects.filter(status=STATUS_VERIFYING).exclude(order_id=None)
+        .filter(Q(verification_claimed_at__lt=stale) | Q(verification_claimed_at=None, created_at__lt=stale))
+    )
+    return [
+        pk for pk in orphaned.order_by('pk').values_list('pk', flat=True)[:limit]
+        if orphaned.filter(pk=pk).update(verification_claimed_at=now)
+    ]
+
+
+class BackgroundVerifier:
+    """
+    Un hilo con su event loop verifica los pagos encolados.
+
+    Mientras una verificación espera a PayPal (o su backoff) el loop atiende las
+    demás, así hasta PAYPAL_VERIFY_CONCURRENCY confirmaciones lentas avanzan a la
+    vez sin ocupar un hilo cada una ni tocar los workers que sirven al carrito.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = None
+        self.slots = None
+        self.resuming = False
+        threading.Thread(target=self.loop.run_forever, name='paypal-verify', daemon=True).start()
+
+    async def verify(self, payment_id):
+        if self.slots is None:
+            # Se crean dentro del loop que los usa
+            self.slots = asyncio.Semaphore(settings.PAYPAL_VERIFY_CONCURRENCY)
+        async with self.slots:
+            try:
+                if self.client is None:
+                    self.client = AsyncPayPalClient()
+                return await averify_with_retries(payment_id, self.client)
+            except Exception:
+                logger.exception("Error verificando el pago %s", payment_id)
+            finally:
+                await sync_to_async(close_old_connections)()
+
+    async def resume_orphans(self):
+        """Cada PAYPAL_VERIFY_SWEEP segundos encola los pagos huérfanos que este worker logró reclamar"""
+        while True:
+            try:
+                for payment_id in await sync_to_async(claim_stale_payments)():
+                    logger.info("Retomando la verificación del pago %s", payment_id)
+                    self.loop.create_task(self.verify(payment_id))
+            except Exception:
+                logger.exception("Error buscando pagos sin verificar")
+            finally:
+                await sync_to_async(close_old_connections)()
+            await asyncio.sleep(settings.PAYPAL_VERIFY_SWEEP)
+
+    def submit(self, payment_id):
+        """Agenda la verificación desde cualquier hilo; retorna un concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(self.verify(payment_id), self.loop)
+
+    def start_resuming(self):
+        if not self.resuming:
+            self.resuming = True
+            asyncio.run_coroutine_threadsafe(self.resume_orphans(), self.loop)
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            _verifier = BackgroundVerifier()
+    return _verifier
+
+
+def enqueue_verification(payment_id):
+    """Encola la verificación de un pago fuera del ciclo de la petición"""
+    return get_verifier().submit(payment_id)
+
+
+def start_background_verification():
+    """Arranca la cola y el barrido de huérfanos del proceso (hook post_worker_init de gunicorn)"""
+    get_verifier().start_resuming()
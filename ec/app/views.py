@@ -1,43 +1,54 @@
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.db.models import Q
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 import json
 
-from .models import Cart, OrderPlaced, Product, Customer, Wishlist, Payment
+from .models import Cart, Product, Customer, Wishlist
 from .forms import CustomerProfileForm, CustomerRegistrationForm
+from .search import search as search_products
+from .suggest import suggest
+from .catalog import catalog_version, category_titles, parse_cursor, product_page
+from .orders import aplace_order, get_order_summary, order_history
+from .counters import adjust_cart_total, ainvalidate_wishlist_count, get_cart_total, invalidate_cart
+from .money import to_cents
+from .shipping import aorder_total, order_total
+from . import exports
+from .guest_cart import GuestCart
+from .analytics import WINDOWS, sales_dashboard as sales_data
+from .recommendations import home_carousels, product_carousels
+from .page_cache import anonymous_page_cache
 
 
 # -----------------------------
 # Helper functions
 # -----------------------------
 
-def get_cart_and_wishlist_counts(user):
-    """Retorna la cantidad de items en carrito y wishlist para el usuario"""
-    if user.is_authenticated:
-        totalitem = Cart.objects.filter(user=user).count()
-        wishitem = Wishlist.objects.filter(user=user).count()
-    else:
-        totalitem = 0
-        wishitem = 0
-    return totalitem, wishitem
-
-
 def clear_cart(user):
     """Elimina todos los productos del carrito del usuario"""
-    Cart.objects.filter(user=user).delete()
+    with transaction.atomic():
+        Cart.objects.filter(user=user).delete()
+        invalidate_cart(user)
 
 
 # -----------------------------
 # Vistas Generales
 # -----------------------------
 
+@anonymous_page_cache()
 def home(request):
     """Vista de la página de inicio"""
     productos = [
@@ -48,58 +59,67 @@ def home(request):
         {'url': 'PA', 'img': 'p1.png', 'nombre': 'Pantalones'},
         {'url': 'GO', 'img': 'gorra1.png', 'nombre': 'Gorras'},
     ]
-    totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-    context = {'productos': productos, 'totalitem': totalitem, 'wishitem': wishitem}
+    context = {'productos': productos, **home_carousels()}
     return render(request, "app/home.html", context)
 
 
+@anonymous_page_cache()
 def about(request):
     """Vista de la página 'About'"""
-    totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-    return render(request, "app/about.html", {'totalitem': totalitem, 'wishitem': wishitem})
+    return render(request, "app/about.html")
 
 
+@anonymous_page_cache()
 def contact(request):
     """Vista de la página de contacto"""
-    totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-    return render(request, "app/contact.html", {'totalitem': totalitem, 'wishitem': wishitem})
+    return render(request, "app/contact.html")
 
 
 # -----------------------------
 # Vistas de Productos y Categorías
 # -----------------------------
 
+@method_decorator(anonymous_page_cache('after'), name='get')
 class CategoryView(View):
-    """Vista de categoría por slug"""
+    """Vista de categoría por slug (paginada por cursor ?after=<id>)"""
     def get(self, request, val):
-        totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-        product = Product.objects.filter(categoria=val)
-        title = Product.objects.filter(categoria=val).values('title')
-        return render(request, "app/categoria.html", locals())
+        after = parse_cursor(request.GET.get('after'))
+        context = {
+            'product': product_page(Product.objects.filter(categoria=val), after),
+            'title': category_titles(val),
+            'grid_key': f"categoria:{val}",
+            'after': after,
+            'catalog_version': catalog_version(),
+        }
+        return render(request, "app/categoria.html", context)
 
 
 class CategoryTitle(View):
     """Vista de categoría filtrando por título de producto"""
     def get(self, request, val):
-        product = Product.objects.filter(title=val)
-        title = Product.objects.filter(categoria=product[0].categoria).values('title')
-        totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-        return render(request, "app/categoria.html", locals())
+        categoria = Product.objects.filter(title=val).values_list('categoria', flat=True).first()
+        if categoria is None:
+            raise Http404("Producto no encontrado")
+        after = parse_cursor(request.GET.get('after'))
+        context = {
+            'product': product_page(Product.objects.filter(title=val), after),
+            'title': category_titles(categoria),
+            'grid_key': f"titulo:{val}",
+            'after': after,
+            'catalog_version': catalog_version(),
+        }
+        return render(request, "app/categoria.html", context)
 
 
+@method_decorator(anonymous_page_cache(), name='get')
 class ProductDetail(View):
     """Detalle de un producto individual"""
     def get(self, request, pk):
-        product = get_object_or_404(Product, pk=pk)
-        wishlist = False
-        if request.user.is_authenticated:
-            wishlist = Wishlist.objects.filter(user=request.user, product=product).exists()
-        totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
+        product = get_object_or_404(Product.objects.with_in_wishlist(request.user), pk=pk)
         context = {
             "product": product,
-            "wishlist": wishlist,
-            "totalitem": totalitem,
-            "wishitem": wishitem,
+            "wishlist": product.in_wishlist,
+            **product_carousels(product),
         }
         return render(request, "app/productdetail.html", context)
 
@@ -112,19 +132,17 @@ class CustomerRegistrationView(View):
     """Registro de usuarios"""
     def get(self, request):
         form = CustomerRegistrationForm()
-        totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-        return render(request, 'app/customerregistration.html', {'form': form, 'totalitem': totalitem, 'wishitem': wishitem})
+        return render(request, 'app/customerregistration.html', {'form': form})
 
     def post(self, request):
         form = CustomerRegistrationForm(request.POST)
-        totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
         if form.is_valid():
             form.save()
             messages.success(request, "¡Usuario registrado con éxito!")
             return redirect('login')
         else:
             messages.warning(request, "Datos inválidos. Verifica los campos.")
-        return render(request, 'app/customerregistration.html', {'form': form, 'totalitem': totalitem, 'wishitem': wishitem})
+        return render(request, 'app/customerregistration.html', {'form': form})
 
 
 class ProfileView(View):
@@ -132,13 +150,11 @@ class ProfileView(View):
     @method_decorator(login_required)
     def get(self, request):
         form = CustomerProfileForm()
-        totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-        return render(request, 'app/profile.html', {'form': form, 'totalitem': totalitem, 'wishitem': wishitem})
+        return render(request, 'app/profile.html', {'form': form})
 
     @method_decorator(login_required)
     def post(self, request):
         form = CustomerProfileForm(request.POST)
-        totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
         if form.is_valid():
             Customer.objects.update_or_create(
                 user=request.user,
@@ -153,7 +169,7 @@ class ProfileView(View):
             messages.success(request, "Perfil guardado correctamente")
             return redirect('profile')
         messages.warning(request, "Datos inválidos")
-        return render(request, 'app/profile.html', {'form': form, 'totalitem': totalitem, 'wishitem': wishitem})
+        return render(request, 'app/profile.html', {'form': form})
 
 
 # -----------------------------
@@ -178,8 +194,7 @@ def address(request):
         else:
             show_form = True  # si hay errores, mantener el formulario abierto
 
-    totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-    context = {'add': add, 'form': form, 'show_form': show_form, 'totalitem': totalitem, 'wishitem': wishitem}
+    context = {'add': add, 'form': form, 'show_form': show_form, 'summary': get_order_summary(request.user)}
     return render(request, 'app/address.html', context)
 
 
@@ -209,8 +224,7 @@ class UpdateAddress(View):
     def get(self, request, pk):
         add = get_object_or_404(Customer, pk=pk)
         form = CustomerProfileForm(instance=add)
-        totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-        return render(request, 'app/updateAddress.html', {'form': form, 'totalitem': totalitem, 'wishitem': wishitem, 'add': add})
+        return render(request, 'app/updateAddress.html', {'form': form, 'add': add})
 
     def post(self, request, pk):
         form = CustomerProfileForm(request.POST)
@@ -232,39 +246,37 @@ class UpdateAddress(View):
 # Vistas de Carrito y Wishlist
 # -----------------------------
 
-@login_required
 def add_to_cart(request):
     user=request.user
     product_id=request.GET.get('prod_id')
-    product = Product.objects.get(id=product_id)
-    Cart(user=user,product=product).save()
+    product = get_object_or_404(Product, id=product_id)
+    if not user.is_authenticated:
+        # Invitados: solo la cookie, ninguna escritura en la BD
+        guest = GuestCart(request)
+        guest.add(product.pk)
+        return guest.save(redirect("/cart"))
+    with transaction.atomic():
+        if not Cart.objects.filter(user=user, product=product).update(cantidad=F('cantidad') + 1):
+            Cart(user=user,product=product).save()  # la señal invalida el contador
+        adjust_cart_total(user, product.precio_descuento)
     return redirect("/cart")
 
-@login_required
 def show_cart(request):
     user = request.user
-    cart = Cart.objects.filter(user=user)
-    amount = 0
-    for p in cart:
-        value= p.cantidad * p.product.precio_descuento
-        amount = amount + value
-    totalamount = amount + 40
-    totalitem= 0
-    wishitem = 0
-    if request.user.is_authenticated:
-        totalitem = len(Cart.objects.filter(user=request.user))
-        wishitem = len(Wishlist.objects.filter(user=request.user))
+    if user.is_authenticated:
+        cart = Cart.objects.filter(user=user).with_products()
+        amount = get_cart_total(user)
+    else:
+        guest = GuestCart(request)
+        cart = guest.with_products()
+        amount = guest.total()
+    shipping, totalamount = order_total(amount)
     return render(request, 'app/addtocart.html',locals())
 
 @login_required
 def show_wishlist(request):
     user = request.user
-    totalitem= 0
-    wishitem = 0
-    if request.user.is_authenticated:
-        totalitem = len(Cart.objects.filter(user=request.user))
-        wishitem = len(Wishlist.objects.filter(user=request.user))
-    product = Wishlist.objects.filter(user = user)
+    product = Wishlist.objects.filter(user = user).select_related('product')
     return render(request, "app/wishlist.html",locals())
 
 
@@ -283,24 +295,23 @@ class Checkout(View):
         prod_id = request.GET.get('prod_id')
         if prod_id:
             product = get_object_or_404(Product, id=prod_id)
-            cart_items = [{'product': product, 'cantidad': 1}]
+            cart_items = [{'product': product, 'cantidad': 1, 'subtotal': product.precio_descuento}]
             famount = product.precio_descuento
         else:
-            cart_items = Cart.objects.filter(user=user)
-            famount = sum(p.cantidad * p.product.precio_descuento for p in cart_items)
+            cart_items = Cart.objects.filter(user=user).with_products()
+            famount = Cart.objects.filter(user=user).total()
 
-        totalamount_num = famount + 40
+        shipping, totalamount_num = order_total(famount)
         totalamount = f"{totalamount_num:.2f}"
-        razoraumont = int(totalamount_num * 100)
+        razoraumont = to_cents(totalamount_num)
 
-        totalitem, wishitem = get_cart_and_wishlist_counts(user)
         context = {
-            "totalitem": totalitem,
-            "wishitem": wishitem,
             "user": user,
             "add": add,
+            "buy_now": prod_id and product.pk,
             "cart_items": cart_items,
             "famount": famount,
+            "shipping": shipping,
             "totalamount": totalamount,
             "totalamount_num": totalamount_num,
             "razoraumont": razoraumont,
@@ -310,49 +321,19 @@ class Checkout(View):
 
 @login_required
 def payment_success(request):
-    """Página de éxito de pago"""
-    clear_cart(request.user)
+    """Página de éxito de pago (place_order ya vació el carrito; con "Comprar Ahora" no se toca)"""
     return render(request, 'app/payment_success.html')
 
 
 @csrf_exempt
 @login_required
-def save_payment(request):
-    """Guardar pago desde PayPal (API)"""
+async def save_payment(request):
+    """Guardar pago desde PayPal (API); la confirmación con PayPal sigue en segundo plano"""
     if request.method == "POST":
+        user = await request.auser()
         try:
             data = json.loads(request.body)
-            user = request.user
-
-            # Guardar pago
-            payment = Payment.objects.create(
-                user=user,
-                order_id=data['id'],
-                payment_id=data['id'],
-                payer_email=data['payer']['email_address'],
-                amount=data['purchase_units'][0]['amount']['value'],
-                status=data['status'],
-                paid=True
-            )
-
-            # Obtener dirección seleccionada
-            customer_id = data.get('customer_id')
-            customer = Customer.objects.get(pk=customer_id) if customer_id else Customer.objects.filter(user=user).last()
-
-            # Crear orden por cada producto en el carrito
-            cart_items = Cart.objects.filter(user=user)
-            for item in cart_items:
-                OrderPlaced.objects.create(
-                    user=user,
-                    customer=customer,
-                    product=item.product,
-                    cantidad=item.cantidad,
-                    payment=payment,
-                    status="Pending"
-                )
-
-            # Vaciar carrito
-            cart_items.delete()
+            await aplace_order(user, data)
             return JsonResponse({"success": True})
 
         except Exception as e:
@@ -365,82 +346,145 @@ def save_payment(request):
 
 @login_required
 def orders(request):
-    totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-    order_placed = OrderPlaced.objects.filter(user=request.user)
-    return render(request, 'app/orders.html', {'order_placed': order_placed, 'totalitem': totalitem, 'wishitem': wishitem})
+    page = order_history(request.user, request.GET.get('after'))
+    summary = get_order_summary(request.user)
+    return render(request, 'app/orders.html', {'page': page, 'summary': summary})
 
 
 # -----------------------------
 # Vistas de manipulación de carrito vía AJAX
+# Son asíncronas; la línea y el total cambian juntos en una transacción
+# (el ORM async no tiene transacciones, por eso van con sync_to_async).
 # -----------------------------
 
-@login_required
-def plus_cart(request):
+def _totals_json(amount, shipping, totalamount, cantidad):
+    return JsonResponse({
+        'cantidad': cantidad, 'amount': float(amount), 'shipping': float(shipping), 'totalamount': float(totalamount),
+    })
+
+
+def totals_response(amount, cantidad):
+    """Respuesta JSON común de los endpoints AJAX del carrito"""
+    return _totals_json(amount, *order_total(amount), cantidad)
+
+
+def guest_cart_response(request, action):
+    """plus/minus/remove sobre el carrito de invitado; la respuesta lleva la cookie actualizada"""
+    guest = GuestCart(request)
+    try:
+        product_id = int(request.GET.get('prod_id', ''))
+    except ValueError:
+        product_id = None
+    if product_id not in guest.lines:
+        raise Http404("Producto no está en el carrito")
+    getattr(guest, action)(product_id)
+    return guest.save(totals_response(guest.total(), guest.lines.get(product_id, 0)))
+
+
+async def cart_line_response(change, user, prod_id):
+    """Aplica `change` (línea y total en una transacción) y responde con los totales"""
+    row = await sync_to_async(change)(user, Cart.objects.filter(product=prod_id, user=user))
+    if row is None:
+        raise Http404("Producto no está en el carrito")
+    cantidad, amount = row
+    return _totals_json(amount, *await aorder_total(amount), cantidad)
+
+
+def _plus_cart_line(user, line):
+    """Suma una unidad a la línea y su precio al total; retorna (cantidad, total) o None"""
+    with transaction.atomic():
+        if not line.update(cantidad=F('cantidad') + 1):
+            return None
+        cantidad, precio = line.values_list('cantidad', 'product__precio_descuento').get()
+        adjust_cart_total(user, precio)
+        return cantidad, get_cart_total(user)
+
+
+def _minus_cart_line(user, line):
+    """Resta una unidad (sin bajar de 1); retorna (cantidad, total) o None"""
+    with transaction.atomic():
+        updated = line.filter(cantidad__gt=1).update(cantidad=F('cantidad') - 1)
+        row = line.values_list('cantidad', 'product__precio_descuento').first()
+        if row is None:
+            return None
+        cantidad, precio = row
+        if updated:
+            adjust_cart_total(user, -precio)
+        return cantidad, get_cart_total(user)
+
+
+def _delete_cart_line(user, line):
+    """Borra la línea bloqueada y descuenta su subtotal; retorna (0, total) o None"""
+    with transaction.atomic():
+        row = line.select_for_update(of=('self',)).values_list('cantidad', 'product__precio_descuento').first()
+        if row is None:
+            return None
+        cantidad, precio = row
+        line.delete()
+        adjust_cart_total(user, -cantidad * precio)
+        return 0, get_cart_total(user)
+
+
+async def plus_cart(request):
     """Incrementar cantidad de un producto en el carrito"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return await sync_to_async(guest_cart_response)(request, 'add')
     if request.method == 'GET':
-        prod_id = request.GET.get('prod_id')
-        cart_item = get_object_or_404(Cart, product=prod_id, user=request.user)
-        cart_item.cantidad += 1
-        cart_item.save()
-
-        cart = Cart.objects.filter(user=request.user)
-        amount = sum(p.cantidad * p.product.precio_descuento for p in cart)
-        totalamount = amount + 40
-        return JsonResponse({'cantidad': cart_item.cantidad, 'amount': amount, 'totalamount': totalamount})
+        return await cart_line_response(_plus_cart_line, user, request.GET.get('prod_id'))
 
 
-@login_required
-def minus_cart(request):
+async def minus_cart(request):
     """Disminuir cantidad de un producto en el carrito"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return await sync_to_async(guest_cart_response)(request, 'minus')
     if request.method == 'GET':
-        prod_id = request.GET.get('prod_id')
-        cart_item = get_object_or_404(Cart, product=prod_id, user=request.user)
-        if cart_item.cantidad > 1:
-            cart_item.cantidad -= 1
-            cart_item.save()
-
-        cart = Cart.objects.filter(user=request.user)
-        amount = sum(p.cantidad * p.product.precio_descuento for p in cart)
-        totalamount = amount + 40
-        return JsonResponse({'cantidad': cart_item.cantidad, 'amount': amount, 'totalamount': totalamount})
+        return await cart_line_response(_minus_cart_line, user, request.GET.get('prod_id'))
 
 
-@login_required
-def remove_cart(request):
+async def remove_cart(request):
     """Eliminar un producto del carrito"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return await sync_to_async(guest_cart_response)(request, 'remove')
     if request.method == 'GET':
-        prod_id = request.GET.get('prod_id')
-        cart_item = get_object_or_404(Cart, product=prod_id, user=request.user)
-        cart_item.delete()
-
-        cart = Cart.objects.filter(user=request.user)
-        amount = sum(p.cantidad * p.product.precio_descuento for p in cart)
-        totalamount = amount + 40
-        return JsonResponse({'cantidad': 0, 'amount': amount, 'totalamount': totalamount})
+        return await cart_line_response(_delete_cart_line, user, request.GET.get('prod_id'))
 
 
 # -----------------------------
 # Vistas de Wishlist vía AJAX
 # -----------------------------
 
-@login_required
-def plus_wishlist(request):
-    """Agregar producto a wishlist"""
-    if request.method == "GET":
-        prod_id = request.GET.get("prod_id")
-        product = get_object_or_404(Product, id=prod_id)
-        Wishlist.objects.get_or_create(user=request.user, product=product)
-        return JsonResponse({"message": "Producto agregado a tu lista de deseos"})
+def _wishlist_product_id(request):
+    try:
+        return int(request.POST.get("prod_id", ""))
+    except ValueError:
+        raise Http404("Producto no encontrado")
 
 
+@require_POST
 @login_required
-def minus_wishlist(request):
-    """Eliminar producto de wishlist"""
-    if request.method == "GET":
-        prod_id = request.GET.get("prod_id")
-        product = get_object_or_404(Product, id=prod_id)
-        Wishlist.objects.filter(user=request.user, product=product).delete()
-        return JsonResponse({"message": "Producto eliminado de tu lista de deseos"})
+async def plus_wishlist(request):
+    """Agregar producto a wishlist: un INSERT que ignora el duplicado, sin leer el producto"""
+    product_id = _wishlist_product_id(request)
+    user = await request.auser()
+    try:
+        await Wishlist.objects.abulk_create([Wishlist(user=user, product_id=product_id)], ignore_conflicts=True)
+    except IntegrityError:
+        raise Http404("Producto no encontrado")
+    await ainvalidate_wishlist_count(user)
+    return JsonResponse({"message": "Producto agregado a tu lista de deseos", "in_wishlist": True})
+
+
+@require_POST
+@login_required
+async def minus_wishlist(request):
+    """Eliminar producto de wishlist (la señal post_delete invalida el contador)"""
+    product_id = _wishlist_product_id(request)
+    user = await request.auser()
+    await Wishlist.objects.filter(user=user, product_id=product_id).adelete()
+    return JsonResponse({"message": "Producto eliminado de tu lista de deseos", "in_wishlist": False})
 
 
 # -----------------------------
@@ -448,8 +492,68 @@ def minus_wishlist(request):
 # -----------------------------
 
 def search(request):
-    """Buscar productos por título"""
+    """Buscar productos por título, descripción y categoría (índice de texto completo)"""
     query = request.GET.get('search', '')
-    totalitem, wishitem = get_cart_and_wishlist_counts(request.user)
-    product = Product.objects.filter(Q(title__icontains=query))
-    return render(request, "app/search.html", {'product': product, 'totalitem': totalitem, 'wishitem': wishitem})
\ No newline at end of file
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    product = search_products(query, page)
+    context = {'product': product, 'query': query, 'catalog_version': catalog_version()}
+    return render(request, "app/search.html", context)
+
+
+def search_suggest(request):
+    """Autocompletado del buscador (JSON) servido desde el índice en memoria"""
+    try:
+        limit = int(request.GET.get('limit', 8))
+    except ValueError:
+        limit = 8
+    return JsonResponse({'results': suggest(request.GET.get('q', ''), limit)})
+
+
+# -----------------------------
+# Exportación para el staff
+# -----------------------------
+
+@staff_member_required
+def export_data(request):
+    """
+    Descarga órdenes o pagos en CSV/JSONL como stream (?kind=, format=, start=, end=, status=).
+
+    Bajo ASGI el cuerpo es un iterador asíncrono para que la memoria siga constante.
+    """
+    kind = request.GET.get('kind', 'orders')
+    fmt = request.GET.get('format', 'csv')
+    if kind not in exports.EXPORTS or fmt not in exports.FORMATS:
+        return HttpResponseBadRequest("kind debe ser orders o payments y format csv o jsonl")
+    dates = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        try:
+            dates[name] = parse_date(value) if value else None
+        except ValueError:  # bien formada pero inexistente, como 2024-02-30
+            dates[name] = None
+        if value and dates[name] is None:
+            return HttpResponseBadRequest(f"{name} debe ser una fecha válida con el formato AAAA-MM-DD")
+
+    status = request.GET.get('status') or None
+    if isinstance(request, ASGIRequest):
+        lines = exports.astream(kind, fmt, exports.aexport_rows(kind, status=status, **dates))
+    else:
+        lines = exports.stream(kind, fmt, exports.export_rows(kind, status=status, **dates))
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(lines, content_type=f'{content_type}; charset=utf-8')
+    filename = f"{kind}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@staff_member_required
+def sales_dashboard(request):
+    """Tablero de ventas: lee solo las tablas de rollup (refresh_sales_rollups las mantiene)"""
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    return render(request, 'app/sales_dashboard.html', sales_data(days if days in WINDOWS else 30))
@@ -0,0 +1,138 @@
+from itertools import islice
+
+from django.db import transaction
+
+from .models import STATUS_CHOICES, STATUS_TRANSITIONS, OrderPlaced, OrderStatusChange
+from .orders import refresh_order_summary
+
+STATUSES = dict(STATUS_CHOICES)
+BATCH_SIZE = 5000
+MAX_ERRORS = 100
+
+
+# -----------------------------
+# Cambios de estado en bloque (máquina de estados de OrderPlaced)
+# -----------------------------
+
+class InvalidStatus(ValueError):
+    pass
+
+
+def sources_for(status):
+    """Estados desde los que se puede pasar a `status`"""
+    if status not in STATUSES:
+        raise InvalidStatus(f"Estado desconocido: {status}")
+    return [source for source, targets in STATUS_TRANSITIONS.items() if status in targets]
+
+
+def _apply(ids, status, user=None, source='', tracking=None):
+    """
+    Cambia a `status` las líneas de `ids` que lo permiten, en una transacción.
+
+    Bloquea las filas, hace un solo UPDATE y guarda el historial con bulk_create.
+    `tracking` ({id: número de guía}) se guarda en las que cambian y en las que
+    ya estaban en `status`; las que no admiten el cambio quedan intactas.
+    Retorna (ids cambiados, ids de usuario afectados).
+    """
+    sources = sources_for(status)
+    with transaction.atomic():
+        locked = list(
+            OrderPlaced.objects.select_for_update()
+            .filter(pk__in=ids)
+            .values_list('pk', 'status', 'user_id')
+        )
+        rows = [row for row in locked if row[1] in sources]
+        changed = [pk for pk, _, _ in rows]
+        OrderPlaced.objects.filter(pk__in=changed).update(status=status)
+        OrderStatusChange.objects.bulk_create([
+            OrderStatusChange(order_id=pk, from_status=old, to_status=status, changed_by=user, source=source)
+            for pk, old, _ in rows
+        ])
+        if tracking:
+            accepted = set(changed) | {pk for pk, current, _ in locked if current == status}
+            lines = [OrderPlaced(pk=pk, tracking_number=number) for pk, number in tracking.items() if pk in accepted]
+            OrderPlaced.objects.bulk_update(lines, ['tracking_number'])
+    return changed, {user_id for _, _, user_id in rows}
+
+
+def _refresh_summaries(status, user_ids):
+    # Solo las cancelaciones cambian el gasto del resumen
+    if status == 'Cancel':
+        for user_id in user_ids:
+            refresh_order_summary(user_id)
+
+
+def change_status(queryset, status, user=None, source='', batch_size=BATCH_SIZE):
+    """
+    Pasa a `status` todas las líneas del queryset que lo permiten; las demás se omiten.
+
+    Recorre los ids por cursor y aplica cada lote en su propia transacción, así
+    un cambio de miles de filas no mantiene bloqueada la tabla. Retorna cuántas cambió.
+    """
+    pending = queryset.filter(status__in=sources_for(status)).order_by('pk').values_list('pk', flat=True)
+    last = 0
+    total = 0
+    user_ids = set()
+    while True:
+        ids = list(pending.filter(pk__gt=last)[:batch_size])
+        if not ids:
+            break
+        changed, users = _apply(ids, status, user, source)
+        total += len(changed)
+        user_ids |= users
+        last = ids[-1]
+    _refresh_summaries(status, user_ids)
+    return total
+
+
+def import_tracking(rows, user=None, default_status='On The Way', batch_size=BATCH_SIZE):
+    """
+    Aplica un archivo de la transportadora (columnas order, tracking_number y status opcional).
+
+    `rows` puede ser un csv.DictReader sobre el archivo abierto: se consume por
+    lotes, así que el archivo nunca se carga completo en memoria.
+    Las órdenes inexistentes y las transiciones no permitidas cuentan como errores.
+    Retorna {'rows', 'changed', 'errors'} con hasta MAX_ERRORS errores (línea, mensaje).
+    """
+    result = {'rows': 0, 'changed': 0, 'errors': []}
+
+    def error(line, message):
+        if len(result['errors']) < MAX_ERRORS:
+            result['errors'].append((line, message))
+
+    rows = enumerate(rows, start=2)  # la línea 1 es el encabezado
+    user_ids = {}
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        result['rows'] += len(batch)
+        by_status = {}
+        for line, row in batch:
+            try:
+                pk = int(row.get('order') or '')
+            except ValueError:
+                error(line, f"Número de orden inválido: {row.get('order')!r}")
+                continue
+            status = (row.get('status') or default_status).strip()
+            if status not in STATUSES:
+                error(line, f"Estado desconocido: {status}")
+                continue
+            by_status.setdefault(status, {})[pk] = (line, (row.get('tracking_number') or '').strip())
+
+        for status, lines in by_status.items():
+            existing = dict(OrderPlaced.objects.filter(pk__in=list(lines)).values_list('pk', 'status'))
+            for pk in sorted(lines.keys() - existing.keys()):
+                error(lines[pk][0], f"La orden {pk} no existe")
+            tracking = {pk: number for pk, (_, number) in lines.items() if pk in existing and number}
+            changed, users = _apply(list(existing), status, user, 'tracking', tracking)
+            result['changed'] += len(changed)
+            user_ids.setdefault(status, set()).update(users)
+            # Las que ya estaban en `status` solo actualizan la guía; las demás no admiten el cambio
+            for pk in sorted(existing.keys() - set(changed)):
+                if existing[pk] != status:
+                    error(lines[pk][0], f"La orden {pk} no puede pasar de {existing[pk]} a {status}")
+
+    for status, users in user_ids.items():
+        _refresh_summaries(status, users)
+    return result
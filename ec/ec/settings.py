@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
-import dj_database_url 
+import dj_database_url
 
 
 
@@ -73,6 +73,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app.context_processors.cart_counts',
             ],
         },
     },
@@ -83,15 +84,109 @@ WSGI_APPLICATION = 'ec.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+#
+# Sin DATABASE_URL: SQLite para un solo servidor (BEGIN IMMEDIATE evita el
+# "database is locked" al pasar de lectura a escritura dentro de una transacción).
+# SQLITE_WAL=1 (lo fija gunicorn.conf.py) pasa el archivo a WAL: lectores y un
+# escritor a la vez. El modo queda guardado en el archivo y deja -wal/-shm al
+# lado, así que manage.py no lo activa sobre la BD del repositorio.
+# Con DATABASE_URL (p. ej. postgres://...): conexiones persistentes con health
+# checks; DB_POOL=1 usa el pool de psycopg 3 y DB_PGBOUNCER=1 desactiva los
+# cursores del lado del servidor (pgbouncer en modo transaction).
+# DATABASE_REPLICA_URL agrega una réplica de lectura para el catálogo.
+
+SQLITE_PRAGMAS = [
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-20000',           # ~20 MB por conexión
+    'PRAGMA mmap_size=268435456',
+]
+SQLITE_WAL_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',          # seguro con WAL; fsync solo en los checkpoints
+]
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+
+def sqlite_options():
+    pragmas = SQLITE_PRAGMAS + (SQLITE_WAL_PRAGMAS if os.getenv('SQLITE_WAL') == '1' else [])
+    return {
+        'timeout': 20,
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': '; '.join(pragmas),
     }
-}
 
 
+def database_config(url, conn_max_age=None):
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', '60')) if conn_max_age is None else conn_max_age,
+        conn_health_checks=True,
+    )
+    if config['ENGINE'] == 'django.db.backends.postgresql':
+        if os.getenv('DB_POOL') == '1':
+            # El pool reemplaza las conexiones persistentes (Django exige CONN_MAX_AGE=0)
+            config['CONN_MAX_AGE'] = 0
+            config.setdefault('OPTIONS', {})['pool'] = {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            }
+        if os.getenv('DB_PGBOUNCER') == '1':
+            config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return config
+
+
+if os.getenv('DATABASE_URL'):
+    DATABASES = {'default': database_config(os.environ['DATABASE_URL'])}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': sqlite_options(),
+        }
+    }
+
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = database_config(os.environ['DATABASE_REPLICA_URL'])
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['app.routers.CatalogReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+#
+# CACHE_URL es la caché compartida por todos los workers: redis://host:6379/0
+# (requiere el paquete redis), file:///ruta/al/directorio o locmem:// (un solo
+# proceso; por defecto, p. ej. runserver y las pruebas).
+# 'default' es app.caching.TieredCache, que va a esa caché y pone delante un LRU
+# del proceso para cached_query (CACHE_LOCAL_TIMEOUT segundos, 0 lo desactiva).
+
+def cache_config(url):
+    scheme, _, location = url.partition('://')
+    if scheme in ('redis', 'rediss'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if scheme == 'file':
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+    if scheme == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location or 'ec'}
+    raise ValueError(f"CACHE_URL no soportada: {url!r} (redis://, file:// o locmem://)")
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'app.caching.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', '5')),
+            'LOCAL_MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', '1000')),
+        },
+    },
+    'shared': cache_config(os.getenv('CACHE_URL', 'locmem://')),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -148,3 +243,19 @@ PAYPAL_CLIENT_ID = os.getenv('PAYPAL_CLIENT_ID', 'AXnYfCtPpKZ67Z6A9wJahbYZKuH0a2
 PAYPAL_CLIENT_SECRET = os.getenv('PAYPAL_CLIENT_SECRET', 'EHLbZuqxCre_Fo_LlcibG9gdu3JwszWFPxVU-ZJCYyGZAND3f5-PvOZGKNIEQ6RO3JHjNv2hmX6irHYD')
 
 PAYPAL_MODE = 'sandbox'  # Cambia a 'live' para producción si es necesario
+PAYPAL_CURRENCY = 'USD'  # la misma del SDK en checkout.html; los pagos en otra moneda no se aceptan
+
+# API REST de PayPal (verificación de pagos). PAYPAL_API_BASE permite apuntar a un stub local.
+PAYPAL_API_BASE = os.getenv(
+    'PAYPAL_API_BASE',
+    'https://api-m.sandbox.paypal.com' if PAYPAL_MODE == 'sandbox' else 'https://api-m.paypal.com',
+)
+PAYPAL_HTTP_TIMEOUT = float(os.getenv('PAYPAL_HTTP_TIMEOUT', '10'))
+PAYPAL_HTTP_POOL_SIZE = int(os.getenv('PAYPAL_HTTP_POOL_SIZE', '10'))
+PAYPAL_VERIFY_CONCURRENCY = int(os.getenv('PAYPAL_VERIFY_CONCURRENCY', '50'))
+PAYPAL_VERIFY_MAX_ATTEMPTS = int(os.getenv('PAYPAL_VERIFY_MAX_ATTEMPTS', '5'))
+PAYPAL_VERIFY_BACKOFF = float(os.getenv('PAYPAL_VERIFY_BACKOFF', '1'))
+# Un pago que sigue VERIFYING después de RESUME_AFTER segundos quedó huérfano (se
+# recicló el worker que lo tenía en cola); cada worker los busca cada SWEEP segundos.
+PAYPAL_VERIFY_RESUME_AFTER = int(os.getenv('PAYPAL_VERIFY_RESUME_AFTER', '300'))
+PAYPAL_VERIFY_SWEEP = int(os.getenv('PAYPAL_VERIFY_SWEEP', '60'))
@@ -0,0 +1,128 @@
+"""
+Configuración de gunicorn para ec.
+
+    gunicorn -c ec/gunicorn.conf.py          (desde la raíz del repo, como el Procfile)
+
+WEB_MODE elige cómo se sirve la aplicación:
+    gthread  WSGI con hilos por worker (por defecto); las vistas son síncronas y
+             pasan buena parte del tiempo esperando a la BD, así los hilos la solapan.
+    asgi     ec.asgi con workers de uvicorn (requiere `uvicorn`).
+    sync     un request a la vez por worker, sin keep-alive (el modo anterior).
+
+Los workers y los hilos se calculan con los CPUs disponibles para el proceso
+(afinidad y cuota del cgroup); WEB_CONCURRENCY y WEB_THREADS los fijan a mano.
+"""
+import math
+import os
+import tempfile
+
+MODE = os.getenv('WEB_MODE', 'gthread')
+if MODE not in ('gthread', 'asgi', 'sync'):
+    raise ValueError(f"WEB_MODE debe ser gthread, asgi o sync (no {MODE!r})")
+
+
+def available_cpus():
+    """CPUs que el proceso puede usar de verdad (en un contenedor cpu_count() ve los del host)"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+CPUS = available_cpus()
+
+# -----------------------------
+# Aplicación
+# -----------------------------
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'ec.asgi:application' if MODE == 'asgi' else 'ec.wsgi:application'
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Con varios workers la caché tiene que ser compartida: si no se configuró
+# CACHE_URL, un directorio temporal común (ver CACHES en settings.py).
+# Ese respaldo no es atómico entre procesos (add/incr son un get y un set), así
+# que el candado de cached_query no evita reconstrucciones simultáneas: en
+# producción CACHE_URL=redis://... y WEB_REQUIRE_ATOMIC_CACHE=1 para no arrancar sin él.
+CACHE_URL = os.environ.setdefault('CACHE_URL', f"file://{os.path.join(tempfile.gettempdir(), 'ec-cache')}")
+ATOMIC_CACHE = CACHE_URL.startswith(('redis://', 'rediss://'))
+if not ATOMIC_CACHE and os.getenv('WEB_REQUIRE_ATOMIC_CACHE') == '1':
+    raise RuntimeError(f"WEB_REQUIRE_ATOMIC_CACHE=1 necesita CACHE_URL=redis://... (no {CACHE_URL!r})")
+
+# El servidor usa SQLite en WAL (ver DATABASES en settings.py); SQLITE_WAL=0 lo evita.
+os.environ.setdefault('SQLITE_WAL', '1')
+
+# Django se importa una vez en el master y los workers comparten esas páginas
+# de memoria (copy-on-write); WEB_PRELOAD=0 lo desactiva (p. ej. con --reload).
+preload_app = os.getenv('WEB_PRELOAD', '1') == '1'
+
+# -----------------------------
+# Workers e hilos
+# -----------------------------
+
+if MODE == 'gthread':
+    worker_class = 'gthread'
+    workers = CPUS + 1
+    threads = 4
+elif MODE == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    workers = CPUS + 1
+    threads = 1
+else:
+    worker_class = 'sync'
+    workers = 2 * CPUS + 1
+    threads = 1
+
+workers = int(os.getenv('WEB_CONCURRENCY', workers))
+threads = int(os.getenv('WEB_THREADS', threads))
+
+# Reciclar workers de a poco acota cualquier fuga de memoria; el jitter evita
+# que todos se reinicien a la vez. La cola de verificación de PayPal del worker
+# se pierde al reciclarlo: post_worker_init arranca el barrido que la retoma.
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', str(max_requests // 10)))
+
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+graceful_timeout = timeout
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))  # más que el idle del proxy no sirve
+
+# El latido de los workers en tmpfs: en un contenedor /tmp puede ser disco
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+errorlog = '-'
+accesslog = '-' if os.getenv('WEB_ACCESS_LOG') == '1' else None
+
+
+# -----------------------------
+# Hooks
+# -----------------------------
+
+def post_fork(server, worker):
+    """Cada worker abre sus propias conexiones: las del master no se comparten entre procesos"""
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    """Retoma los pagos que quedaron VERIFYING en la cola de un worker reciclado o caído"""
+    from app.verification import start_background_verification
+    start_background_verification()
+
+
+def when_ready(server):
+    server.log.info(
+        "WEB_MODE=%s workers=%s threads=%s preload=%s (%s CPUs)", MODE, workers, threads, preload_app, CPUS,
+    )
+    if not ATOMIC_CACHE and workers > 1:
+        server.log.warning(
+            "CACHE_URL=%s no es atómica entre workers: el candado de cached_query no evita reconstrucciones "
+            "simultáneas. Usa CACHE_URL=redis://... en producción (WEB_REQUIRE_ATOMIC_CACHE=1 lo exige)",
+            CACHE_URL,
+        )